@@ -3,7 +3,9 @@
 """Automatically update Goodreads and local Spreadsheet with book read info.
 
 Args:
-    Three operational modes (g)ui, (s)earch or (u)rl
+    Five operational modes (g)ui, (s)earch, (u)rl, (b)atch or (d)aemon,
+    plus store to inspect the book details store, fetch-metadata to fill
+    it and compact to write journaled books to the spreadsheet
 
     gui arguments:
         None
@@ -15,37 +17,242 @@ Args:
         Read Date: (t)oday, (y)esterday or a date formatted DD/MM/YY
         Rating: Number between 1 and 5
         Review (Optional): Enclosed in double quotation marks
+        Daemon (Optional): --daemon to submit the book to a running daemon
 
     url arguments:
         URL: Goodreads URL for the book
         Read Date: (t)oday, (y)esterday or a date formatted DD/MM/YY
         Rating: Number between 1 and 5
         Review (Optional): Enclosed in double quotation marks
+        Daemon (Optional): --daemon to submit the book to a running daemon
+
+    batch arguments:
+        File: Path to a .csv or .jsonl file with a row per book containing
+              url (or search and format), date, rating and review columns
+        Workers (Optional): --workers followed by the number of browsers
+
+    daemon arguments:
+        Action (Optional): start (default), status or stop
+
+    compact arguments:
+        None - writes books journaled by earlier runs to the spreadsheet
+
+    store arguments:
+        Action: list or prune the stored book details, or list (searches)
+                or forget the stored search results
+        Terms (Optional): Book ID or part of a title or author
+        Days (Optional): --days to only prune or forget entries older
+                         than this
+
+    fetch-metadata arguments:
+        File: Path to a .csv or .jsonl batch file or a text file with a
+              Goodreads URL per line
+        Concurrency (Optional): --concurrency followed by the number of
+                                pages to fetch at once
+        Output (Optional): --output followed by a path to write the book
+                           details to as JSON lines
 """
 
 import argparse
+import atexit
+import collections
+import concurrent.futures
 import configparser
+import contextlib
+import csv
+import difflib
+import fcntl
 from datetime import datetime as dt
 from datetime import timedelta
+import functools
+import gzip
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import socketserver
+import sqlite3
 import sys
-import tkinter as tk
-from tkinter import messagebox
+import threading
+import time
+from urllib.parse import quote, urljoin, urlsplit
+import weakref
 
-import bs4
-import openpyxl
-import requests
-from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import WebDriverException
+
+
+class LazyImport:
+    """Stand-in for a module, or an object from one, imported on first use.
+
+    Importing selenium's webdriver, openpyxl, requests, bs4, tkinter and
+    asyncio takes most of ligrarian.py's start up time, so each is only
+    imported once a code path uses it. --help, argument errors and handing
+    a book to the daemon then need none of them.
+    """
+
+    def __init__(self, module, attribute=None):
+        """LazyImport class constructor to initialise LazyImport object.
+
+        Args:
+            module (str): Name of the module to import.
+            attribute (str): Name of the object to take from the module
+                             (optional), as with from module import name.
+
+        """
+        object.__setattr__(self, '_module', module)
+        object.__setattr__(self, '_attribute', attribute)
+        object.__setattr__(self, '_target', None)
+
+    def _load(self):
+        """Import and return the module or object, once."""
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            if self._attribute:
+                target = getattr(target, self._attribute)
+            object.__setattr__(self, '_target', target)
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+
+asyncio = LazyImport('asyncio')
+tk = LazyImport('tkinter')
+messagebox = LazyImport('tkinter.messagebox')
+bs4 = LazyImport('bs4')
+openpyxl = LazyImport('openpyxl')
+requests = LazyImport('requests')
+webdriver = LazyImport('selenium.webdriver')
+By = LazyImport('selenium.webdriver.common.by', 'By')
+Keys = LazyImport('selenium.webdriver.common.keys', 'Keys')
+Options = LazyImport('selenium.webdriver.firefox.options', 'Options')
+EC = LazyImport('selenium.webdriver.support.expected_conditions')
+Select = LazyImport('selenium.webdriver.support.ui', 'Select')
+WebDriverWait = LazyImport('selenium.webdriver.support.ui', 'WebDriverWait')
+
+# Whether lxml is installed can be checked without importing it
+if importlib.util.find_spec('lxml'):
+    lxml_html = LazyImport('lxml.html')
+else:
+    lxml_html = None
+
+logger = logging.getLogger('ligrarian')
+
+GOODREADS = 'https://www.goodreads.com'
+
+
+class Tracer:
+    """Record how long each stage of a run takes as Chrome trace spans.
+
+    Spans are only recorded while enabled, and the traced decorator checks
+    that before anything else, so stages cost one attribute lookup extra
+    when tracing is off.
+    """
+
+    def __init__(self):
+        """Tracer class constructor to initialise a disabled Tracer."""
+        self.enabled = False
+        self.events = []
+        self.started = time.perf_counter()
+
+    def enable(self):
+        """Start recording spans, timed from now."""
+        self.enabled = True
+        self.events = []
+        self.started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """Record the time spent in the context as a span called name."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.events.append({
+                'name': name, 'cat': 'ligrarian', 'ph': 'X',
+                'ts': round((start - self.started) * 1e6),
+                'dur': round((end - start) * 1e6),
+                'pid': os.getpid(), 'tid': threading.get_ident(),
+            })
+
+    def save(self, path):
+        """Write the spans as a Chrome trace-event file.
+
+        The file can be opened in chrome://tracing or ui.perfetto.dev.
+
+        Args:
+            path (str): Path to write the trace to.
+
+        """
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': self.events,
+                       'displayTimeUnit': 'ms'}, trace_file)
+
+    def summary(self):
+        """Return a one line summary of the total time in each stage."""
+        totals = {}
+        for event in self.events:
+            calls, duration = totals.get(event['name'], (0, 0))
+            totals[event['name']] = (calls + 1, duration + event['dur'])
+        stages = ['{}{} {:.0f}ms'.format(name, ' x{}'.format(calls)
+                                         if calls > 1 else '',
+                                         duration / 1000)
+                  for name, (calls, duration) in totals.items()]
+        stages.append('total {:.0f}ms'.format(
+            (time.perf_counter() - self.started) * 1000))
+        return ' | '.join(stages)
+
+
+tracer = Tracer()
+
+
+def traced(function):
+    """Decorate function to record a span for each call while tracing."""
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not tracer.enabled:
+            return function(*args, **kwargs)
+        with tracer.span(name):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def finish_trace(path):
+    """Save the run's trace to path and print its summary."""
+    tracer.save(path)
+    print('Trace written to {}: {}'.format(path, tracer.summary()))
 
 
 class Gui:
-    """Acts as the base of the GUI and contains the assoicated methods."""
+    """Acts as the base of the GUI and contains the assoicated methods.
+
+    Books marked as read are queued for a worker thread, which updates them
+    one after another with a single browser while the window stays open for
+    more. The worker reports its progress back through a queue the window
+    checks every 100ms, as only this thread may touch the widgets.
+    """
 
     def __init__(self, master, settings):
         """Gui class constructor to initialise Gui object.
@@ -56,9 +263,14 @@ class Gui:
         """
         self.master = master
         self.master.title("Ligrarian")
-        self.master.geometry('665x560')
+        self.master.geometry('665x760')
         self.settings = settings
         self.info = {}
+        self.books = queue.Queue()
+        self.progress = queue.Queue()
+        self.names = []
+        self.worker = None
+        self.closing = False
 
         # Labels
         login_label = tk.Label(self.master, text="Login")
@@ -155,6 +367,14 @@ class Gui:
                                   command=self.parse_input)
         submit_button.grid(row=12, column=7, columnspan=2, sticky='E', pady=15)
 
+        self.status = tk.Label(self.master, text="Add books to update them")
+        self.status.grid(row=12, column=1, columnspan=6, sticky='W', padx=10)
+
+        self.queue_list = tk.Listbox(self.master, height=8, width=75)
+        self.queue_list.grid(row=13, column=2, columnspan=7, sticky='W')
+
+        self.master.after(100, self.poll_progress)
+
     def mode_switch(self):
         """Modify displayed widgets and edit label text depending on mode."""
         if self.mode.get():
@@ -177,8 +397,7 @@ class Gui:
         self.date.insert(0, get_date_str(yesterday))
 
     def parse_input(self):
-        """Create input dictionary and test required info has been given."""
-        self.mode = self.mode.get()
+        """Create input dictionary and queue the book if it's complete."""
         self.settings['email'] = self.email.get()
         password = self.password.get()
         if self.save_choice.get():
@@ -199,14 +418,82 @@ class Gui:
             assert self.settings['email'] != 'Email'
             assert self.settings['password'] != 'Password'
             assert self.info['main']
-            if not self.mode:
+            if not self.mode.get():
                 assert self.info['format']
-            self.master.destroy()
 
         except AssertionError:
             messagebox.showwarning(message="Complete all non-optional "
                                    "fields before marking as read."
             )
+            return
+
+        self.queue_book(gui_mode_details_edits(self))
+
+    def queue_book(self, details):
+        """List the book, hand it to the worker and clear it from the form.
+
+        Args:
+            details (dict): Book details - url or search and format, date,
+                            rating and optional review.
+
+        """
+        self.names.append(details.get('url') or details['search'])
+        self.queue_list.insert(tk.END, '{} - Waiting'.format(self.names[-1]))
+        self.books.put((len(self.names) - 1, details))
+        self.main.delete(0, tk.END)
+        self.review.delete('1.0', tk.END)
+        self.start_worker()
+
+    def start_worker(self):
+        """Start a worker for the queued books unless one is running.
+
+        The worker is started for the first book, or again if it stopped
+        after failing to log in, including for a book queued just as it
+        stopped. When closing it's told to stop once the books are done.
+        """
+        if self.worker and self.worker.is_alive():
+            return
+        self.worker = threading.Thread(
+            target=gui_worker,
+            args=(self.settings, self.books, self.progress), daemon=True
+        )
+        self.worker.start()
+        if self.closing:
+            self.books.put(None)
+
+    def poll_progress(self):
+        """Show the worker's progress reports, then check again shortly."""
+        while True:
+            try:
+                number, status = self.progress.get_nowait()
+            except queue.Empty:
+                break
+            if number is None:
+                self.status.configure(text=status)
+            else:
+                self.queue_list.delete(number)
+                self.queue_list.insert(number, '{} - {}'.format(
+                    self.names[number], status))
+
+        if not self.books.empty():
+            self.start_worker()
+        if self.closing and not (self.worker and self.worker.is_alive()):
+            self.master.destroy()
+            return
+        self.master.after(100, self.poll_progress)
+
+    def close(self):
+        """Close the window once the worker has finished the queued books."""
+        self.closing = True
+        if self.worker and self.worker.is_alive():
+            self.books.put(None)
+        elif self.books.empty():
+            self.master.destroy()
+            return
+        else:
+            self.start_worker()
+        self.status.configure(text="Finishing the queued books before "
+                                   "closing...")
 
 
 def retrieve_settings():
@@ -222,16 +509,19 @@ def retrieve_settings():
         for key, value in config.items(section):
             if key in ['prompt', 'headless']:
                 value = bool(value)
+            elif key in ['lean']:
+                # Newer switches read true/false, yes/no, on/off or 1/0
+                value = bool(value) and config.getboolean(section, key)
             settings[key] = value
 
     return settings
 
 
 def create_gui(settings_dict):
-    """Create GUI instance and return it."""
+    """Create GUI instance, run it until it's closed and return it."""
     root = tk.Tk()
-    root.protocol("WM_DELETE_WINDOW", exit)
     gui = Gui(root, settings_dict)
+    root.protocol("WM_DELETE_WINDOW", gui.close)
     root.mainloop()
 
     return gui
@@ -243,7 +533,7 @@ def gui_mode_details_edits(gui):
     Args:
         gui (obj): Instance of GUI class.
     """
-    if gui.mode:
+    if gui.mode.get():
         gui.info['url'] = gui.info['main']
     else:
         gui.info['search'] = gui.info['main']
@@ -252,6 +542,101 @@ def gui_mode_details_edits(gui):
     return gui.info
 
 
+def gui_worker(settings, books, progress):
+    """Update the books queued by the GUI with one driver until told to stop.
+
+    The driver is created and logged in for the first book then reused for
+    the rest. If that fails every queued book is failed and the worker
+    stops, so the GUI starts a new one for the next book. Any error
+    updating a book fails just that book.
+
+    Args:
+        settings (dict): Dictionary of user settings.
+        books (obj): Queue of (number, details) tuples to update, with None
+                     to stop once the books before it are done.
+        progress (obj): Queue to put (number, status) tuples on for the GUI,
+                        with number None for the status of the session.
+
+    """
+    store = BookStore.from_settings(settings)
+    driver = None
+    workbook = None
+    try:
+        while True:
+            job = books.get()
+            if job is None:
+                break
+            number, details = job
+
+            if driver is None:
+                try:
+                    progress.put((None, 'Starting the browser...'))
+                    driver = create_driver(settings['headless'],
+                                           settings.get('engine'), settings)
+                    progress.put((None, 'Logging in...'))
+                    goodreads_login(driver, settings['email'],
+                                    settings['password'],
+                                    settings.get('cookies'))
+                except (Exception, SystemExit) as error:
+                    if isinstance(error, SystemExit):
+                        # goodreads_login closes the driver before exiting
+                        status = ('Failed to log in, check the email and '
+                                  'password.')
+                    elif driver is None:
+                        status = 'Failed to start the browser - {}'.format(
+                            error_text(error))
+                    else:
+                        driver.close()
+                        status = 'Failed to log in - {}'.format(
+                            error_text(error))
+                    driver = None
+                    progress.put((None, status))
+                    progress.put((number, 'Failed - not logged in'))
+                    while True:
+                        try:
+                            job = books.get_nowait()
+                        except queue.Empty:
+                            return
+                        if job is not None:
+                            progress.put((job[0], 'Failed - not logged in'))
+                progress.put((None, 'Logged in.'))
+
+            progress.put((number, 'Updating Goodreads...'))
+            try:
+                info = goodreads_update(driver, details, store)[1]
+            except Exception as error:
+                progress.put((number, 'Failed - {}'.format(
+                    error_text(error))))
+                continue
+
+            progress.put((number, 'Updating the spreadsheet...'))
+            try:
+                info['category'], info['genre'] = category_and_genre(
+                    info['shelves'])
+                if workbook is None and compaction_due(settings):
+                    workbook = check_year_sheet_exists(settings['path'],
+                                                       details['date'][-4:])
+                record_row(settings, info, details['date'], workbook)
+            except Exception as error:
+                # The workbook may hold rows that weren't saved
+                workbook = None
+                progress.put((number, 'Goodreads updated, spreadsheet '
+                                      'failed - {}'.format(error_text(error))))
+                continue
+            progress.put((number, 'Done - {} by {}'.format(info['title'],
+                                                           info['author'])))
+    finally:
+        if driver is not None:
+            driver.close()
+        progress.put((None, 'Finished.'))
+
+
+def error_text(error):
+    """Return a short description of error for a status message."""
+    return (getattr(error, 'msg', None) or str(error) or
+            type(error).__name__)
+
+
 def get_date_str(yesterday=False):
     """Return a string of today's or yesterday's date.
 
@@ -276,7 +661,8 @@ def parse_arguments():
 
     """
     parser = argparse.ArgumentParser(description="Goodreads updater")
-    subparsers = parser.add_subparsers(help="Choose (u)rl, (s)earch or (g)ui")
+    subparsers = parser.add_subparsers(help="Choose (u)rl, (s)earch, (b)atch, "
+                                            "(d)aemon or (g)ui")
 
     url_parser = subparsers.add_parser("url", aliases=['u'])
     url_parser.add_argument('url', metavar="url",
@@ -288,6 +674,8 @@ def parse_arguments():
                             help="A number 1 through 5")
     url_parser.add_argument('review', nargs='?', metavar="'review'",
                             help="Review enclosed in quotes")
+    url_parser.add_argument('--daemon', dest='client', action='store_true',
+                            help="Submit the book to a running daemon")
 
     search_parser = subparsers.add_parser('search', aliases=['s'])
     search_parser.add_argument('search', metavar="'search terms'",
@@ -304,29 +692,328 @@ def parse_arguments():
                                help="A number 1 through 5")
     search_parser.add_argument('review', nargs='?', metavar="'review'",
                                help="Review enclosed in quotes")
+    search_parser.add_argument('--daemon', dest='client', action='store_true',
+                               help="Submit the book to a running daemon")
+
+    batch_parser = subparsers.add_parser('batch', aliases=['b'])
+    batch_parser.add_argument('batch', metavar='file',
+                              help="Path to a .csv or .jsonl file of books")
+    batch_parser.add_argument('--workers', type=int, metavar='n',
+                              help="Number of headless browsers to update "
+                                   "books with in parallel")
+
+    daemon_parser = subparsers.add_parser('daemon', aliases=['d'])
+    daemon_parser.add_argument('daemon', nargs='?', metavar='action',
+                               choices=['start', 'status', 'stop'],
+                               default='start',
+                               help="start (default), status or stop")
+
+    store_parser = subparsers.add_parser('store')
+    store_parser.add_argument('store', metavar='action',
+                              choices=['list', 'prune', 'searches',
+                                       'forget'],
+                              help="list or prune stored book details, "
+                                   "list searches or forget them")
+    store_parser.add_argument('terms', nargs='?', metavar="'terms'",
+                              help="Book ID or part of a title or author, "
+                                   "or words of the search terms")
+    store_parser.add_argument('--days', type=float, metavar='n',
+                              help="Only prune books or forget searches "
+                                   "stored over n days ago")
+
+    fetch_parser = subparsers.add_parser('fetch-metadata')
+    fetch_parser.add_argument('fetch', metavar='file',
+                              help="Path to a .csv or .jsonl batch file or "
+                                   "a text file of book URLs")
+    fetch_parser.add_argument('--concurrency', type=int, metavar='n',
+                              help="Number of pages to fetch at once")
+    fetch_parser.add_argument('--output', metavar='path',
+                              help="Write the book details to path as JSON "
+                                   "lines")
+
+    compact_parser = subparsers.add_parser('compact')
+    compact_parser.set_defaults(compact=True)
 
     gui = subparsers.add_parser("gui", aliases=['g'])
     gui.add_argument('gui', action='store_true',
                      help="Invoke GUI (Defaults to True)")
 
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="Log how long each browser wait takes")
+    parser.add_argument('--trace', action='store_true',
+                        help="Write how long each stage takes to the Chrome "
+                             "trace file given by the trace setting")
+
     args = parser.parse_args()
     return vars(args)
 
 
-def create_driver(run_headless):
+def process_date(date):
+    """Convert a (t)oday or (y)esterday date into a formatted date string.
+
+    Args:
+        date (str): (t)oday, (y)esterday or a date formatted DD/MM/YYYY.
+
+    Returns:
+        Date formatted DD/MM/YYYY.
+
+    """
+    if date.lower() == 't':
+        return get_date_str()
+    if date.lower() == 'y':
+        return get_date_str(True)
+    return date
+
+
+def read_batch_file(path):
+    """Read and validate the books listed in a batch file.
+
+    CSV files need a header row, JSONL files one JSON object per line. Both
+    use the keys url, search, format, date, rating and review, with a book
+    needing either a url or search and format.
+
+    Args:
+        path (str): Path to a .csv or .jsonl batch file.
+
+    Returns:
+        List of book details dictionaries.
+
+    """
+    with open(path, newline='') as batch_file:
+        if path.lower().endswith(('.jsonl', '.json')):
+            rows = [json.loads(line) for line in batch_file if line.strip()]
+        else:
+            rows = list(csv.DictReader(batch_file))
+
+    books = []
+    for number, row in enumerate(rows, 1):
+        row = {key.strip().lower(): str(value or '').strip()
+               for key, value in row.items() if key}
+        has_target = row.get('url') or (row.get('search') and
+                                         row.get('format'))
+        if not (has_target and row.get('date') and row.get('rating')):
+            print('Skipping row {} of {} - needs a url (or search and '
+                  'format), date and rating.'.format(number, path))
+            continue
+        row['date'] = process_date(row['date'])
+        books.append(row)
+
+    return books
+
+
+@traced
+def create_driver(run_headless, engine='selenium', settings=None):
     """Create the appropriate driver for the session.
 
     Args:
         run_headless (bool): Run in headless mode or not
+        engine (str): 'selenium' for a browser or 'http' for the browserless
+                      GoodreadsSession.
+        settings (dict): Dictionary of user settings (optional), giving the
+                         browser a lean profile if its lean setting is set
+                         and a persistent one if its profile setting is.
     """
+    if engine == 'http':
+        print('Updating Goodreads without a browser')
+        return GoodreadsSession()
+    lean = settings and settings.get('lean')
+    profile = settings and settings.get('profile')
+    if not (run_headless or lean or profile):
+        print('Opening a computer controlled browser and updating Goodreads')
+        return webdriver.Firefox()
+
+    options = Options()
     if run_headless:
         print(('Opening a headless computer controlled browser and updating '
                'Goodreads'))
-        options = Options()
         options.headless = True
-        return webdriver.Firefox(options=options)
-    print('Opening a computer controlled browser and updating Goodreads')
-    return webdriver.Firefox()
+    else:
+        print('Opening a computer controlled browser and updating Goodreads')
+    if lean:
+        lean_profile(options, settings.get('blocked_hosts'))
+    if profile:
+        persistent_profile(options, settings)
+    return webdriver.Firefox(options=options)
+
+
+# Ad and tracking hosts Goodreads pages load from, blocked by lean profiles
+BLOCKED_HOSTS = [
+    'doubleclick.net', 'googlesyndication.com', 'googletagservices.com',
+    'googletagmanager.com', 'google-analytics.com', 'amazon-adsystem.com',
+    'adnxs.com', 'casalemedia.com', 'criteo.com', 'facebook.net',
+    'krxd.net', 'moatads.com', 'pubmatic.com', 'quantserve.com',
+    'rubiconproject.com', 'scorecardresearch.com',
+]
+
+# Firefox preferences turning off what automation never uses
+LEAN_PREFERENCES = {
+    'permissions.default.image': 2,
+    'gfx.downloadable_fonts.enabled': False,
+    'media.autoplay.default': 5,
+    'dom.webnotifications.enabled': False,
+    'geo.enabled': False,
+    'network.prefetch-next': False,
+    'network.dns.disablePrefetch': True,
+    'browser.safebrowsing.malware.enabled': False,
+    'browser.safebrowsing.phishing.enabled': False,
+    'datareporting.healthreport.uploadEnabled': False,
+    'toolkit.telemetry.enabled': False,
+    'app.update.auto': False,
+    'extensions.update.enabled': False,
+    'browser.shell.checkDefaultBrowser': False,
+}
+
+
+def lean_profile(options, blocked_hosts=None):
+    """Set Firefox options so pages load only what the automation uses.
+
+    Images, web fonts and the ad and tracking hosts are blocked, features
+    like notifications and safe browsing turned off and pages counted as
+    loaded once their HTML is parsed, as every step waits for the elements
+    it needs anyway.
+
+    Args:
+        options (obj): Selenium Firefox Options to set.
+        blocked_hosts (str): Comma separated hosts to block as well as
+                             BLOCKED_HOSTS (optional).
+
+    """
+    for name, value in LEAN_PREFERENCES.items():
+        options.set_preference(name, value)
+    hosts = BLOCKED_HOSTS + [host.strip() for host in
+                             (blocked_hosts or '').split(',') if host.strip()]
+    pac = 'data:text/javascript,' + quote(blocking_pac(hosts))
+    options.set_preference('network.proxy.type', 2)
+    options.set_preference('network.proxy.autoconfig_url', pac)
+    options.set_capability('pageLoadStrategy', 'eager')
+
+
+# Profile directories whose lock this process holds, kept until it exits
+held_profiles = {}
+
+# Profile subdirectories holding only caches, which are safe to delete
+PROFILE_CACHES = ['cache2', 'startupCache', 'thumbnails', 'shader-cache',
+                  'sessionstore-backups', 'crashes', 'minidumps',
+                  'datareporting', os.path.join('storage', 'temporary')]
+
+
+def persistent_profile(options, settings):
+    """Set Firefox options to reuse the profile directory setting's profile.
+
+    The browser's HTTP cache, service workers and storage then carry over
+    between runs. The directory is locked for as long as this process runs
+    so another run, or another batch worker, uses a fresh temporary
+    profile instead of sharing it. Every profile_cleanup seconds its caches are
+    trimmed to keep the profile under profile_size bytes.
+
+    Args:
+        options (obj): Selenium Firefox Options to set.
+        settings (dict): Dictionary of user settings.
+
+    Returns:
+        Boolean of whether the persistent profile is used.
+
+    """
+    directory = os.path.abspath(settings['profile'])
+    os.makedirs(directory, exist_ok=True)
+    # Locks taken with flock conflict even within a process, so a second
+    # browser started by this one, such as a batch worker's, is refused too
+    lock = open(os.path.join(directory, 'ligrarian.lock'), 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        print('The browser profile in {} is in use, using a fresh '
+              'one.'.format(directory))
+        return False
+    held_profiles[directory] = lock
+
+    max_bytes = int(settings.get('profile_size') or 200000000)
+    stamp = os.path.join(directory, 'ligrarian.cleanup')
+    try:
+        cleaned = os.path.getmtime(stamp)
+    except OSError:
+        cleaned = 0
+    if time.time() - cleaned > float(settings.get('profile_cleanup') or
+                                     86400):
+        removed = trim_profile(directory, max_bytes)
+        logger.debug('Trimmed %d bytes from the browser profile', removed)
+        with open(stamp, 'w'):
+            pass
+
+    options.add_argument('-profile')
+    options.add_argument(directory)
+    # Firefox keeps its own cache to half the profile's limit between trims
+    options.set_preference('browser.cache.disk.smart_size.enabled', False)
+    options.set_preference('browser.cache.disk.capacity',
+                           max_bytes // 2 // 1024)
+    options.set_preference('browser.sessionstore.resume_from_crash', False)
+    return True
+
+
+def trim_profile(directory, max_bytes):
+    """Delete a profile's oldest cache files until it's within max_bytes.
+
+    Args:
+        directory (str): Path to the profile directory.
+        max_bytes (int): Size to bring the profile down to.
+
+    Returns:
+        Number of bytes removed.
+
+    """
+    total = 0
+    caches = []
+    cache_dirs = tuple(os.path.join(directory, cache) + os.sep
+                       for cache in PROFILE_CACHES)
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            total += stat.st_size
+            if path.startswith(cache_dirs):
+                caches.append((stat.st_mtime, stat.st_size, path))
+
+    removed = 0
+    for _, size, path in sorted(caches):
+        if total - removed <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        removed += size
+    return removed
+
+
+def blocking_pac(hosts):
+    """Return a proxy auto-config script sending requests to hosts nowhere.
+
+    Requests to the hosts, or their subdomains, go through a proxy on the
+    discard port, which refuses them at once. Everything else is direct.
+
+    Args:
+        hosts (list): Host names to block.
+
+    Returns:
+        The script's source.
+
+    """
+    return (
+        'function FindProxyForURL(url, host) {{\n'
+        '  var blocked = {};\n'
+        '  for (var i = 0; i < blocked.length; i++) {{\n'
+        '    if (host == blocked[i] || dnsDomainIs(host, "." + blocked[i]))'
+        ' {{\n'
+        '      return "PROXY 127.0.0.1:9";\n'
+        '    }}\n'
+        '  }}\n'
+        '  return "DIRECT";\n'
+        '}}\n'
+    ).format(json.dumps(hosts))
 
 
 def check_and_prompt_for_email_password(settings_dict):
@@ -359,7 +1046,28 @@ def write_initial_config():
                       'password': ''}
     config['settings'] = {'prompt': 'False',
                           'path': './Ligrarian.xlsx',
-                          'headless': 'False'}
+                          'headless': 'False',
+                          'cookies': './cookies.json',
+                          'workers': '1',
+                          'politeness': '1',
+                          'concurrency': '8',
+                          'fetch_interval': '0.05',
+                          'socket': './ligrarian.sock',
+                          'cache': './cache',
+                          'cache_ttl': '604800',
+                          'cache_size': '50000000',
+                          'store': './books.db',
+                          'store_ttl': '2592000',
+                          'search_ttl': '604800',
+                          'compact_every': '1',
+                          'timeout': '10',
+                          'engine': 'selenium',
+                          'lean': '',
+                          'blocked_hosts': '',
+                          'profile': '',
+                          'profile_size': '200000000',
+                          'profile_cleanup': '86400',
+                          'trace': './trace.json'}
     config['defaults'] = {'format': 'Paperback',
                           'rating': '3'}
     with open('settings.ini', 'w') as configfile:
@@ -385,29 +1093,277 @@ def write_config(email, password, prompt):
         config.write(configfile)
 
 
-def goodreads_login(driver, email, password):
+wait_timeouts = {'default': 10}
+
+
+def configure_waits(settings):
+    """Set the wait timeouts from the user settings.
+
+    The timeout setting changes the default and timeout_<step> settings,
+    e.g. timeout_login, change a single step's.
+
+    Args:
+        settings (dict): Dictionary of user settings.
+
+    """
+    for key, value in settings.items():
+        if key == 'timeout':
+            wait_timeouts['default'] = float(value)
+        elif key.startswith('timeout_'):
+            wait_timeouts[key[8:]] = float(value)
+
+
+def wait_for(driver, condition, step):
+    """Wait for an explicit condition, logging how long it took.
+
+    Args:
+        driver: Selenium webdriver to act upon.
+        condition: Expected condition callable to wait for.
+        step (str): Name of the step waiting, used for its timeout and log.
+
+    Returns:
+        The condition's return value.
+
+    Raises:
+        TimeoutException: Condition not met within the step's timeout.
+
+    """
+    timeout = wait_timeouts.get(step, wait_timeouts['default'])
+    start = time.monotonic()
+    try:
+        result = WebDriverWait(driver, timeout).until(condition)
+    except TimeoutException:
+        logger.debug('%s wait timed out after %.2fs', step,
+                     time.monotonic() - start)
+        raise
+    logger.debug('%s wait took %.2fs', step, time.monotonic() - start)
+    return result
+
+
+def find_element(driver, by, value, step, condition=None):
+    """Wait for an element to be present, then return it.
+
+    Args:
+        driver: Selenium webdriver to act upon.
+        by (str): Selenium By locator strategy.
+        value (str): Locator value.
+        step (str): Name of the step waiting, used for its timeout and log.
+        condition: Expected condition to wait for instead of presence
+                   (optional), e.g. EC.element_to_be_clickable.
+
+    Returns:
+        The element.
+
+    Raises:
+        NoSuchElementException: Element not found within the timeout.
+
+    """
+    condition = condition or EC.presence_of_element_located
+    try:
+        return wait_for(driver, condition((by, value)), step)
+    except TimeoutException:
+        raise NoSuchElementException(
+            'No element {}={} after waiting'.format(by, value))
+
+
+def is_present(driver, by, value):
+    """Return whether an element is on the current page without waiting.
+
+    For checks where absence is an expected answer, so there's nothing to
+    gain from waiting for the element to appear.
+
+    Args:
+        driver: Selenium webdriver to act upon.
+        by (str): Selenium By locator strategy.
+        value (str): Locator value.
+
+    Returns:
+        Boolean
+
+    """
+    return bool(driver.find_elements(by, value))
+
+
+QUERY_SCRIPT = """
+var selector = arguments[0], attributes = arguments[1],
+    withText = arguments[2], withElement = arguments[3];
+return Array.prototype.map.call(
+    document.querySelectorAll(selector), function (element) {
+        var found = {};
+        attributes.forEach(function (name) {
+            found[name] = element.getAttribute(name);
+        });
+        if (withText) {
+            found.text = element.innerText;
+        }
+        if (withElement) {
+            found.element = element;
+        }
+        return found;
+    });
+"""
+
+
+def query_dom(driver, selector, attributes=(), text=False, elements=False):
+    """Return details of every element matching selector in one round trip.
+
+    Reading attributes from WebElements costs a request to the browser per
+    element and attribute, whereas this runs a single script in the page.
+
+    Args:
+        driver: Selenium webdriver to act upon.
+        selector (str): CSS selector of the elements.
+        attributes (iterable): Names of the attributes to return.
+        text (bool): Whether to return the elements' rendered text as well.
+        elements (bool): Whether to return the WebElements as well, for
+            acting on a chosen match without finding it again.
+
+    Returns:
+        List of dictionaries of attribute name (and 'text' and 'element') to
+        value, one per element in document order.
+
+    """
+    return driver.execute_script(QUERY_SCRIPT, selector, list(attributes),
+                                 text, elements)
+
+
+@traced
+def goodreads_login(driver, email, password, cookie_path=None):
     """Login to Goodreads account from the homepage.
 
+    Saved session cookies are tried first when a cookie_path is given, with
+    the login form only used if they are missing, expired, saved for another
+    account or rejected. The cookies of a successful form login are then
+    saved for the next run.
+
     Args:
         driver: Selenium webdriver to act upon.
         email (str): Email address to be entered.
         password (str): Password to be entered.
+        cookie_path (str): Path to the cookie jar file (optional).
 
     """
-    driver.get('https://goodreads.com')
+    if isinstance(driver, GoodreadsSession):
+        driver.login(email, password, cookie_path)
+        return
 
-    driver.find_element_by_name('user[email]').send_keys(email)
-    pass_elem = driver.find_element_by_name('user[password]')
+    if cookie_path and goodreads_cookie_login(driver, cookie_path, email):
+        return
+
+    driver.get(GOODREADS)
+
+    find_element(driver, By.NAME, 'user[email]', 'login').send_keys(email)
+    pass_elem = find_element(driver, By.NAME, 'user[password]', 'login')
     pass_elem.send_keys(password, Keys.ENTER)
 
     try:
-        driver.find_element_by_class_name('siteHeader__personal')
+        find_element(driver, By.CLASS_NAME, 'siteHeader__personal', 'login')
     except NoSuchElementException:
         print('Failed to login - Email and/or Password probably incorrect.')
         driver.close()
         sys.exit()
 
+    if cookie_path:
+        save_cookies(driver, cookie_path, email)
+
+
+def goodreads_cookie_login(driver, cookie_path, email):
+    """Login to Goodreads by injecting previously saved session cookies.
+
+    Args:
+        driver: Selenium webdriver to act upon.
+        cookie_path (str): Path to the cookie jar file.
+        email (str): Email address of the account being logged into.
+
+    Returns:
+        Boolean of whether the saved cookies gave a logged in session.
+
+    """
+    cookies = load_cookies(cookie_path, email)
+    if not cookies:
+        return False
+
+    # Cookies can only be added for the domain currently loaded
+    driver.get(GOODREADS)
+    for cookie in cookies:
+        driver.add_cookie(cookie)
+    driver.get(GOODREADS)
+
+    # The page has loaded so there's no need to wait for the header
+    if is_present(driver, By.CLASS_NAME, 'siteHeader__personal'):
+        return True
+    print('Saved login expired - logging in with Email and Password.')
+    driver.delete_all_cookies()
+    return False
+
+
+def load_cookies(cookie_path, email):
+    """Read the saved cookies, dropping any that have expired.
+
+    Args:
+        cookie_path (str): Path to the cookie jar file.
+        email (str): Email address of the account being logged into.
+
+    Returns:
+        List of cookie dictionaries, empty if none are saved for the
+        account or still valid.
+
+    """
+    try:
+        with open(cookie_path) as cookie_file:
+            jar = json.load(cookie_file)
+    except (FileNotFoundError, ValueError):
+        return []
+
+    # Jars saved before the account was recorded can't be trusted either
+    if jar.get('email') != email.strip().lower():
+        return []
+    now = time.time()
+    if jar.get('expires') and jar['expires'] < now:
+        return []
+    cookies = []
+    for cookie in jar.get('cookies', []):
+        if cookie.get('expiry') is None:
+            # Jars saved by the http engine held null expiries, which
+            # WebDriver rejects
+            cookie.pop('expiry', None)
+        elif cookie['expiry'] <= now:
+            continue
+        cookies.append(cookie)
+    return cookies
+
+
+def save_cookies(driver, cookie_path, email):
+    """Save the driver's session cookies with their expiry metadata.
+
+    The jar records the account's email address, so a jar isn't used after
+    the email setting changes, along with when it was saved and when its
+    last cookie expires so stale jars can be discarded without being tried.
+    The file is readable by the current user only as the cookies grant
+    access to the account.
 
+    Args:
+        driver: Selenium webdriver to act upon.
+        cookie_path (str): Path to the cookie jar file.
+        email (str): Email address of the account logged into.
+
+    """
+    cookies = driver.get_cookies()
+    expiries = [cookie['expiry'] for cookie in cookies
+                if cookie.get('expiry')]
+    jar = {
+        'email': email.strip().lower(),
+        'saved': int(time.time()),
+        'expires': max(expiries) if expiries else None,
+        'cookies': cookies,
+    }
+    descriptor = os.open(cookie_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o600)
+    with open(descriptor, 'w') as cookie_file:
+        json.dump(jar, cookie_file)
+
+
+@traced
 def goodreads_find(driver, terms):
     """Find the book on Goodreads and navigate to all editions page.
 
@@ -419,17 +1375,19 @@ def goodreads_find(driver, terms):
         NoSuchElementException: Search terms yields no results.
 
     """
-    search_elem = driver.find_element_by_class_name('searchBox__input')
+    search_elem = find_element(driver, By.CLASS_NAME, 'searchBox__input',
+                               'search')
     search_elem.send_keys(terms, Keys.ENTER)
 
     try:
-        driver.find_element_by_partial_link_text('edition').click()
+        find_element(driver, By.PARTIAL_LINK_TEXT, 'edition', 'search',
+                     EC.element_to_be_clickable).click()
     except NoSuchElementException:
         print("Failed to find book using those search terms.")
-        driver.close()
-        sys.exit()
+        raise
 
 
+@traced
 def goodreads_filter(driver, book_format):
     """Filter editions with book_format and select top book.
 
@@ -444,50 +1402,67 @@ def goodreads_filter(driver, book_format):
     pre_filter_url = driver.current_url
 
     # Filter by format
-    filter_elem = driver.find_element_by_name('filter_by_format')
+    filter_elem = find_element(driver, By.NAME, 'filter_by_format', 'filter')
     filter_elem.click()
     filter_elem.send_keys(book_format, Keys.ENTER)
 
     # Make sure filtered page is loaded before clicking top book
-    WebDriverWait(driver, 10).until(
-        EC.url_changes((pre_filter_url))
-    )
+    wait_for(driver, EC.url_changes(pre_filter_url), 'filter')
 
     # Select top book
-    driver.find_element_by_class_name('bookTitle').click()
+    find_element(driver, By.CLASS_NAME, 'bookTitle', 'filter',
+                 EC.element_to_be_clickable).click()
+    wait_for(driver, EC.presence_of_element_located((By.ID, 'bookTitle')),
+             'book_page')
 
     return driver.current_url
 
 
-def goodreads_get_shelves(driver, rating):
-    """Find and return list of 'Top Shelves' on Goodreads book page.
+@traced
+def goodreads_get_book_info(driver, rating, store=None, metadata=None):
+    """Extract the book's details from the driver's current page source.
+
+    The page the driver has already loaded is read once and parsed for
+    everything needed, rather than scraping the shelves element by element
+    and downloading the page again for the spreadsheet information. Books
+    already in the store are taken from it without parsing the page.
 
     Args:
         driver: Selenium webdriver to act upon.
         rating (str): String representation of a number 1-5.
+        store (obj): BookStore of previously parsed books (optional).
+        metadata (obj): Future of parse_book_html parsing the page in the
+                        background (optional), the current page being
+                        parsed instead if it fails.
 
     Returns:
-        list of strings of the 'shelve' categories on the current driver page.
+        Dictionary of Title, Author, Number of Pages and list of Shelves.
 
     """
-    shelves_elems = driver.find_elements_by_class_name('actionLinkLite.'
-                                                       'bookPageGenreLink')
-    shelves = []
-    for shelf in shelves_elems:
-        if ' users' not in shelf.text and shelf.text not in shelves:
-            shelves.append(shelf.text)
-
+    url = driver.current_url
+    info = store.get(url) if store else None
+    if info is None:
+        if metadata is not None:
+            try:
+                info = metadata.result()
+            except ValueError as error:
+                logger.debug('Background parse of %s failed - %s', url, error)
+        if info is None:
+            info = parse_book_html(driver.page_source)
+        if store:
+            store.put(url, info)
     if rating == '5':
-        shelves.append('5-star-books')
+        info['shelves'].append('5-star-books')
 
-    return shelves
+    return info
 
 
 def goodreads_get_shelved_status(driver):
     """Return whether the book is currently shelved.
 
     Unshelved books have the class 'wtrRight.wtrUp' which shelved do not so
-    they can be differentatied by trying to find this element.
+    they can be differentatied by checking for this element. The book page
+    has already loaded so its absence is checked for without waiting.
 
     Args:
         driver: Selenium webdriver to act upon.
@@ -496,13 +1471,10 @@ def goodreads_get_shelved_status(driver):
         Boolean
 
     """
-    try:
-        driver.find_element_by_class_name('wtrRight.wtrUp')
-        return False
-    except NoSuchElementException:
-        return True
+    return not is_present(driver, By.CLASS_NAME, 'wtrRight.wtrUp')
 
 
+@traced
 def goodreads_date_input(driver, date_done, reread):
     """Select completion date on review page, add new selectors for rereads.
 
@@ -514,23 +1486,26 @@ def goodreads_date_input(driver, date_done, reread):
 
     """
     book_code = driver.current_url.split('/')[-1]
-    driver.get("https://www.goodreads.com/review/edit/{}".format(book_code))
+    driver.get("{}/review/edit/{}".format(GOODREADS, book_code))
 
     # If it's a reread need to create new session selectors
     if reread:
-        driver.find_element_by_id('readingSessionAddLink').click()
+        find_element(driver, By.ID, 'readingSessionAddLink', 'review_page',
+                     EC.element_to_be_clickable).click()
         # More details loaded for Explicit Wait
-        driver.find_element_by_class_name('smallLink.closed').click()
-        WebDriverWait(driver, 10).until(
-            EC.visibility_of_element_located((By.ID, "review_recommendation"))
-        )
-
-    # Find reading session codes from all ids then use last one for date entry
-    reread_codes = []
-    for id_elem in driver.find_elements_by_xpath('//*[@id]'):
-        id_attribute = id_elem.get_attribute('id')
-        if 'readingSessionEntry' in id_attribute:
-            reread_codes.append(id_attribute)
+        find_element(driver, By.CLASS_NAME, 'smallLink.closed', 'review_page',
+                     EC.element_to_be_clickable).click()
+        wait_for(driver, EC.visibility_of_element_located(
+            (By.ID, "review_recommendation")), 'review_page')
+    else:
+        wait_for(driver, EC.presence_of_element_located(
+            (By.NAME, 'review[review]')), 'review_page')
+
+    # Find reading session codes then use last one for date entry
+    reread_codes = [
+        element['id']
+        for element in query_dom(driver, '[id*="readingSessionEntry"]', ['id'])
+    ]
     new_read_code = reread_codes[-1][19:]
 
     # Date Formatting and Selection
@@ -542,16 +1517,17 @@ def goodreads_date_input(driver, date_done, reread):
     month_name = 'readingSessionDatePicker{}[end][month]'.format(new_read_code)
     day_name = 'readingSessionDatePicker{}[end][day]'.format(new_read_code)
 
-    Select(driver.find_element_by_name(year_name)
+    Select(find_element(driver, By.NAME, year_name, 'review_page')
            ).select_by_visible_text(year)
 
-    Select(driver.find_element_by_name(month_name)
+    Select(find_element(driver, By.NAME, month_name, 'review_page')
            ).select_by_value(month)
 
-    Select(driver.find_element_by_name(day_name)
+    Select(find_element(driver, By.NAME, day_name, 'review_page')
            ).select_by_visible_text(day)
 
 
+@traced
 def goodreads_add_review(driver, review):
     """Write review in review box (if given).
 
@@ -560,12 +1536,14 @@ def goodreads_add_review(driver, review):
         review (str): Review of the book.
 
     """
-    review_elem = driver.find_element_by_name('review[review]')
+    review_elem = find_element(driver, By.NAME, 'review[review]',
+                               'review_page')
     review_elem.clear()
     review_elem.click()
     review_elem.send_keys(review)
 
 
+@traced
 def goodreads_rate_book(driver, rating):
     """Give the book the given rating out of 5.
 
@@ -574,14 +1552,18 @@ def goodreads_rate_book(driver, rating):
         rating (str): A number 1-5.
 
     """
+    # Wait for the stars, some of which are 'on' for previously rated books
+    wait_for(driver, EC.presence_of_element_located((By.CLASS_NAME, 'star')),
+             'rating')
+
     # Give star rating
-    stars_elem = driver.find_elements_by_class_name('star.off')
-    for stars in stars_elem:
-        if stars.text.strip() == '{} of 5 stars'.format(rating):
-            stars.click()
+    for star in query_dom(driver, '.star.off', text=True, elements=True):
+        if star['text'].strip() == '{} of 5 stars'.format(rating):
+            star['element'].click()
             break
 
 
+@traced
 def goodreads_shelve(driver, shelves):
     """Add the Goodreads book to relevant user shelves.
 
@@ -594,14 +1576,15 @@ def goodreads_shelve(driver, shelves):
 
     """
     # Wait until review box is invisible
-    WebDriverWait(driver, 10).until(
-        EC.invisibility_of_element_located((By.ID, "box"))
-    )
+    wait_for(driver, EC.invisibility_of_element_located((By.ID, "box")),
+             'shelve')
 
     # Select shelves
-    menu_elem = driver.find_element_by_class_name('wtrShelfButton')
+    menu_elem = find_element(driver, By.CLASS_NAME, 'wtrShelfButton',
+                             'shelve', EC.element_to_be_clickable)
     menu_elem.click()
-    shelf_elem = driver.find_element_by_class_name('wtrShelfSearchField')
+    shelf_elem = find_element(driver, By.CLASS_NAME, 'wtrShelfSearchField',
+                              'shelve', EC.visibility_of_element_located)
 
     for shelf in shelves:
         shelf_elem.send_keys(shelf, Keys.ENTER)
@@ -609,118 +1592,1591 @@ def goodreads_shelve(driver, shelves):
 
     # Close dropdown and wait until it disappears
     menu_elem.click()
-    WebDriverWait(driver, 10).until(
-        EC.invisibility_of_element_located((By.CLASS_NAME, "wtrShelfList"))
-    )
+    wait_for(driver, EC.invisibility_of_element_located(
+        (By.CLASS_NAME, "wtrShelfList")), 'shelve')
 
 
-def parse_page(url):
-    """Parse Goodreads page for title, author and number of pages.
+@traced
+def goodreads_update(driver, details, store=None, executor=None):
+    """Mark a book as read on Goodreads using an already logged in driver.
+
+    Given an executor, the book page the browser has loaded is parsed in
+    the background, overlapping the review page and rating steps, rather
+    than before them.
 
     Args:
-        url (str): Goodreads Book URL.
+        driver: Selenium webdriver to act upon.
+        details (dict): Book details - url or search and format, date,
+                        rating and optional review.
+        store (obj): BookStore of previously parsed books and resolved
+                     searches (optional).
+        executor (obj): concurrent.futures Executor to parse the book's
+                        details with (optional).
 
     Returns:
-        Dictionary of parsed Title, Author and Number of Pages.
+        Tuple of the book's URL and dictionary of its title, author, number
+        of pages and shelves.
 
     """
-    info = {}
-    res = requests.get(url)
-    res.raise_for_status()
-    soup = bs4.BeautifulSoup(res.text, 'html.parser')
+    if isinstance(driver, GoodreadsSession):
+        return driver.update(details, store)
+
+    metadata = None
+    url = details.get('url')
+    if not url and store:
+        # A repeated search goes straight to the edition it resolved to
+        url = store.get_search(details['search'], details['format'])
+    if url:
+        driver.get(url)
+    else:
+        goodreads_find(driver, details['search'])
+        url = goodreads_filter(driver, details['format'])
+        if store:
+            store.put_search(details['search'], details['format'], url)
 
-    title_elem = soup.select('#bookTitle')
-    rough_title = title_elem[0].getText().strip().split('\n')
-    if len(rough_title) == 1:
-        info['title'] = rough_title[0].strip()
+    if executor and not (store and store.get(url)):
+        metadata = executor.submit(parse_book_html, driver.page_source)
     else:
-        info['title'] = rough_title[0].strip() + ' ' + rough_title[2].strip()
+        info = goodreads_get_book_info(driver, details['rating'], store)
+
+    shelved_status = goodreads_get_shelved_status(driver)
 
-    info['author'] = soup.select('.authorName')[0].getText().strip()
+    goodreads_date_input(driver, details['date'], shelved_status)
 
-    pages_elem = soup.findAll('span', attrs={'itemprop': 'numberOfPages'})
-    info['pages'] = int(pages_elem[0].getText().strip(' pages'))
+    if details.get('review'):
+        goodreads_add_review(driver, details['review'])
 
-    return info
+    find_element(driver, By.NAME, 'next', 'review_page').click()
+    driver.get(url)
+    goodreads_rate_book(driver, details['rating'])
 
+    if metadata is not None:
+        info = goodreads_get_book_info(driver, details['rating'], store,
+                                       metadata)
 
-def category_and_genre(shelves):
-    """Use shelves list to deterime genre and categorise as Fiction/Nonfiction.
+    if not shelved_status:
+        goodreads_shelve(driver, info['shelves'])
 
-    Args:
-        shelves (list): List of strings of Goodreads shelf categories.
+    return (url, info)
 
-    Returns:
-        Tuple of category (Fiction/Nonfiction) and the books genre.
 
+class GoodreadsSession:
+    """Browserless engine updating Goodreads with plain HTTP requests.
+
+    Follows the same pages as the Selenium flow but submits their forms, and
+    the requests made by the rating and shelf widgets, directly with the
+    authenticity tokens read from the HTML, so there's no browser to start
+    and no page assets or scripts to load. create_driver returns one for
+    the http engine and goodreads_login and goodreads_update accept it in
+    place of a webdriver, with failures raising the same Selenium exceptions.
     """
-    if 'Nonfiction' in shelves:
-        category = 'Nonfiction'
-    else:
-        category = 'Fiction'
 
-    for shelf in shelves:
-        if shelf != category:
-            genre = shelf
-            break
+    def __init__(self, base_url=None):
+        """GoodreadsSession class constructor to initialise GoodreadsSession.
 
-    return (category, genre)
+        Args:
+            base_url (str): Address of Goodreads, or a stand-in for it,
+                            defaulting to GOODREADS.
 
+        """
+        self.base_url = (base_url or GOODREADS).rstrip('/') + '/'
+        self.session = requests.Session()
+        self.current_url = None
+        self.page_source = ''
+        self.token = None
 
-def check_year_sheet_exists(path, year_sheet):
-    """Check year_sheet exists in path workbook, call create if not.
+    def request(self, method, url, **kwargs):
+        """Make a request relative to the current page and return it.
 
-    Args:
-        path (str): Path to spreadsheet to check
-        year_sheet (str): The year the book was read formatted YYYY.
+        Raises:
+            WebDriverException: The request failed or was refused.
 
-    Return:
-        workbook (obj): openpyxl workbook object.
+        """
+        url = urljoin(self.current_url or self.base_url, url)
+        try:
+            response = self.session.request(
+                method, url, timeout=wait_timeouts['default'], **kwargs
+            )
+            response.raise_for_status()
+        except requests.RequestException as error:
+            raise WebDriverException('{} {} failed - {}'.format(
+                method, url, error))
+        return response
 
-    """
-    workbook = openpyxl.load_workbook(path)
+    def open(self, url, method='GET', **kwargs):
+        """Load a page as the current one and return its parsed HTML.
 
-    existing_sheets = workbook.sheetnames
+        Args:
+            url (str): Address of the page, relative to the current page.
+            method (str): HTTP method, POST for submitting forms.
+
+        Returns:
+            BeautifulSoup of the page.
+
+        """
+        response = self.request(method, url, **kwargs)
+        self.current_url = response.url
+        self.page_source = response.text
+        page = bs4.BeautifulSoup(response.text, 'html.parser')
+        token = page.find('meta', attrs={'name': 'csrf-token'})
+        if token:
+            self.token = token.get('content')
+        return page
+
+    def post_widget(self, url, data):
+        """Send the request a page's script makes, e.g. for a star click."""
+        return self.request('POST', url, data=data, headers={
+            'X-CSRF-Token': self.token or '',
+            'X-Requested-With': 'XMLHttpRequest',
+        })
+
+    def submit(self, form, fields, method=None):
+        """Submit a form with the given field values, returning the result.
+
+        Args:
+            form (obj): BeautifulSoup of the form element.
+            fields (dict): Field names and values to send.
+            method (str): HTTP method to use instead of the form's own.
+
+        """
+        method = (method or form.get('method') or 'GET').upper()
+        action = form.get('action') or self.current_url
+        if method == 'GET':
+            return self.open(action, params=fields)
+        return self.open(action, 'POST', data=fields)
+
+    def get_cookies(self):
+        """Return the session cookies in the webdriver's format.
+
+        WebDriver rejects a null expiry, so session cookies have none.
+        """
+        cookies = []
+        for cookie in self.session.cookies:
+            webdriver_cookie = {'name': cookie.name, 'value': cookie.value,
+                                'domain': cookie.domain, 'path': cookie.path,
+                                'secure': cookie.secure}
+            if cookie.expires is not None:
+                webdriver_cookie['expiry'] = cookie.expires
+            cookies.append(webdriver_cookie)
+        return cookies
+
+    def add_cookie(self, cookie):
+        """Add a cookie in the webdriver's format to the session."""
+        self.session.cookies.set(cookie['name'], cookie['value'],
+                                 domain=cookie.get('domain', ''),
+                                 path=cookie.get('path', '/'),
+                                 expires=cookie.get('expiry'),
+                                 secure=cookie.get('secure', False))
+
+    def close(self):
+        """Close the session's connections."""
+        self.session.close()
+
+    @traced
+    def login(self, email, password, cookie_path=None):
+        """Login to Goodreads, trying the saved cookies first.
+
+        The cookie jar is shared with the Selenium engine.
+
+        Args:
+            email (str): Email address to be entered.
+            password (str): Password to be entered.
+            cookie_path (str): Path to the cookie jar file (optional).
+
+        """
+        cookies = load_cookies(cookie_path, email) if cookie_path else []
+        for cookie in cookies:
+            self.add_cookie(cookie)
+        page = self.open(self.base_url)
+        if page.select('.siteHeader__personal'):
+            return
+        if cookies:
+            print('Saved login expired - logging in with Email and Password.')
+            self.session.cookies.clear()
+            page = self.open(self.base_url)
+
+        try:
+            form = page.find('input', attrs={'name': 'user[email]'}
+                             ).find_parent('form')
+        except AttributeError:
+            raise NoSuchElementException('No login form on {}'.format(
+                self.current_url))
+        fields = form_fields(form)
+        fields.update({'user[email]': email, 'user[password]': password})
+        page = self.submit(form, fields)
+
+        if not page.select('.siteHeader__personal'):
+            print('Failed to login - Email and/or Password probably '
+                  'incorrect.')
+            self.close()
+            sys.exit()
+
+        if cookie_path:
+            save_cookies(self, cookie_path, email)
+
+    @traced
+    def find(self, terms, book_format):
+        """Search for the book and return the top edition in book_format.
+
+        Args:
+            terms (str): Terms to be used in the Goodreads search.
+            book_format (str): The format of the book.
+
+        Returns:
+            Tuple of the edition's URL and the BeautifulSoup of its page.
+
+        Raises:
+            NoSuchElementException: Search terms yields no results.
+
+        """
+        page = self.open('search', params={'q': terms})
+        editions = page.find(
+            lambda tag: tag.name == 'a' and 'edition' in tag.get_text()
+        )
+        if editions is None:
+            print("Failed to find book using those search terms.")
+            raise NoSuchElementException('No editions link for {}'.format(
+                terms))
+        page = self.open(editions['href'])
+
+        # Choose the format as typing it into the dropdown would
+        select = page.find('select', attrs={'name': 'filter_by_format'})
+        if select is None:
+            raise NoSuchElementException('No format filter on {}'.format(
+                self.current_url))
+        fields = form_fields(select.find_parent('form'))
+        fields['filter_by_format'] = typed_option(select, book_format)
+        page = self.submit(select.find_parent('form'), fields, 'GET')
+
+        top_book = page.select_one('a.bookTitle')
+        if top_book is None:
+            raise NoSuchElementException('No {} editions on {}'.format(
+                book_format, self.current_url))
+        url = urljoin(self.current_url, top_book['href'])
+        return url, self.open(url)
+
+    @traced
+    def update(self, details, store=None):
+        """Mark a book as read on Goodreads, see goodreads_update.
+
+        Args:
+            details (dict): Book details - url or search and format, date,
+                            rating and optional review.
+            store (obj): BookStore of previously parsed books and
+                         resolved searches (optional).
+
+        Returns:
+            Tuple of the book's URL and dictionary of its title, author,
+            number of pages and shelves.
+
+        """
+        url = details.get('url')
+        if not url and store:
+            url = store.get_search(details['search'], details['format'])
+        if url:
+            page = self.open(url)
+        else:
+            url, page = self.find(details['search'], details['format'])
+            if store:
+                store.put_search(details['search'], details['format'], url)
+
+        info = store.get(url) if store else None
+        if info is None:
+            info = parse_book_html(self.page_source)
+            if store:
+                store.put(url, info)
+        if details['rating'] == '5':
+            info['shelves'].append('5-star-books')
+
+        shelved_status = not page.select('.wtrRight.wtrUp')
+
+        self.edit_review(url, details['date'], shelved_status,
+                         details.get('review'))
+
+        self.rate(self.open(url), details['rating'])
+
+        if not shelved_status:
+            for shelf in info['shelves']:
+                self.post_widget('/shelf/add_to_shelf',
+                                 {'book_id': book_id(url), 'name': shelf})
+
+        return (url, info)
+
+    @traced
+    def edit_review(self, url, date_done, reread, review=None):
+        """Submit the review page with the completion date and review.
+
+        Rereads get a new reading session, as the page's 'Add a new read
+        date' link creates, rather than changing the last one's date.
+
+        Args:
+            url (str): URL of the book.
+            date_done (str): Date formatted DD/MM/YYYY.
+            reread (bool): Whether the book has been read before.
+            review (str): Review of the book (optional).
+
+        """
+        page = self.open('/review/edit/{}'.format(url.split('/')[-1]))
+        try:
+            form = page.find(attrs={'name': 'review[review]'}
+                             ).find_parent('form')
+        except AttributeError:
+            raise NoSuchElementException('No review form on {}'.format(
+                self.current_url))
+        fields = form_fields(form)
+
+        sessions = [entry['id'][19:] for entry in
+                    form.select('[id*="readingSessionEntry"]')]
+        if reread or not sessions:
+            read_code = 'new{}'.format(len(sessions))
+        else:
+            read_code = sessions[-1]
+
+        year = date_done[6:]
+        month = date_done[3:5].lstrip('0')
+        day = date_done[:2].lstrip('0')
+        picker = 'readingSessionDatePicker{}[end][{{}}]'.format(read_code)
+        fields[picker.format('year')] = year
+        fields[picker.format('month')] = month
+        fields[picker.format('day')] = day
+
+        if review:
+            fields['review[review]'] = review
+        button = form.find(attrs={'name': 'next'})
+        if button is not None:
+            fields['next'] = button.get('value', '')
+        self.submit(form, fields)
+
+    @traced
+    def rate(self, page, rating):
+        """Give the book on page the given rating out of 5.
+
+        As with the browser a star already 'on' for the rating isn't
+        clicked again.
+
+        Args:
+            page (obj): BeautifulSoup of the book page.
+            rating (str): A number 1-5.
+
+        """
+        stars = page.find(class_='stars', attrs={'data-submit-url': True})
+        if stars is None:
+            raise NoSuchElementException('No rating stars on {}'.format(
+                self.current_url))
+        for star in stars.select('.star.off'):
+            if star.get_text().strip() == '{} of 5 stars'.format(rating):
+                self.post_widget(stars['data-submit-url'], {'rating': rating})
+                break
+
+
+def form_fields(form):
+    """Return the field values a browser would submit for an HTML form.
+
+    Args:
+        form (obj): BeautifulSoup of the form element.
+
+    Returns:
+        Dictionary of field name to value.
+
+    """
+    fields = {}
+    for field in form.find_all(['input', 'select', 'textarea']):
+        name = field.get('name')
+        if not name or field.has_attr('disabled'):
+            continue
+        if field.name == 'select':
+            options = field.find_all('option')
+            chosen = [option for option in options
+                      if option.has_attr('selected')] or options[:1]
+            if chosen:
+                fields[name] = chosen[0].get('value',
+                                             chosen[0].get_text().strip())
+        elif field.name == 'textarea':
+            fields[name] = field.get_text()
+        elif field.get('type') in ('checkbox', 'radio'):
+            if field.has_attr('checked'):
+                fields[name] = field.get('value', 'on')
+        elif field.get('type') not in ('submit', 'button', 'image', 'reset'):
+            fields[name] = field.get('value', '')
+    return fields
+
+
+def typed_option(select, typed):
+    """Return the value of the option typing into a dropdown would choose.
+
+    Args:
+        select (obj): BeautifulSoup of the select element.
+        typed (str): Text typed into the dropdown, e.g. 'k' or 'Kindle'.
+
+    Returns:
+        Value of the option whose text starts with the most of typed.
+
+    Raises:
+        NoSuchElementException: No option starts with what was typed.
+
+    """
+    typed = typed.lower()
+    best, matched = None, 0
+    for option in select.find_all('option'):
+        text = option.get_text().strip()
+        common = len(os.path.commonprefix([text.lower(), typed]))
+        if common > matched:
+            best, matched = option.get('value', text), common
+    if best is None:
+        raise NoSuchElementException('No option for {}'.format(typed))
+    return best
+
+
+def book_id(url):
+    """Return the Goodreads book ID from a book URL.
+
+    Args:
+        url (str): Goodreads Book URL e.g. .../book/show/4406.East_of_Eden
+
+    Returns:
+        The book's ID or, for URLs without one, a hash of the URL.
+
+    """
+    match = re.search(r'/book/show/(\d+)', url)
+    if match:
+        return match.group(1)
+    return hashlib.sha1(url.encode()).hexdigest()
+
+
+class PageCache:
+    """Compressed on-disk cache of Goodreads pages keyed by book ID.
+
+    Entries younger than the TTL are used without a request. Older ones are
+    revalidated with their ETag/Last-Modified so an unchanged page costs a
+    304 rather than a download. Once the cache grows past max_bytes the
+    least recently used entries are removed.
+
+    Only fetch-metadata downloads pages outside the browser or the http
+    engine's session, so it's the cache's only user. Those engines' pages
+    carry the account's shelves and form tokens and have to be fresh.
+    """
+
+    def __init__(self, directory, ttl=604800, max_bytes=50000000):
+        """PageCache class constructor to initialise PageCache object.
+
+        Args:
+            directory (str): Directory to store the cached pages in.
+            ttl (float): Seconds a page is used without revalidating it.
+            max_bytes (int): Size the cache is kept below.
+
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Create the cache described by the user settings, if enabled.
+
+        Args:
+            settings (dict): Dictionary of user settings.
+
+        Returns:
+            PageCache or None if there's no cache setting.
+
+        """
+        if not settings.get('cache'):
+            return None
+        return cls(settings['cache'],
+                   float(settings.get('cache_ttl') or 604800),
+                   int(settings.get('cache_size') or 50000000))
+
+    def entry_path(self, url):
+        """Return the path of the cache file for url."""
+        return os.path.join(self.directory, book_id(url) + '.json.gz')
+
+    def read(self, url):
+        """Return the cached entry for url or None if there isn't one."""
+        try:
+            with gzip.open(self.entry_path(url), 'rt') as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url:
+            return None
+        return entry
+
+    def write(self, url, entry):
+        """Save entry for url then evict entries if over the size limit."""
+        entry['url'] = url
+        path = self.entry_path(url)
+        temp_path = path + '.tmp'
+        with gzip.open(temp_path, 'wt') as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until under max_bytes."""
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json.gz'):
+                    continue
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+
+    def fetch(self, url, session):
+        """Return the text of url, from the cache where it's still valid.
+
+        Args:
+            url (str): URL of the page to fetch.
+            session (obj): requests Session to fetch with.
+
+        Returns:
+            The page's HTML.
+
+        Raises:
+            requests.HTTPError: The page couldn't be fetched.
+
+        """
+        entry = self.read(url)
+        now = time.time()
+        if entry and now - entry['fetched'] < self.ttl:
+            # Modification time marks use for least recently used eviction
+            os.utime(self.entry_path(url))
+            return entry['text']
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        res = session.get(url, headers=headers)
+        if entry and res.status_code == 304:
+            entry['fetched'] = now
+        else:
+            res.raise_for_status()
+            entry = {
+                'etag': res.headers.get('ETag'),
+                'last_modified': res.headers.get('Last-Modified'),
+                'fetched': now,
+                'text': res.text,
+            }
+        self.write(url, entry)
+
+        return entry['text']
+
+
+@traced
+def fetch_page(url, session, cache=None):
+    """Return the HTML of url, through the cache when one is given.
+
+    Args:
+        url (str): URL of the page to fetch.
+        session (obj): requests Session to fetch with.
+        cache (obj): PageCache to use (optional).
+
+    Returns:
+        The page's HTML.
+
+    """
+    if cache:
+        return cache.fetch(url, session)
+    res = session.get(url)
+    res.raise_for_status()
+    return res.text
+
+
+def parse_book_html(html):
+    """Parse a Goodreads book page's HTML for the book's details.
+
+    Uses lxml when it's installed, falling back to BeautifulSoup restricted
+    to just the tags holding the details otherwise.
+
+    Args:
+        html (str): Source of a Goodreads book page.
+
+    Returns:
+        Dictionary of parsed Title, Author, Number of Pages and list of
+        'Top Shelves'.
+
+    Raises:
+        ValueError: The page is missing the title, author or page count.
+
+    """
+    if lxml_html:
+        return parse_book_lxml(html)
+    return parse_book_soup(html)
+
+
+def book_strainer(name, attrs):
+    """Match only the tags parse_book_soup reads the book's details from.
+
+    Args:
+        name (str): Tag name.
+        attrs (dict): Tag attributes.
+
+    Returns:
+        Boolean of whether the tag is needed.
+
+    """
+    classes = attrs.get('class') or ''
+    if isinstance(classes, str):
+        classes = classes.split()
+    return (attrs.get('id') == 'bookTitle' or 'authorName' in classes or
+            (name == 'span' and attrs.get('itemprop') == 'numberOfPages') or
+            'bookPageGenreLink' in classes)
+
+
+def parse_book_soup(html):
+    """Parse the book's details with BeautifulSoup.
+
+    Only the tags matched by book_strainer are built into the tree, rather
+    than the whole page.
+
+    Args:
+        html (str): Source of a Goodreads book page.
+
+    Returns:
+        Dictionary of parsed Title, Author, Number of Pages and Shelves.
+
+    """
+    soup = bs4.BeautifulSoup(html, 'html.parser',
+                             parse_only=bs4.SoupStrainer(book_strainer))
+    title = soup.select('#bookTitle')
+    author = soup.select('.authorName')
+    pages = soup.select('span[itemprop="numberOfPages"]')
+
+    return book_info(
+        title[0].getText() if title else None,
+        author[0].getText() if author else None,
+        pages[0].getText() if pages else None,
+        [shelf.getText()
+         for shelf in soup.select('.actionLinkLite.bookPageGenreLink')]
+    )
+
+
+def parse_book_lxml(html):
+    """Parse the book's details with lxml.
+
+    Args:
+        html (str): Source of a Goodreads book page.
+
+    Returns:
+        Dictionary of parsed Title, Author, Number of Pages and Shelves.
+
+    """
+    doc = lxml_html.fromstring(html)
+    title = doc.xpath('//*[@id="bookTitle"]')
+    author = doc.find_class('authorName')
+    pages = doc.xpath('//span[@itemprop="numberOfPages"]')
+
+    return book_info(
+        title[0].text_content() if title else None,
+        author[0].text_content() if author else None,
+        pages[0].text_content() if pages else None,
+        [shelf.text_content() for shelf in doc.find_class('bookPageGenreLink')
+         if 'actionLinkLite' in shelf.get('class').split()]
+    )
+
+
+def book_info(title, author, pages, shelves):
+    """Tidy the text scraped from a book page into the book's details.
+
+    Both parsers pass None for any detail missing from the page, so a page
+    without them fails the same way whichever parser read it.
+
+    Args:
+        title (str): Text of the title heading, including any series.
+        author (str): Text of the first author link.
+        pages (str): Text of the number of pages e.g. '601 pages'.
+        shelves (list): Text of each 'Top Shelves' link.
+
+    Returns:
+        Dictionary of Title, Author, Number of Pages and list of Shelves.
+
+    Raises:
+        ValueError: The title, author or number of pages is missing or the
+                    number of pages isn't a number.
+
+    """
+    if title is None or author is None or pages is None:
+        raise ValueError('Book page is missing its {}'.format(
+            'title' if title is None else
+            'author' if author is None else 'number of pages'))
+
+    info = {}
+
+    rough_title = title.strip().split('\n')
+    if len(rough_title) == 1:
+        info['title'] = rough_title[0].strip()
+    else:
+        info['title'] = rough_title[0].strip() + ' ' + rough_title[2].strip()
+
+    info['author'] = author.strip()
+    info['pages'] = int(pages.strip(' pages'))
+
+    info['shelves'] = []
+    for shelf in shelves:
+        shelf = shelf.strip()
+        if ' users' not in shelf and shelf not in info['shelves']:
+            info['shelves'].append(shelf)
+
+    return info
+
+
+class BookStore:
+    """SQLite store of parsed book details keyed by Goodreads book ID.
+
+    Entries older than the TTL are treated as missing so the book is parsed
+    again and the entry refreshed. The edition URL each search resolved to
+    is kept too, with its own TTL, so repeating a search skips the search,
+    editions and format filter pages.
+    """
+
+    def __init__(self, path, ttl=2592000, search_ttl=604800):
+        """BookStore class constructor to initialise BookStore object.
+
+        Args:
+            path (str): Path to the SQLite database file.
+            ttl (float): Seconds before an entry is stale.
+            search_ttl (float): Seconds before a resolved search is stale.
+
+        """
+        self.ttl = ttl
+        self.search_ttl = search_ttl
+        self.lock = threading.Lock()
+        # Shared by batch workers so access is serialised with the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS books ('
+                'id TEXT PRIMARY KEY, url TEXT, title TEXT, author TEXT, '
+                'pages INTEGER, shelves TEXT, category TEXT, genre TEXT, '
+                'updated REAL)'
+            )
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS books_title ON books (title)'
+            )
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS books_author ON books (author)'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS searches ('
+                'terms TEXT, format TEXT, url TEXT, updated REAL, '
+                'PRIMARY KEY (terms, format))'
+            )
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Open the store described by the user settings, if enabled.
+
+        Args:
+            settings (dict): Dictionary of user settings.
+
+        Returns:
+            BookStore or None if there's no store setting.
+
+        """
+        if not settings.get('store'):
+            return None
+        return cls(settings['store'],
+                   float(settings.get('store_ttl') or 2592000),
+                   float(settings.get('search_ttl') or 604800))
+
+    def get(self, url):
+        """Return the stored details of the book at url.
+
+        Args:
+            url (str): Goodreads Book URL.
+
+        Returns:
+            Dictionary of Title, Author, Number of Pages and list of Shelves
+            or None if the book isn't stored or its entry is stale.
+
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT title, author, pages, shelves, updated FROM books '
+                'WHERE id = ?', (book_id(url),)
+            ).fetchone()
+        if row is None or time.time() - row[4] > self.ttl:
+            return None
+        return {'title': row[0], 'author': row[1], 'pages': row[2],
+                'shelves': json.loads(row[3])}
+
+    def put(self, url, info):
+        """Store the details of the book at url, replacing any old entry.
+
+        Args:
+            url (str): Goodreads Book URL.
+            info (dict): Dictionary of Title, Author, Number of Pages and
+                         list of Shelves.
+
+        """
+        category, genre = category_and_genre(info['shelves'])
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, '
+                '?)', (book_id(url), url, info['title'], info['author'],
+                       info['pages'], json.dumps(info['shelves']), category,
+                       genre, time.time())
+            )
+
+    def search(self, terms=None):
+        """Return stored books whose ID, title or author match terms.
+
+        Args:
+            terms (str): Book ID or part of a title or author (optional).
+
+        Returns:
+            List of (id, title, author, pages, genre, updated) tuples.
+
+        """
+        query = 'SELECT id, title, author, pages, genre, updated FROM books'
+        params = ()
+        if terms:
+            query += ' WHERE id = ? OR title LIKE ? OR author LIKE ?'
+            params = (terms, '%{}%'.format(terms), '%{}%'.format(terms))
+        with self.lock:
+            return self.connection.execute(
+                query + ' ORDER BY title', params
+            ).fetchall()
+
+    def prune(self, terms=None, older_than=None):
+        """Remove stored books, optionally only matching or older ones.
+
+        Args:
+            terms (str): Book ID or part of a title or author (optional).
+            older_than (float): Only remove entries older than this many
+                                seconds (optional).
+
+        Returns:
+            Number of books removed.
+
+        """
+        ids = [row[0] for row in self.search(terms)
+               if older_than is None or time.time() - row[5] > older_than]
+        with self.lock, self.connection:
+            self.connection.executemany('DELETE FROM books WHERE id = ?',
+                                        [(id_,) for id_ in ids])
+        return len(ids)
+
+    def editions(self):
+        """Return every stored book with the formats searches found it in.
+
+        Returns:
+            List of (url, title, author, format) tuples, with a format of
+            None for books no search has resolved to.
+
+        """
+        with self.lock:
+            books = self.connection.execute(
+                'SELECT id, url, title, author FROM books'
+            ).fetchall()
+            searches = self.connection.execute(
+                'SELECT format, url FROM searches'
+            ).fetchall()
+        formats = {}
+        for book_format, url in searches:
+            formats.setdefault(book_id(url), set()).add(book_format)
+        return [(url, title, author, book_format)
+                for id_, url, title, author in books
+                for book_format in formats.get(id_) or [None]]
+
+    def get_search(self, terms, book_format):
+        """Return the edition URL a search previously resolved to.
+
+        Args:
+            terms (str): Terms used in the Goodreads search.
+            book_format (str): The format of the book.
+
+        Returns:
+            The edition's URL or None if the search isn't stored or its
+            entry is stale.
+
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT url, updated FROM searches WHERE terms = ? AND '
+                'format = ?', search_key(terms, book_format)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.search_ttl:
+            return None
+        return row[0]
+
+    def put_search(self, terms, book_format, url):
+        """Store the edition URL a search resolved to.
+
+        Args:
+            terms (str): Terms used in the Goodreads search.
+            book_format (str): The format of the book.
+            url (str): URL of the edition the search resolved to.
+
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)',
+                search_key(terms, book_format) + (url, time.time())
+            )
+
+    def searches(self, terms=None):
+        """Return stored searches containing every word of terms.
+
+        Args:
+            terms (str): Words of the search terms (optional).
+
+        Returns:
+            List of (terms, format, url, updated) tuples.
+
+        """
+        words = search_key(terms or '', '')[0].split()
+        query = 'SELECT terms, format, url, updated FROM searches'
+        if words:
+            query += ' WHERE ' + ' AND '.join(['terms LIKE ?'] * len(words))
+        with self.lock:
+            return self.connection.execute(
+                query + ' ORDER BY terms, format',
+                ['%{}%'.format(word) for word in words]
+            ).fetchall()
+
+    def forget_searches(self, terms=None, older_than=None):
+        """Remove stored searches, optionally only matching or older ones.
+
+        Args:
+            terms (str): Words of the search terms (optional).
+            older_than (float): Only remove entries older than this many
+                                seconds (optional).
+
+        Returns:
+            Number of searches removed.
+
+        """
+        keys = [row[:2] for row in self.searches(terms)
+                if older_than is None or time.time() - row[3] > older_than]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'DELETE FROM searches WHERE terms = ? AND format = ?', keys
+            )
+        return len(keys)
+
+
+def search_key(terms, book_format):
+    """Normalise search terms and a format into a stored search's key.
+
+    Case, punctuation and spacing don't change what Goodreads finds, so
+    they're dropped for repeat searches to match. Typing a format into the
+    editions filter picks it by its first letter, so 'k', 'Kindle' and
+    'kindle' are all kept as 'k'.
+
+    Args:
+        terms (str): Terms used in the Goodreads search.
+        book_format (str): The format of the book.
+
+    Returns:
+        Tuple of the normalised terms and format.
+
+    """
+    return normalise(terms), book_format.strip().lower()[:1]
+
+
+def normalise(text):
+    """Return text lower cased with punctuation and extra spacing removed."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+
+def trigrams(word):
+    """Return the set of three letter sequences in a padded word."""
+    padded = '  {} '.format(word)
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@functools.lru_cache(maxsize=4096)
+def word_similarity(first, second):
+    """Return how alike two words are, from 0 to 1 if they're equal."""
+    if first == second:
+        return 1.0
+    return difflib.SequenceMatcher(None, first, second).ratio()
+
+
+class BookIndex:
+    """Token and trigram index of the books read or looked up before.
+
+    Built from the spreadsheet's Overall sheet and the book store, it
+    matches search terms to a known book in milliseconds, tolerating
+    reordered words and small typos. Words sharing trigrams with the terms
+    are found through the postings, and the books using most of them are
+    scored word by word. A match only resolves to a URL when a
+    search has previously found an edition of the book in the same format,
+    as neither the spreadsheet nor the store records an edition's format.
+    """
+
+    threshold = 0.8
+    margin = 0.1
+    candidates = 20
+
+    def __init__(self):
+        """BookIndex class constructor to initialise an empty BookIndex."""
+        self.books = {}
+        self.words = {}
+        self.postings = {}
+
+    @classmethod
+    def from_settings(cls, settings, store=None):
+        """Build the index of the spreadsheet and the store.
+
+        Args:
+            settings (dict): Dictionary of user settings.
+            store (obj): BookStore of previously parsed books and resolved
+                         searches (optional).
+
+        Returns:
+            BookIndex of every book found.
+
+        """
+        index = cls()
+        for title, author in spreadsheet_books(settings['path']):
+            index.add(title, author)
+        for url, title, author, book_format in (store.editions() if store
+                                                else []):
+            index.add(title, author, url, book_format)
+        return index
+
+    def add(self, title, author, url=None, book_format=None):
+        """Add a book, or an edition of one already indexed.
+
+        Args:
+            title (str): The book's title.
+            author (str): The book's author.
+            url (str): URL of an edition of the book (optional).
+            book_format (str): Format searched for to find the edition at
+                               url (optional).
+
+        """
+        key = (normalise(title), normalise(author))
+        if not key[0]:
+            return
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = {'title': title, 'author': author,
+                                      'words': ' '.join(key).split(),
+                                      'editions': {}}
+            for word in book['words']:
+                # Titles and authors share words, which are only split
+                # into trigrams the first time they're seen
+                if word not in self.words:
+                    self.words[word] = set()
+                    for trigram in trigrams(word):
+                        self.postings.setdefault(trigram, set()).add(word)
+                self.words[word].add(key)
+        if url and book_format:
+            book['editions'][search_key('', book_format)[1]] = url
+
+    def score(self, words, key):
+        """Return how closely words match the book with key, 0 to 1.
+
+        Every word searched for has to be close to a word of the title or
+        author, and every word of the title close to one searched for.
+        """
+        book_words = self.books[key]['words']
+        found = sum(max(word_similarity(word, book_word)
+                        for book_word in book_words)
+                    for word in words) / len(words)
+        title_words = key[0].split()
+        covered = sum(max(word_similarity(title_word, word)
+                          for word in words)
+                      for title_word in title_words) / len(title_words)
+        return min(found, covered)
+
+    def match(self, terms):
+        """Return the book search terms confidently refer to.
+
+        Args:
+            terms (str): Search terms e.g. Book title and Author.
+
+        Returns:
+            Dictionary of the book's title, author and editions by format,
+            or None if no book, or more than one, matches closely enough.
+
+        """
+        words = normalise(terms).split()
+        shared = collections.Counter()
+        for trigram in set().union(*map(trigrams, words)):
+            for word in self.postings.get(trigram, ()):
+                shared.update(self.words[word])
+        # Only the books sharing the most trigrams are worth scoring
+        ranked = sorted(((self.score(words, key), key)
+                         for key, _ in shared.most_common(self.candidates)),
+                        reverse=True)
+        if not ranked or ranked[0][0] < self.threshold:
+            return None
+        # Two books matching about as well is a guess, not a match
+        if len(ranked) > 1 and ranked[1][0] > ranked[0][0] - self.margin:
+            return None
+        return self.books[ranked[0][1]]
+
+
+class HostLimiter:
+    """Space out the start of requests to each host within an event loop.
+
+    The asyncio counterpart of Throttle, keeping a separate politeness
+    interval per host so one slow site doesn't hold up requests to another.
+    """
+
+    def __init__(self, interval):
+        """HostLimiter class constructor to initialise HostLimiter object.
+
+        Args:
+            interval (float): Minimum seconds between consecutive requests
+                              to the same host.
+
+        """
+        self.interval = interval
+        self.next_start = {}
+
+    async def wait(self, url):
+        """Sleep until the politeness interval for url's host has passed."""
+        host = urlsplit(url).netloc
+        now = asyncio.get_event_loop().time()
+        # Only the event loop's thread runs this so no lock is needed
+        start = max(now, self.next_start.get(host, now))
+        self.next_start[host] = start + self.interval
+        await asyncio.sleep(start - now)
+
+
+async def fetch_metadata_async(urls, store=None, cache=None, concurrency=8,
+                               interval=0, parse_executor=None):
+    """Fetch and parse the details of many books concurrently.
+
+    Pages are fetched by a pool of threads sharing a session of their own,
+    with at most concurrency requests in flight and the start
+    of requests to each host spaced out by interval. Parsing is handed to
+    parse_executor so it doesn't hold up the fetches.
+
+    Args:
+        urls (list): Goodreads Book URLs.
+        store (obj): BookStore to check first and save parsed books to
+                     (optional).
+        cache (obj): PageCache to fetch the pages through (optional).
+        concurrency (int): Maximum number of pages fetched at once.
+        interval (float): Minimum seconds between requests to a host.
+        parse_executor (obj): concurrent.futures Executor to parse pages in
+                              (optional), the event loop's default otherwise.
+
+    Returns:
+        Dictionary of each URL to its Title, Author, Number of Pages and
+        list of Shelves, or None if the book couldn't be fetched or parsed.
+
+    """
+    loop = asyncio.get_event_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = HostLimiter(interval)
+
+    # Every fetch thread needs its own pooled connection to keep it alive,
+    # and the session is closed, with its connections, once the fetch is done
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    async def fetch(url, fetch_executor):
+        info = store.get(url) if store else None
+        if info is not None:
+            return info
+        try:
+            async with semaphore:
+                await limiter.wait(url)
+                html = await loop.run_in_executor(fetch_executor, fetch_page,
+                                                  url, session, cache)
+            info = await loop.run_in_executor(parse_executor,
+                                              parse_book_html, html)
+        except (requests.RequestException, ValueError) as exception:
+            logger.debug('Fetching %s failed - %r', url, exception)
+            return None
+        if store:
+            store.put(url, info)
+        return info
+
+    # Repeated URLs are only fetched once
+    urls = list(dict.fromkeys(urls))
+    with session, concurrent.futures.ThreadPoolExecutor(
+            concurrency) as fetch_executor:
+        infos = await asyncio.gather(*(fetch(url, fetch_executor)
+                                       for url in urls))
+    return dict(zip(urls, infos))
+
+
+@traced
+def fetch_metadata(urls, store=None, cache=None, concurrency=8, interval=0,
+                   parse_workers=None):
+    """Fetch and parse the details of many books, blocking until done.
+
+    Runs fetch_metadata_async in a new event loop, parsing pages in a pool
+    of processes so parsing uses every core.
+
+    Args:
+        urls (list): Goodreads Book URLs.
+        store (obj): BookStore to check first and save parsed books to
+                     (optional).
+        cache (obj): PageCache to fetch the pages through (optional).
+        concurrency (int): Maximum number of pages fetched at once.
+        interval (float): Minimum seconds between requests to a host.
+        parse_workers (int): Number of parsing processes, defaults to the
+                             number of CPUs.
+
+    Returns:
+        Dictionary of each URL to its Title, Author, Number of Pages and
+        list of Shelves, or None if the book couldn't be fetched or parsed.
+
+    """
+    loop = asyncio.new_event_loop()
+    with concurrent.futures.ProcessPoolExecutor(parse_workers) as executor:
+        # Start the processes before any fetch threads exist to fork
+        executor.submit(int).result()
+        try:
+            return loop.run_until_complete(fetch_metadata_async(
+                urls, store, cache, concurrency, interval, executor))
+        finally:
+            loop.close()
+
+
+def run_store(settings, action, terms=None, days=None):
+    """List or prune the books and searches held in the metadata store.
+
+    Args:
+        settings (dict): Dictionary of user settings.
+        action (str): list, prune, searches or forget.
+        terms (str): Book ID or part of a title or author, or words of the
+                     search terms for searches and forget (optional).
+        days (float): Only prune or forget entries older than this many
+                      days (optional).
+
+    """
+    store = BookStore.from_settings(settings)
+    if store is None:
+        print('No store setting in settings.ini.')
+        return
+
+    older_than = days * 86400 if days is not None else None
+    if action == 'prune':
+        print('Removed {} books from the store.'.format(
+            store.prune(terms, older_than)))
+        return
+
+    if action == 'forget':
+        print('Forgot {} searches.'.format(
+            store.forget_searches(terms, older_than)))
+        return
+
+    if action == 'searches':
+        for search, book_format, url, updated in store.searches(terms):
+            age = (time.time() - updated) / 86400
+            print(search, book_format, url, '{:.0f} days old'.format(age),
+                  sep=' - ')
+        return
+
+    for id_, title, author, pages, genre, updated in store.search(terms):
+        age = (time.time() - updated) / 86400
+        print(id_, title, author, pages, genre,
+              '{:.0f} days old'.format(age), sep=' - ')
+
+
+@traced
+def resolve_search(settings, details, store=None):
+    """Give a search the URL of the book it matches in the local index.
+
+    Books already read or looked up are matched against the index, which
+    takes milliseconds, so only new books need searching on Goodreads.
+
+    Args:
+        settings (dict): Dictionary of user settings.
+        details (dict): Book details with search and format, given the
+                        matched edition's url if there is one.
+        store (obj): BookStore of previously parsed books and resolved
+                     searches (optional).
+
+    """
+    try:
+        index = BookIndex.from_settings(settings, store)
+    except OSError as error:
+        logger.debug('Book index unavailable - %s', error)
+        return
+    book = index.match(details['search'])
+    url = book and book['editions'].get(
+        search_key('', details['format'])[1])
+    if url:
+        print('Found {} by {} in your reading history.'.format(
+            book['title'], book['author']))
+        details['url'] = url
+        if store:
+            store.put_search(details['search'], details['format'], url)
+
+
+def read_url_file(path):
+    """Read the book URLs listed in a file.
+
+    Args:
+        path (str): Path to a .csv or .jsonl batch file, whose url column is
+                    read, or a text file with a URL per line.
+
+    Returns:
+        List of book URLs.
+
+    """
+    with open(path, newline='') as url_file:
+        if path.lower().endswith(('.jsonl', '.json')):
+            rows = [json.loads(line) for line in url_file if line.strip()]
+        elif path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(url_file))
+        else:
+            rows = [{'url': line} for line in url_file]
+    return [row['url'].strip() for row in rows
+            if (row.get('url') or '').strip()]
+
+
+def run_fetch_metadata(settings, path, concurrency=None, output=None):
+    """Fetch the details of every book listed in a file into the store.
+
+    Args:
+        settings (dict): Dictionary of user settings.
+        path (str): Path to a file of book URLs, see read_url_file.
+        concurrency (int): Maximum number of pages fetched at once
+                           (optional), the concurrency setting otherwise.
+        output (str): Path to write the details to as JSON lines
+                      (optional).
+
+    """
+    urls = read_url_file(path)
+    concurrency = concurrency or int(settings.get('concurrency') or 8)
+    start = time.monotonic()
+    infos = fetch_metadata(urls, BookStore.from_settings(settings),
+                           PageCache.from_settings(settings), concurrency,
+                           float(settings.get('fetch_interval') or 0.05))
+    elapsed = time.monotonic() - start
+
+    for url, info in infos.items():
+        if info is None:
+            print('Failed to fetch {}'.format(url))
+        else:
+            print(info['title'], info['author'], info['pages'], sep=' - ')
+    if output:
+        with open(output, 'w') as output_file:
+            for url, info in infos.items():
+                if info is not None:
+                    output_file.write(json.dumps(dict(info, url=url)) + '\n')
+
+    fetched = len([info for info in infos.values() if info is not None])
+    print('Fetched the details of {} of {} books in {:.1f} seconds.'.format(
+        fetched, len(infos), elapsed))
+
+
+def category_and_genre(shelves):
+    """Use shelves list to deterime genre and categorise as Fiction/Nonfiction.
+
+    Args:
+        shelves (list): List of strings of Goodreads shelf categories.
+
+    Returns:
+        Tuple of category (Fiction/Nonfiction) and the books genre.
+
+    """
+    if 'Nonfiction' in shelves:
+        category = 'Nonfiction'
+    else:
+        category = 'Fiction'
+
+    genre = None
+    for shelf in shelves:
+        if shelf != category:
+            genre = shelf
+            break
+
+    return (category, genre)
+
+
+@traced
+def check_year_sheet_exists(path, year_sheet):
+    """Check year_sheet exists in path workbook, call create if not.
+
+    Args:
+        path (str): Path to spreadsheet to check
+        year_sheet (str): The year the book was read formatted YYYY.
+
+    Return:
+        workbook (obj): openpyxl workbook object.
+
+    """
+    workbook = load_spreadsheet(path)
+    add_year_sheet_if_missing(workbook, year_sheet)
+
+    return workbook
+
+
+# The workbook last loaded or saved for each spreadsheet path, with the
+# spreadsheet's modification time and size at the time
+loaded_workbooks = {}
+
+
+def spreadsheet_stat(path):
+    """Return the spreadsheet's modification time and size."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_spreadsheet(path):
+    """Load the spreadsheet's workbook, noting it as matching the file.
+
+    Args:
+        path (str): Path to spreadsheet.
+
+    Returns:
+        workbook (obj): openpyxl workbook object.
+
+    """
+    # Taken first so a change made while loading is noticed later
+    try:
+        stat = spreadsheet_stat(path)
+    except OSError:
+        stat = None
+    with tracer.span('load_workbook'):
+        workbook = openpyxl.load_workbook(path)
+    loaded_workbooks[path] = (workbook, stat)
+    return workbook
+
+
+def workbook_current(path, workbook):
+    """Return whether workbook holds just what's in the spreadsheet.
+
+    That's only true of the workbook last loaded or saved for path, and
+    only while the spreadsheet hasn't been changed by another process or
+    by hand since.
+
+    Args:
+        path (str): Path to spreadsheet.
+        workbook (obj): openpyxl workbook object.
+
+    Returns:
+        Boolean of whether workbook is current.
+
+    """
+    latest, stat = loaded_workbooks.get(path, (None, None))
+    try:
+        return latest is workbook and stat == spreadsheet_stat(path)
+    except OSError:
+        return False
+
+
+def current_workbook(path, workbook=None):
+    """Return workbook if it's current, else a current one, loading it if needed.
+
+    Args:
+        path (str): Path to spreadsheet.
+        workbook (obj): Workbook the caller holds (optional).
+
+    Returns:
+        workbook (obj): openpyxl workbook object matching the spreadsheet.
+
+    """
+    for candidate in (workbook, loaded_workbooks.get(path, (None,))[0]):
+        if candidate is not None and workbook_current(path, candidate):
+            return candidate
+    return load_spreadsheet(path)
+
+
+def add_year_sheet_if_missing(workbook, year_sheet):
+    """Create year_sheet in workbook if it doesn't already exist.
+
+    Args:
+        workbook (obj): openpyxl workbook object.
+        year_sheet (str): The year the book was read formatted YYYY.
+
+    """
+    existing_sheets = [name for name in workbook.sheetnames
+                       if name != TEMPLATE_SHEET]
     if year_sheet not in existing_sheets:
         create_sheet(workbook, existing_sheets[-1], year_sheet)
 
-    return workbook
+
+TEMPLATE_SHEET = 'Template'
+
+
+def year_sheet_template(workbook, sheet_to_copy):
+    """Return the workbook's empty year sheet template, creating it if needed.
+
+    The template is a hidden copy of a year sheet with the books removed.
+    Book cells beside the statistics are kept, blanked, for their formatting
+    while those below them are deleted outright, so the template stays the
+    same size however many books the copied year held.
+
+    Args:
+        workbook (obj): openpyxl workbook object.
+        sheet_to_copy (str): Name of the sheet to base a new template on.
+
+    Returns:
+        The template's openpyxl sheet object.
+
+    """
+    if TEMPLATE_SHEET in workbook.sheetnames:
+        return workbook[TEMPLATE_SHEET]
+
+    template = workbook.copy_worksheet(workbook[sheet_to_copy])
+    template.title = TEMPLATE_SHEET
+    template.sheet_state = 'hidden'
+
+    # openpyxl has no public way to remove single cells, so this relies on
+    # the private _cells dictionary of the pinned openpyxl 2.5.9. A sheet
+    # without statistics beside the books keeps just its header row.
+    stats_rows = max((row for row, column in template._cells if column > 6),
+                     default=1)
+    for row, column in list(template._cells):
+        if row == 1 or column > 6:
+            continue
+        if row > stats_rows:
+            del template._cells[(row, column)]
+        else:
+            template.cell(row=row, column=column).value = None
+
+    return template
 
 
 def create_sheet(workbook, sheet_to_copy, new_sheet_name):
-    """Create a new sheet by copying and modifying a different one.
+    """Create a new year sheet by copying the workbook's empty template.
 
     Args:
         workbook (obj): openpyxl workbook object.
-        sheet_to_copy (str): Name of the sheet to copy.
+        sheet_to_copy (str): Name of the sheet to base the template on if
+                             the workbook doesn't have one yet.
         new_sheet_name (str): Name (year formatted YYYY) to name new sheet.
 
     """
-    sheet = workbook.copy_worksheet(workbook[sheet_to_copy])
+    template = year_sheet_template(workbook, sheet_to_copy)
+    sheet = workbook.copy_worksheet(template)
     sheet.title = new_sheet_name
-    last_row = first_blank_row(sheet)
-    while last_row > 1:
-        for col in range(1, 7):
-            sheet.cell(row=last_row, column=col).value = None
-        last_row -= 1
+    sheet.sheet_state = 'visible'
     day_tracker = '=(TODAY()-DATE({},1,1))/7'.format(new_sheet_name)
     sheet.cell(row=5, column=9).value = day_tracker
+    next_rows[sheet] = 2
 
 
-def input_info(workbook, info, date, path):
-    """Write the book information to the first blank row on the given sheet.
+def write_row(workbook, info, date):
+    """Write the book information to the year and Overall sheets unsaved.
 
     Args:
         workbook (obj): openpyxl workbook object.
         info (dict): Information about the book.
         date (str): Date to input in the 'Read date' column.
-        path (str): Path to spreadsheet.
 
     """
     for sheet in [date[-4:], 'Overall']:
         sheet = workbook[sheet]
 
-        input_row = first_blank_row(sheet)
+        input_row = next_row(sheet)
 
         values_to_write = [
                 info['title'], info['author'],
@@ -730,7 +3186,300 @@ def input_info(workbook, info, date, path):
         for number, value in enumerate(values_to_write, 1):
             sheet.cell(row=input_row, column=number).value = value
 
-    workbook.save(path)
+
+def journal_path(path):
+    """Return the path of the journal of rows pending for the spreadsheet."""
+    return path + '.journal'
+
+
+def compacting_path(path):
+    """Return the path the journal is moved to while it's compacted."""
+    return journal_path(path) + '.compacting'
+
+
+def journal_row(path, info, date):
+    """Durably append a book's row to the spreadsheet's journal.
+
+    Each row is given a random ID so no two journals are the same, even
+    when they hold the same books, for compact_journal to tell them apart.
+
+    Args:
+        path (str): Path to spreadsheet.
+        info (dict): Information about the book.
+        date (str): Date to input in the 'Read date' column.
+
+    """
+    entry = {'id': os.urandom(8).hex(), 'date': date, 'info': {
+        key: info[key]
+        for key in ('title', 'author', 'pages', 'category', 'genre')
+    }}
+    with open(journal_path(path), 'a') as journal:
+        journal.write(json.dumps(entry) + '\n')
+        journal.flush()
+        os.fsync(journal.fileno())
+
+
+def read_journal(path):
+    """Return the rows pending in the spreadsheet's journal.
+
+    Rows of a compaction cut short by a crash come first.
+
+    Args:
+        path (str): Path to spreadsheet.
+
+    Returns:
+        List of dictionaries of the book information and date.
+
+    """
+    return (read_entries(compacting_path(path)) +
+            read_entries(journal_path(path)))
+
+
+def read_entries(journal_file):
+    """Return the rows in a journal file, or none if it doesn't exist.
+
+    A line left incomplete by a crash while it was being appended is
+    ignored.
+
+    Args:
+        journal_file (str): Path to the journal.
+
+    Returns:
+        List of dictionaries of the book information and date.
+
+    """
+    try:
+        with open(journal_file) as journal:
+            lines = journal.readlines()
+    except FileNotFoundError:
+        return []
+
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+def index_path(path):
+    """Return the path of the index of books in the spreadsheet."""
+    return path + '.index'
+
+
+def index_fresh(path):
+    """Return whether the spreadsheet's index is at least as new as it."""
+    try:
+        return os.path.getmtime(index_path(path)) >= os.path.getmtime(path)
+    except OSError:
+        return False
+
+
+def index_rows(path, infos):
+    """Append the title and author of books written to the spreadsheet.
+
+    Args:
+        path (str): Path to spreadsheet.
+        infos (list): Information about each book.
+
+    """
+    with open(index_path(path), 'a') as index:
+        for info in infos:
+            index.write(json.dumps([info['title'], info['author']]) + '\n')
+
+
+@traced
+def spreadsheet_books(path):
+    """Return the title and author of every book in the spreadsheet.
+
+    They're read from the index kept beside the spreadsheet, which is
+    rebuilt from the Overall sheet when missing or older than the
+    spreadsheet, such as after the spreadsheet's been edited by hand.
+    Books waiting in the journal are included.
+
+    Args:
+        path (str): Path to spreadsheet.
+
+    Returns:
+        List of (title, author) pairs.
+
+    """
+    if not index_fresh(path):
+        with tracer.span('load_workbook'):
+            workbook = openpyxl.load_workbook(path, read_only=True)
+        temp_path = index_path(path) + '.tmp'
+        with open(temp_path, 'w') as index:
+            for title, author in workbook['Overall'].iter_rows(min_row=2,
+                                                               max_col=2):
+                if title.value:
+                    index.write(json.dumps([str(title.value),
+                                            str(author.value or '')]) + '\n')
+        os.replace(temp_path, index_path(path))
+
+    with open(index_path(path)) as index:
+        books = [tuple(json.loads(line)) for line in index if line.strip()]
+    return books + [(entry['info']['title'], entry['info']['author'])
+                    for entry in read_journal(path)]
+
+
+@traced
+def compact_journal(path, workbook=None):
+    """Write every row pending in the journal to the spreadsheet at once.
+
+    The journal is first moved aside, so rows journaled meanwhile wait for
+    the next compaction, and then written by compact_entries. A journal
+    left aside by a crash is written before the current one. Compactions
+    by the daemon, the GUI and other runs are made one at a time by an
+    exclusive lock on a file beside the journal, so none mistakes another's
+    journal for a crashed one.
+
+    Args:
+        path (str): Path to spreadsheet.
+        workbook (obj): Workbook from load_spreadsheet (optional).
+
+    Returns:
+        Number of rows written.
+
+    """
+    compacting = compacting_path(path)
+    with open(journal_path(path) + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        written = 0
+        if os.path.exists(compacting):
+            written, workbook = compact_entries(path, workbook)
+        if read_entries(journal_path(path)):
+            os.replace(journal_path(path), compacting)
+            rows, workbook = compact_entries(path, workbook)
+            written += rows
+    return written
+
+
+def compact_entries(path, workbook=None):
+    """Write the journal moved aside for compaction to the spreadsheet.
+
+    A hash of the journal is saved in the workbook's identifier property
+    along with its rows, and the journal is only removed once they're
+    saved, so a journal whose rows the spreadsheet already holds isn't
+    written again. The workbook is saved to a temporary file that's synced
+    then replaces the spreadsheet, so a crash leaves either the old or the
+    new spreadsheet. A workbook that failed to save is left holding rows
+    the spreadsheet doesn't, and one loaded before another process changed
+    the spreadsheet lacks its rows, so either is replaced by a current one.
+
+    Args:
+        path (str): Path to spreadsheet.
+        workbook (obj): Workbook from load_spreadsheet (optional).
+
+    Returns:
+        Tuple of the number of rows written and the workbook used.
+
+    """
+    compacting = compacting_path(path)
+    with open(compacting, 'rb') as journal:
+        token = hashlib.sha1(journal.read()).hexdigest()
+    entries = read_entries(compacting)
+
+    workbook = current_workbook(path, workbook)
+    written = 0
+    fresh = False
+    if workbook.properties.identifier != token:
+        for entry in entries:
+            add_year_sheet_if_missing(workbook, entry['date'][-4:])
+            write_row(workbook, entry['info'], entry['date'])
+        workbook.properties.identifier = token
+        written = len(entries)
+
+        fresh = index_fresh(path)
+        temp_path = path + '.tmp'
+        try:
+            with tracer.span('workbook.save'):
+                workbook.save(temp_path)
+            with open(temp_path, 'rb') as saved:
+                os.fsync(saved.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            loaded_workbooks.pop(path, None)
+            raise
+        loaded_workbooks[path] = (workbook, spreadsheet_stat(path))
+    os.remove(compacting)
+
+    if fresh:
+        try:
+            index_rows(path, [entry['info'] for entry in entries])
+        except OSError as error:
+            # The index is rebuilt from the spreadsheet when it's missing
+            logger.debug('Updating the index failed - %s', error)
+            with contextlib.suppress(OSError):
+                os.remove(index_path(path))
+
+    return written, workbook
+
+
+@traced
+def record_row(settings, info, date, workbook=None):
+    """Journal a book's row and compact the journal once it's large enough.
+
+    Args:
+        settings (dict): Dictionary of user settings.
+        info (dict): Information about the book.
+        date (str): Date to input in the 'Read date' column.
+        workbook (obj): Already loaded openpyxl workbook object (optional).
+
+    Returns:
+        Boolean of whether the row has been written to the spreadsheet.
+
+    """
+    journal_row(settings['path'], info, date)
+    if compaction_due(settings, 0):
+        compact_journal(settings['path'], workbook)
+        return True
+    return False
+
+
+def compaction_due(settings, new_rows=1):
+    """Return whether the journal is due to be written to the spreadsheet.
+
+    Args:
+        settings (dict): Dictionary of user settings.
+        new_rows (int): Rows about to be journaled, for checking in advance.
+
+    Returns:
+        Boolean of whether the journal will hold compact_every rows.
+
+    """
+    compact_every = int(settings.get('compact_every') or 1)
+    if compact_every <= new_rows:
+        return True
+    return len(read_journal(settings['path'])) + new_rows >= compact_every
+
+
+next_rows = weakref.WeakKeyDictionary()
+
+
+def next_row(sheet):
+    """Return the row to append the next book to on the given sheet.
+
+    Rather than walking down column A from the top, the row is found by
+    walking up from the bottom of the sheet's dimensions, which only passes
+    the statistics rows beside the books. It's then cached for the sheet
+    and, on later calls, only checked to follow a title and precede a blank.
+
+    Args:
+        sheet (obj): openpyxl sheet object to find the next row of.
+
+    """
+    row = next_rows.get(sheet)
+    if not (row and sheet.cell(row=row - 1, column=1).value and
+            not sheet.cell(row=row, column=1).value):
+        # max_row checks every cell so is only used when there's no pointer
+        row = sheet.max_row
+        while row > 1 and not sheet.cell(row=row, column=1).value:
+            row -= 1
+        row += 1
+
+    next_rows[sheet] = row + 1
+    return row
 
 
 def first_blank_row(sheet):
@@ -748,68 +3497,462 @@ def first_blank_row(sheet):
     return input_row
 
 
-def main():
-    """Coordinate updating of Goodreads account and writing to spreadsheet."""
-    args = parse_arguments()
-    try:
-        open("settings.ini")
-    except FileNotFoundError:
-        write_initial_config()
+class Throttle:
+    """Space out the start of book updates shared between workers."""
 
-    settings = retrieve_settings()
+    def __init__(self, interval):
+        """Throttle class constructor to initialise Throttle object.
 
-    if 'gui' in args:
-        gui_instance = create_gui(settings)
-        details = gui_mode_details_edits(gui_instance)
+        Args:
+            interval (float): Minimum seconds between consecutive starts.
 
-    else:
-        details = args
-        check_and_prompt_for_email_password(settings)
-        # Process date if given as (t)oday or (y)esterday into proper format
-        if details['date'].lower() == 't':
-            details['date'] = get_date_str()
-        elif details['date'].lower() == 'y':
-            details['date'] = get_date_str(True)
-
-    driver = create_driver(settings['headless'])
-
-    driver.implicitly_wait(10)
-    goodreads_login(driver, settings['email'], settings['password'])
-    if 'url' in details:
-        url = details['url']
-        driver.get(url)
-    else:
-        goodreads_find(driver, details['search'])
-        url = goodreads_filter(driver, details['format'])
+        """
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_start = 0
 
-    shelves = goodreads_get_shelves(driver, details['rating'])
+    def wait(self):
+        """Block until the politeness interval since the last start passes."""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        time.sleep(start - now)
 
-    shelved_status = goodreads_get_shelved_status(driver)
 
-    goodreads_date_input(driver, details['date'], shelved_status)
+def batch_worker(settings, jobs, results, throttle, login_lock, store=None):
+    """Log a driver in once and update books from the jobs queue until empty.
 
-    if details['review']:
-        goodreads_add_review(driver, details['review'])
+    A worker whose browser fails to start or log in reports it and stops,
+    leaving the books it would have taken to the other workers.
 
-    driver.find_element_by_name('next').click()
-    driver.get(url)
-    goodreads_rate_book(driver, details['rating'])
+    Args:
+        settings (dict): Dictionary of user settings.
+        jobs (obj): Queue of (index, details) tuples to update.
+        results (obj): Queue to put (index, details, info) tuples on, with
+                       info None for failed updates.
+        throttle (obj): Throttle shared by every worker.
+        login_lock (obj): Lock so workers log in, and save cookies, in turn.
+        store (obj): BookStore of previously parsed books (optional).
 
-    if not shelved_status:
-        goodreads_shelve(driver, shelves)
+    """
+    driver = None
+    try:
+        try:
+            driver = create_driver(settings['headless'],
+                                   settings.get('engine'), settings)
+            with login_lock:
+                goodreads_login(driver, settings['email'],
+                                settings['password'], settings.get('cookies'))
+        except SystemExit:
+            # goodreads_login has said why and closed the driver
+            driver = None
+            return
+        except Exception as error:
+            print('Failed to {} - {}'.format(
+                'start the browser' if driver is None else 'log in',
+                error_text(error)))
+            return
+
+        while True:
+            try:
+                index, details = jobs.get_nowait()
+            except queue.Empty:
+                break
+            name = details.get('url') or details['search']
+            throttle.wait()
+            print('Updating book {}: {}'.format(index + 1, name))
+            # Every book taken must be answered, failed or not, or run_batch
+            # would wait on it forever and never journal the books after it
+            try:
+                info = goodreads_update(driver, details, store)[1]
+            except Exception as error:
+                print('Failed to update {} - {}'.format(name, error))
+                info = None
+            results.put((index, details, info))
+    finally:
+        if driver is not None:
+            driver.close()
+
+
+def run_batch(settings, path, workers=1):
+    """Update Goodreads and the spreadsheet for every book in a batch file.
+
+    Each worker drives its own browser, logged in once, and takes books from
+    a shared queue. The calling thread is the only writer of the workbook:
+    it journals each book's row, in file order, as its update finishes and
+    then compacts the journal into the spreadsheet with a single save.
+
+    Args:
+        settings (dict): Dictionary of user settings.
+        path (str): Path to a .csv or .jsonl batch file.
+        workers (int): Number of browsers to update books with in parallel.
 
-    driver.close()
-    print('Goodreads account updated.')
+    """
+    books = read_batch_file(path)
+    if not books:
+        print('No books to update in {}.'.format(path))
+        return
+
+    workers = max(1, min(workers, len(books)))
+    if workers > 1:
+        settings = dict(settings, headless=True)
+
+    jobs = queue.Queue()
+    for job in enumerate(books):
+        jobs.put(job)
+    results = queue.Queue()
+    throttle = Throttle(float(settings.get('politeness') or 0))
+    login_lock = threading.Lock()
+    store = BookStore.from_settings(settings)
+
+    threads = [
+        threading.Thread(target=batch_worker, daemon=True,
+                         args=(settings, jobs, results, throttle, login_lock,
+                               store))
+        for _ in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    def signal_finished():
+        for thread in threads:
+            thread.join()
+        results.put(None)
+
+    threading.Thread(target=signal_finished, daemon=True).start()
+
+    # Results arriving early wait here until every earlier book is done
+    pending = {}
+    next_index = 0
+    updated = 0
+    for index, details, info in iter(results.get, None):
+        pending[index] = (details, info)
+        while next_index in pending:
+            details, info = pending.pop(next_index)
+            next_index += 1
+            if info is None:
+                continue
+            info['category'], info['genre'] = category_and_genre(
+                info['shelves'])
+            journal_row(settings['path'], info, details['date'])
+            updated += 1
+            print(info['title'], info['author'], details['date'], sep=' - ')
+
+    print('Goodreads account updated for {} of {} books.'.format(
+        updated, len(books)))
 
     print('Updating Spreadsheet...')
-    info = parse_page(url)
-    info['category'], info['genre'] = category_and_genre(shelves)
-    workbook = check_year_sheet_exists(settings['path'], details['date'][-4:])
+    compact_journal(settings['path'])
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """Answer a single JSON line request sent to the daemon's socket."""
+
+    def handle(self):
+        """Read the request, dispatch it and write back the JSON response."""
+        try:
+            request = json.loads(self.rfile.readline().decode())
+        except ValueError:
+            response = {'ok': False, 'error': 'Request is not valid JSON.'}
+        else:
+            # The client always gets a response, whatever the request did
+            try:
+                response = self.server.dispatch(request)
+            except Exception as error:
+                logger.debug('Request %r failed - %r', request, error)
+                response = {'ok': False, 'error': error_text(error)}
+        self.wfile.write((json.dumps(response) + '\n').encode())
+
+
+class Daemon(socketserver.UnixStreamServer):
+    """Keep a logged in driver and loaded workbook to serve update jobs."""
+
+    def __init__(self, socket_path, settings, driver, workbook, store=None):
+        """Daemon class constructor to initialise Daemon object.
+
+        Args:
+            socket_path (str): Path of the Unix domain socket to listen on.
+            settings (dict): Dictionary of user settings.
+            driver: Logged in Selenium webdriver to update books with.
+            workbook (obj): openpyxl workbook object of the spreadsheet.
+            store (obj): BookStore of previously parsed books (optional).
 
-    input_info(workbook, info, details['date'], settings['path'])
+        """
+        super().__init__(socket_path, DaemonHandler)
+        self.settings = settings
+        self.driver = driver
+        self.workbook = workbook
+        self.store = store
+        self.started = time.time()
+        self.jobs_done = 0
+
+    def dispatch(self, request):
+        """Carry out the request's command and return the response.
+
+        Args:
+            request (dict): Request with a command of update, status or stop
+                            and, for updates, the book details.
+
+        Returns:
+            Response dictionary with ok set to whether the command succeeded.
+
+        """
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'Request is not a JSON object.'}
+        command = request.get('command')
+        if command == 'status':
+            return {'ok': True, 'uptime': int(time.time() - self.started),
+                    'jobs': self.jobs_done}
+        if command == 'stop':
+            # shutdown blocks until serve_forever returns so can't be called
+            # from the thread handling this request
+            threading.Thread(target=self.shutdown).start()
+            return {'ok': True}
+        if command == 'update':
+            if not isinstance(request.get('details'), dict):
+                return {'ok': False, 'error': 'Update has no book details.'}
+            return self.update(request['details'])
+        return {'ok': False, 'error': 'Unknown command {}.'.format(command)}
+
+    def update(self, details):
+        """Update Goodreads and the spreadsheet for one book.
+
+        Args:
+            details (dict): Book details - url or search and format, date,
+                            rating and optional review.
+
+        Returns:
+            Response dictionary with the information written to the sheet.
+
+        """
+        try:
+            info = goodreads_update(self.driver, details, self.store)[1]
+        except Exception as error:
+            return {'ok': False, 'error': error_text(error)}
+
+        try:
+            info['category'], info['genre'] = category_and_genre(
+                info['shelves'])
+            if self.workbook is None:
+                self.workbook = load_spreadsheet(self.settings['path'])
+            record_row(self.settings, info, details['date'], self.workbook)
+        except Exception as error:
+            # The workbook may hold rows that weren't saved so is reloaded
+            self.workbook = None
+            return {'ok': False, 'error': 'Goodreads updated, spreadsheet '
+                                          'failed - {}'.format(
+                                              error_text(error))}
+        self.jobs_done += 1
+        return {'ok': True, 'info': info}
+
+
+def send_to_daemon(socket_path, request):
+    """Send a request to the daemon and return its response.
+
+    Args:
+        socket_path (str): Path of the daemon's Unix domain socket.
+        request (dict): Request to send, see Daemon.dispatch.
+
+    Returns:
+        Response dictionary, see Daemon.dispatch.
+
+    Raises:
+        OSError: No daemon is listening on socket_path.
+
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall((json.dumps(request) + '\n').encode())
+        with client.makefile('rb') as response:
+            return json.loads(response.readline().decode())
+
+
+def run_daemon(settings, socket_path):
+    """Log in, load the spreadsheet and serve update jobs until stopped.
+
+    Args:
+        settings (dict): Dictionary of user settings.
+        socket_path (str): Path of the Unix domain socket to listen on.
+
+    """
+    try:
+        send_to_daemon(socket_path, {'command': 'status'})
+        print('A daemon is already listening on {}.'.format(socket_path))
+        return
+    except OSError:
+        # Not listening so any existing file is left over from a crash
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+    driver = create_driver(settings['headless'], settings.get('engine'),
+                           settings)
+    goodreads_login(driver, settings['email'], settings['password'],
+                    settings.get('cookies'))
+    workbook = load_spreadsheet(settings['path'])
+
+    server = Daemon(socket_path, settings, driver, workbook,
+                    BookStore.from_settings(settings))
+    print('Ligrarian daemon listening on {}.'.format(socket_path))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        driver.close()
+        compact_journal(settings['path'], server.workbook)
+        os.remove(socket_path)
+        print('Ligrarian daemon stopped.')
+
+
+def run_client(socket_path, details):
+    """Submit a book to the daemon and print what was written.
+
+    Args:
+        socket_path (str): Path of the daemon's Unix domain socket.
+        details (dict): Book details - url or search and format, date,
+                        rating and optional review.
+
+    """
+    try:
+        response = send_to_daemon(socket_path,
+                                  {'command': 'update', 'details': details})
+    except OSError:
+        print('No daemon is listening on {} - start one with '
+              "'ligrarian.py daemon'.".format(socket_path))
+        sys.exit(1)
+    except ValueError:
+        print('The daemon closed the connection without a response.')
+        sys.exit(1)
+
+    if not response['ok']:
+        print('Daemon failed to update the book - {}'.format(
+            response['error']))
+        sys.exit(1)
+
+    info = response['info']
+    print('The following information has been written to the spreadsheet:')
+    print(info['title'], info['author'], info['pages'],
+          info['category'], info['genre'], details['date'], sep='\n')
+
+
+def main():
+    """Coordinate updating of Goodreads account and writing to spreadsheet."""
+    args = parse_arguments()
+    try:
+        open("settings.ini")
+    except FileNotFoundError:
+        write_initial_config()
+
+    settings = retrieve_settings()
+    configure_waits(settings)
+    if args.pop('verbose', False):
+        logging.basicConfig(format='%(message)s')
+        logger.setLevel(logging.DEBUG)
+    if args.pop('trace', False):
+        tracer.enable()
+        # Registered to also run when a failed update exits early
+        atexit.register(finish_trace, settings.get('trace') or './trace.json')
+
+    if 'batch' in args:
+        check_and_prompt_for_email_password(settings)
+        workers = args['workers'] or int(settings.get('workers') or 1)
+        run_batch(settings, args['batch'], workers)
+        write_config(settings['email'], settings['password'],
+                     settings['prompt'])
+        return
+
+    if 'store' in args:
+        run_store(settings, args['store'], args['terms'], args['days'])
+        return
+
+    if 'fetch' in args:
+        run_fetch_metadata(settings, args['fetch'], args['concurrency'],
+                           args['output'])
+        return
+
+    if 'compact' in args:
+        print('Wrote {} journaled books to the spreadsheet.'.format(
+            compact_journal(settings['path'])))
+        return
+
+    socket_path = settings.get('socket') or './ligrarian.sock'
+    if 'daemon' in args:
+        if args['daemon'] == 'start':
+            check_and_prompt_for_email_password(settings)
+            run_daemon(settings, socket_path)
+            write_config(settings['email'], settings['password'],
+                         settings['prompt'])
+            return
+        try:
+            response = send_to_daemon(socket_path,
+                                      {'command': args['daemon']})
+        except OSError:
+            print('No daemon is listening on {}.'.format(socket_path))
+            sys.exit(1)
+        if args['daemon'] == 'status':
+            print('Daemon running for {} seconds, {} books updated.'.format(
+                response['uptime'], response['jobs']))
+        else:
+            print('Daemon stopping.')
+        return
+
+    if args.get('client'):
+        details = args
+        details['date'] = process_date(details['date'])
+        run_client(socket_path, details)
+        return
+
+    if 'gui' in args:
+        create_gui(settings)
+        write_config(settings['email'], settings['password'],
+                     settings['prompt'])
+        return
+
+    details = args
+    check_and_prompt_for_email_password(settings)
+    # Process date if given as (t)oday or (y)esterday into proper format
+    details['date'] = process_date(details['date'])
+
+    store = BookStore.from_settings(settings)
+    if details.get('search') and not details.get('url'):
+        resolve_search(settings, details, store)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        # The spreadsheet doesn't depend on the browser so is readied while
+        # the browser starts and updates Goodreads
+        workbook = None
+        if compaction_due(settings):
+            workbook = executor.submit(check_year_sheet_exists,
+                                       settings['path'], details['date'][-4:])
+
+        driver = create_driver(settings['headless'], settings.get('engine'),
+                               settings)
+        goodreads_login(driver, settings['email'], settings['password'],
+                        settings.get('cookies'))
+        try:
+            info = goodreads_update(driver, details, store, executor)[1]
+        except NoSuchElementException:
+            driver.close()
+            sys.exit()
+
+        driver.close()
+        print('Goodreads account updated.')
+
+        print('Updating Spreadsheet...')
+        info['category'], info['genre'] = category_and_genre(info['shelves'])
+        # A workbook that failed to load is left for compact_journal to
+        # load again, and report, once the row is safely journaled
+        if workbook is not None:
+            workbook = (workbook.result() if workbook.exception() is None
+                        else None)
+
+    if record_row(settings, info, details['date'], workbook):
+        destination = 'written to the spreadsheet'
+    else:
+        destination = "journaled for the spreadsheet's next compaction"
 
     print(('Ligrarian has completed and will now close. The following '
-           'information has been written to the spreadsheet:'))
+           'information has been {}:'.format(destination)))
     print(info['title'], info['author'], info['pages'],
           info['category'], info['genre'], details['date'], sep='\n')
 
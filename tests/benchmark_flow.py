@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+"""Benchmark the url, search and batch flows end to end against a stand-in.
+
+Runs ligrarian.main() as the command line would, in a scratch directory
+with its own settings.ini and copy of Ligrarian.xlsx, against the local
+Goodreads stand-in from tests/goodreads_standin.py. The wall time of every
+stage is recorded on each run and the p50 and p95 over the runs reported,
+so regressions show up without going near Goodreads. The stand-in's books
+are reset before each run while the saved cookies and book store are kept,
+as they would be between real runs, so the first run is the cold one.
+
+The selenium engine needs Firefox and geckodriver installed.
+
+Usage:
+    python3 tests/benchmark_flow.py [runs] [--engine selenium|http]
+                                    [--latency ms] [--books n]
+"""
+
+import argparse
+import contextlib
+import csv
+import functools
+import io
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import goodreads_standin  # noqa: E402
+import ligrarian  # noqa: E402
+
+STAGES = [
+    (ligrarian, 'create_driver'),
+    (ligrarian, 'goodreads_login'),
+    (ligrarian, 'goodreads_find'),
+    (ligrarian, 'goodreads_filter'),
+    (ligrarian, 'goodreads_get_book_info'),
+    (ligrarian, 'goodreads_date_input'),
+    (ligrarian, 'goodreads_add_review'),
+    (ligrarian, 'goodreads_rate_book'),
+    (ligrarian, 'goodreads_shelve'),
+    (ligrarian.GoodreadsSession, 'login'),
+    (ligrarian.GoodreadsSession, 'find'),
+    (ligrarian.GoodreadsSession, 'edit_review'),
+    (ligrarian.GoodreadsSession, 'rate'),
+    (ligrarian, 'goodreads_update'),
+    (ligrarian, 'record_row'),
+    (ligrarian, 'compact_journal'),
+]
+
+DATE = '05/03/2019'
+
+
+class Timings:
+    """Wall time spent in each stage over a number of runs."""
+
+    def __init__(self):
+        """Timings class constructor to initialise Timings object."""
+        self.runs = []
+
+    def timed(self, function, name):
+        """Return function wrapped to add its duration to the current run."""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.runs[-1][name] = (self.runs[-1].get(name, 0) +
+                                       time.perf_counter() - start)
+        return wrapper
+
+    @contextlib.contextmanager
+    def instrument(self):
+        """Time every stage while in the context."""
+        originals = [(owner, name, getattr(owner, name))
+                     for owner, name in STAGES]
+        for owner, name, function in originals:
+            setattr(owner, name, self.timed(function, name))
+        try:
+            yield
+        finally:
+            for owner, name, function in originals:
+                setattr(owner, name, function)
+
+    def run(self, argv):
+        """Run the command line with argv and time it as a whole."""
+        self.runs.append({})
+        sys.argv = ['ligrarian.py'] + argv
+        output = io.StringIO()
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(output):
+                ligrarian.main()
+        except SystemExit:
+            print(output.getvalue())
+            raise
+        self.runs[-1]['total'] = time.perf_counter() - start
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of values."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def write_settings(directory, engine):
+    """Write the scratch settings.ini and copy the spreadsheet template."""
+    shutil.copy(os.path.join(ROOT, 'Ligrarian.xlsx'), directory)
+    with open(os.path.join(directory, 'settings.ini'), 'w') as settings:
+        settings.write('\n'.join([
+            '[user]',
+            'email = {}'.format(goodreads_standin.EMAIL),
+            'password = {}'.format(goodreads_standin.PASSWORD),
+            '[settings]',
+            'prompt = ',
+            'path = ./Ligrarian.xlsx',
+            'headless = True',
+            'cookies = ./cookies.json',
+            'politeness = 0',
+            'cache = ./cache',
+            'store = ./books.db',
+            'engine = {}'.format(engine),
+            '[defaults]',
+            'format = Paperback',
+            'rating = 3',
+        ]) + '\n')
+
+
+def write_batch(path, server, books):
+    """Write a batch file alternating book URLs and searches."""
+    with open(path, 'w', newline='') as batch:
+        writer = csv.writer(batch)
+        writer.writerow(['url', 'search', 'format', 'date', 'rating',
+                         'review'])
+        editions = goodreads_standin.EDITIONS
+        for number in range(books):
+            if number % 2:
+                writer.writerow(['', 'East of Eden', 'k', DATE, '4', ''])
+            else:
+                href = editions[number // 2 % len(editions)][1]
+                writer.writerow([server.url + href, '', '', DATE, '4',
+                                 'Timshel'])
+
+
+def report(flow, timings):
+    """Print the p50 and p95 of every stage the flow used."""
+    print('{} ({} runs)'.format(flow, len(timings.runs)))
+    print('  {:<24} {:>6} {:>10} {:>10}'.format('stage', 'runs', 'p50 ms',
+                                                 'p95 ms'))
+    for name in [name for _, name in STAGES] + ['total']:
+        values = [run[name] for run in timings.runs if name in run]
+        if not values:
+            continue
+        print('  {:<24} {:>6} {:>10.1f} {:>10.1f}'.format(
+            name, len(values), percentile(values, 50) * 1000,
+            percentile(values, 95) * 1000))
+
+
+def main():
+    """Run each flow repeatedly against the stand-in and report timings."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('runs', nargs='?', type=int, default=20)
+    parser.add_argument('--engine', choices=['http', 'selenium'],
+                        default='http')
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Milliseconds to delay every response by")
+    parser.add_argument('--books', type=int, default=10,
+                        help="Books in each batch run")
+    args = parser.parse_args()
+
+    print('{} engine, {:g} ms latency'.format(args.engine, args.latency))
+    cwd = os.getcwd()
+    server = goodreads_standin.StandIn(latency=args.latency / 1000).start()
+    ligrarian.GOODREADS = server.url
+    flows = [
+        ('url', ['url', server.url + '/book/show/4406.East_of_Eden', DATE,
+                 '4', 'Timshel']),
+        ('search', ['search', 'East of Eden', 'k', DATE, '4']),
+        ('batch', ['batch', 'books.csv']),
+    ]
+    try:
+        for flow, argv in flows:
+            timings = Timings()
+            with tempfile.TemporaryDirectory() as directory:
+                os.chdir(directory)
+                write_settings(directory, args.engine)
+                write_batch('books.csv', server, args.books)
+                with timings.instrument():
+                    for _ in range(args.runs):
+                        server.books.clear()
+                        timings.run(argv)
+                os.chdir(cwd)
+            report(flow, timings)
+    finally:
+        os.chdir(cwd)
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
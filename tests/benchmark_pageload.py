@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""Benchmark browser page loads with and without the lean Firefox profile.
+
+Loads the local Goodreads stand-in's pages in a headless Firefox created by
+ligrarian.create_driver, first with the stock profile and then with the
+lean setting, and reports the p50 and p95 time driver.get takes on each
+page and how many images were requested. The stand-in's pages carry a
+number of slow images in place of the covers, avatars and adverts on
+Goodreads pages, which the lean profile neither fetches nor waits for.
+
+Needs Firefox and geckodriver installed.
+
+Usage:
+    python3 tests/benchmark_pageload.py [runs] [--latency ms] [--images n]
+                                        [--image-latency ms]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from benchmark_flow import percentile  # noqa: E402
+import goodreads_standin  # noqa: E402
+import ligrarian  # noqa: E402
+
+PAGES = [
+    ('home', '/'),
+    ('search', '/search?q=East+of+Eden'),
+    ('editions', '/work/editions/894752-east-of-eden'),
+    ('book', '/book/show/4406.East_of_Eden'),
+]
+
+
+def time_pages(server, lean, runs):
+    """Return each page's load times and the number of images requested."""
+    driver = ligrarian.create_driver(True, 'selenium', {'lean': lean})
+    times = {name: [] for name, _ in PAGES}
+    del server.requests[:]
+    try:
+        for _ in range(runs):
+            for name, path in PAGES:
+                start = time.perf_counter()
+                driver.get(server.url + path)
+                times[name].append(time.perf_counter() - start)
+    finally:
+        driver.quit()
+    images = len([path for _, path in server.requests
+                  if path.startswith('/images/')])
+    return times, images
+
+
+def main():
+    """Load each page repeatedly with each profile and report timings."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('runs', nargs='?', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Milliseconds to delay every response by")
+    parser.add_argument('--images', type=int, default=20,
+                        help="Images on every page")
+    parser.add_argument('--image-latency', type=float, default=100,
+                        help="Further milliseconds to delay images by")
+    args = parser.parse_args()
+
+    server = goodreads_standin.StandIn(
+        latency=args.latency / 1000, images=args.images,
+        image_latency=args.image_latency / 1000
+    ).start()
+    print('{:g} ms latency, {} images per page delayed {:g} ms'.format(
+        args.latency, args.images, args.image_latency))
+    try:
+        for profile, lean in [('stock', False), ('lean', True)]:
+            try:
+                times, images = time_pages(server, lean, args.runs)
+            except ligrarian.WebDriverException as error:
+                print('Firefox could not be started - {}'.format(error))
+                sys.exit(1)
+            print('{} profile ({} runs, {} images requested)'.format(
+                profile, args.runs, images))
+            print('  {:<10} {:>10} {:>10}'.format('page', 'p50 ms',
+                                                  'p95 ms'))
+            for name, _ in PAGES:
+                print('  {:<10} {:>10.1f} {:>10.1f}'.format(
+                    name, percentile(times[name], 50) * 1000,
+                    percentile(times[name], 95) * 1000))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
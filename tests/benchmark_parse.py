@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""Benchmark parse_book_html against the original full BeautifulSoup parse.
+
+Parses every page in tests/fixtures, padded with reviews to the size of a
+real Goodreads book page, with the original whole-tree implementation, the
+SoupStrainer restricted fallback and (if installed) lxml. Reports the best
+parse time and the peak memory allocated while parsing. lxml builds its
+tree in C so tracemalloc only sees the Python side of its memory.
+
+Usage:
+    python3 tests/benchmark_parse.py [reviews] [repeats]
+"""
+
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+import bs4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ligrarian  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'fixtures', 'book_*.html')
+
+REVIEW = """
+<div class="friendReviews elementListBrown">
+  <div class="section firstReview">
+    <div class="review" id="review_{0}" itemprop="reviews">
+      <a title="Reader {0}" class="left imgcol" href="/user/show/{0}">
+        <img alt="Reader {0}" class="circularIcon" src="/users/{0}.jpg">
+      </a>
+      <div class="left bodycol">
+        <div class="reviewHeader uitext stacked">
+          <span itemprop="author"><a class="user" href="/user/show/{0}">Reader {0}</a></span>
+          <span class="staticStars notranslate" title="it was amazing">
+            <span class="staticStar p10"></span><span class="staticStar p10"></span>
+          </span>
+          <a class="reviewDate createdAt right" href="/review/show/{0}">Jan 01, 2019</a>
+        </div>
+        <div class="reviewText stacked">
+          <span class="readable">
+            <span id="freeTextContainer{0}">A sprawling story of two families and
+            the choices that shape them. Timshel - thou mayest.</span>
+          </span>
+        </div>
+        <div class="updateActionLinks">
+          <a class="likeItContainer" href="/rating/like/{0}">like</a>
+          <a class="actionLinkLite" href="/review/show/{0}#comments">comment</a>
+        </div>
+      </div>
+    </div>
+  </div>
+</div>
+"""
+
+
+def baseline_parse(html):
+    """The original parse_page parsing: a full html.parser tree."""
+    info = {}
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    title_elem = soup.select('#bookTitle')
+    rough_title = title_elem[0].getText().strip().split('\n')
+    if len(rough_title) == 1:
+        info['title'] = rough_title[0].strip()
+    else:
+        info['title'] = rough_title[0].strip() + ' ' + rough_title[2].strip()
+
+    info['author'] = soup.select('.authorName')[0].getText().strip()
+
+    pages_elem = soup.findAll('span', attrs={'itemprop': 'numberOfPages'})
+    info['pages'] = int(pages_elem[0].getText().strip(' pages'))
+
+    return info
+
+
+def measure(parser, html, repeats):
+    """Return the best time in seconds and peak bytes of parser(html)."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parser(html)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    parser(html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def main():
+    """Print the timing and memory table for each fixture page."""
+    reviews = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    parsers = [('baseline', baseline_parse),
+               ('strainer', ligrarian.parse_book_soup)]
+    if ligrarian.lxml_html:
+        parsers.append(('lxml', ligrarian.parse_book_lxml))
+
+    for path in sorted(glob.glob(FIXTURES)):
+        with open(path) as page:
+            html = page.read().replace(
+                '<!-- REVIEWS -->',
+                ''.join(REVIEW.format(number) for number in range(reviews))
+            )
+        print('{} ({:.0f} KB)'.format(os.path.basename(path),
+                                      len(html) / 1024))
+        baseline_time = None
+        for name, parser in parsers:
+            seconds, peak = measure(parser, html, repeats)
+            baseline_time = baseline_time or seconds
+            print('  {:<9} {:8.1f} ms {:8.0f} KB peak {:6.1f}x'.format(
+                name, seconds * 1000, peak / 1024, baseline_time / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""Benchmark finding the append row with next_row against first_blank_row.
+
+Fills the Overall sheet of the bundled Ligrarian.xlsx with increasing
+numbers of books then times appending further books, with the row found by
+the original first_blank_row scan and by next_row. The cost of first_blank_row
+grows with the history while next_row, after its first lookup of the
+sheet's dimensions, should stay flat.
+
+Usage:
+    python3 tests/benchmark_sheet.py [appends]
+"""
+
+import os
+import sys
+import time
+
+import openpyxl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import ligrarian  # noqa: E402
+
+SIZES = (100, 1000, 5000, 20000)
+
+
+def filled_sheet(books):
+    """Return the template's Overall sheet holding books rows."""
+    workbook = openpyxl.load_workbook(os.path.join(ROOT, 'Ligrarian.xlsx'))
+    sheet = workbook['Overall']
+    for row in range(2, books + 2):
+        for column, value in enumerate(
+                ['Title', 'Author', 300, 'Fiction', 'Genre', '01/01/2020'], 1):
+            sheet.cell(row=row, column=column).value = value
+    return sheet
+
+
+def time_appends(find_row, sheet, appends):
+    """Return the seconds to find the first row and the mean for the rest."""
+    times = []
+    for _ in range(appends + 1):
+        start = time.perf_counter()
+        row = find_row(sheet)
+        times.append(time.perf_counter() - start)
+        sheet.cell(row=row, column=1).value = 'Appended'
+    return times[0], sum(times[1:]) / appends
+
+
+def main():
+    """Print the per-append cost of each approach for each history size."""
+    appends = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    print('{:>7} {:>16} {:>16} {:>16}'.format(
+        'books', 'first_blank_row', 'next_row first', 'next_row cached'))
+    for books in SIZES:
+        scan = time_appends(ligrarian.first_blank_row, filled_sheet(books),
+                            appends)[1]
+        first, cached = time_appends(ligrarian.next_row, filled_sheet(books),
+                                     appends)
+        print('{:>7} {:>13.1f} us {:>13.1f} us {:>13.1f} us'.format(
+            books, scan * 1e6, first * 1e6, cached * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+"""Check ligrarian.py's start up time against a budget with -X importtime.
+
+Runs `ligrarian.py --help` and the daemon client path (a url command with
+--daemon, here with no daemon listening) in fresh interpreters under
+-X importtime. Reports the best wall time and import time of each, and the
+slowest imports. Exits with status 1 if any heavy dependency was imported
+or a budget was exceeded, so it can guard against start up regressions.
+
+Usage:
+    python3 tests/benchmark_startup.py [--runs n] [--help-budget ms]
+                                       [--client-budget ms]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))), 'ligrarian.py')
+
+HEAVY = ['tkinter', 'bs4', 'openpyxl', 'requests', 'selenium.webdriver',
+         'lxml', 'asyncio']
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run(argv, directory):
+    """Run ligrarian.py with argv under -X importtime.
+
+    Returns:
+        Tuple of the wall seconds, total import seconds and a dictionary of
+        every imported module to its cumulative import microseconds.
+
+    """
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', SCRIPT] + argv, cwd=directory,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    wall = time.perf_counter() - start
+    imports = {}
+    total = 0
+    for line in process.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imports[match.group(4)] = int(match.group(2))
+            # Nested imports are indented further and already counted
+            if len(match.group(3)) == 1:
+                total += int(match.group(2))
+    return wall, total / 1e6, imports
+
+
+def check(name, argv, budget, runs, directory):
+    """Report one command's start up and return whether it's in budget."""
+    best_wall, import_time, best_imports = min(
+        (run(argv, directory) for _ in range(runs)), key=lambda r: r[0]
+    )
+    heavy = [module for module in HEAVY if module in best_imports]
+    slowest = sorted(best_imports.items(), key=lambda item: -item[1])[:5]
+
+    print('{}: {:.0f} ms wall (budget {:g} ms), {:.0f} ms importing'.format(
+        name, best_wall * 1000, budget, import_time * 1000))
+    print('  slowest imports: ' + ', '.join(
+        '{} {:.1f} ms'.format(module, micros / 1000)
+        for module, micros in slowest))
+    if heavy:
+        print('  FAIL - imported ' + ', '.join(heavy))
+    if best_wall * 1000 > budget:
+        print('  FAIL - over budget')
+    return not heavy and best_wall * 1000 <= budget
+
+
+def main():
+    """Check the --help and daemon client start up against their budgets."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--help-budget', type=float, default=150,
+                        help="Milliseconds allowed for --help")
+    parser.add_argument('--client-budget', type=float, default=150,
+                        help="Milliseconds allowed for the client path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'settings.ini'), 'w') as settings:
+            settings.write('[user]\nemail = \npassword = \n'
+                           '[settings]\nsocket = ./none.sock\n')
+        within = [
+            check('--help', ['--help'], args.help_budget, args.runs,
+                  directory),
+            check('client', ['url', 'https://www.goodreads.com/book/show/1',
+                             't', '4', '--daemon'],
+                  args.client_budget, args.runs, directory),
+        ]
+    sys.exit(0 if all(within) else 1)
+
+
+if __name__ == '__main__':
+    main()
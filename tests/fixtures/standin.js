@@ -0,0 +1,76 @@
+// Minimal versions of the Goodreads page scripts the browser flow relies on:
+// the rating stars, the shelf menu and the review page's reading sessions.
+(function () {
+  var token = document.querySelector('meta[name="csrf-token"]').content;
+  var sessionsAdded = 0;
+
+  function post(url, data) {
+    return fetch(url, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'X-CSRF-Token': token,
+        'X-Requested-With': 'XMLHttpRequest'
+      },
+      body: new URLSearchParams(data).toString()
+    });
+  }
+
+  function rate(star) {
+    var stars = star.parentNode;
+    var all = Array.prototype.slice.call(stars.querySelectorAll('.star'));
+    var rating = all.indexOf(star) + 1;
+    all.forEach(function (each, index) {
+      each.className = 'star ' + (index < rating ? 'on' : 'off');
+    });
+    post(stars.getAttribute('data-submit-url'), {rating: rating});
+  }
+
+  function toggleShelfList() {
+    var list = document.querySelector('.wtrShelfList');
+    list.style.display = list.style.display === 'none' ? 'block' : 'none';
+  }
+
+  function addSession() {
+    var entries = document.querySelectorAll('.readingSessionEntry');
+    var last = entries[entries.length - 1];
+    var code = last.id.slice(19);
+    var entry = last.cloneNode(true);
+    var newCode = 'new' + (entries.length + sessionsAdded++);
+    entry.id = 'readingSessionEntry' + newCode;
+    Array.prototype.forEach.call(entry.querySelectorAll('select'),
+      function (select) {
+        select.name = select.name.replace(code, newCode);
+        select.selectedIndex = 0;
+      });
+    last.parentNode.appendChild(entry);
+  }
+
+  document.addEventListener('click', function (event) {
+    var target = event.target;
+    if (target.matches('.stars .star')) {
+      event.preventDefault();
+      rate(target);
+    } else if (target.matches('.wtrShelfButton')) {
+      toggleShelfList();
+    } else if (target.id === 'readingSessionAddLink') {
+      event.preventDefault();
+      addSession();
+    } else if (target.matches('.smallLink.closed')) {
+      event.preventDefault();
+      document.getElementById('review_recommendation').style.display = 'block';
+    }
+  });
+
+  document.addEventListener('keydown', function (event) {
+    var field = event.target;
+    if (event.key === 'Enter' && field.matches('.wtrShelfSearchField')) {
+      var stars = document.querySelector('.stars[data-resource-id]');
+      post('/shelf/add_to_shelf', {
+        book_id: stars.getAttribute('data-resource-id'),
+        name: field.value
+      });
+    }
+  });
+})();
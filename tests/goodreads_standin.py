@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+"""Local stand-in for the Goodreads pages and endpoints Ligrarian uses.
+
+Serves the recorded pages in tests/fixtures for the homepage login, search,
+editions filter, book page and review edit page, and accepts the review,
+rating and shelf requests, checking their authenticity tokens. A small
+script stands in for the page scripts the browser flow clicks through. What
+each book has been updated with is kept so a run's effect can be checked
+without touching Goodreads, and every response can be delayed to mimic the
+network. Pages can also be given a number of slow images, standing in for
+the covers, avatars and adverts a browser loads alongside Goodreads pages.
+
+Usage:
+    python3 tests/goodreads_standin.py [port] [latency ms] [images]
+"""
+
+import http.server
+import json
+import os
+import re
+import socketserver
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'fixtures')
+
+EMAIL = 'reader@example.com'
+PASSWORD = 'secret'
+TOKEN = 'standin-token'
+COOKIE = '_session_id=standin'
+SCRIPT = '<script src="/standin.js"></script>'
+IMAGE = '<img src="/images/{}.gif" width="50" height="75">'
+# A transparent 1x1 GIF
+GIF = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!'
+       b'\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00'
+       b'\x00\x02\x02D\x01\x00;')
+
+PERSONAL = """<ul class="siteHeader__personal">
+        <li class="personalNav"><a href="/user/show/1">Reader</a></li>
+      </ul>"""
+
+EDITIONS = [
+    ('Hardcover', '/book/show/5309.East_of_Eden'),
+    ('Paperback', '/book/show/4406.East_of_Eden'),
+    ('Kindle Edition', '/book/show/23215474-east-of-eden'),
+    ('Mass Market Paperback', '/book/show/7107.East_of_Eden'),
+]
+
+EDITION = """<div class="elementList clearFix">
+        <div class="editionData">
+          <div class="dataRow">
+            <a class="bookTitle" href="{1}">East of Eden ({0})</a>
+          </div>
+          <div class="dataRow">{0}, 601 pages</div>
+        </div>
+      </div>"""
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+
+def fixture(name):
+    """Return the text of a recorded page."""
+    with open(os.path.join(FIXTURES, name)) as page:
+        return page.read()
+
+
+def options(pairs, chosen):
+    """Return option elements for (value, text) pairs, selecting chosen."""
+    return ''.join(
+        '<option value="{0}"{2}>{1}</option>'.format(
+            value, text, ' selected="selected"' if value == chosen else '')
+        for value, text in [('', '')] + pairs
+    )
+
+
+def reading_session(code, date=None):
+    """Return the date pickers of a reading session, set to date if given."""
+    year, month, day = date or ('', '', '')
+    picker = 'readingSessionDatePicker{}[end]'.format(code)
+    return (
+        '<div id="readingSessionEntry{0}" class="readingSessionEntry">'
+        '<select name="{1}[year]">{2}</select>'
+        '<select name="{1}[month]">{3}</select>'
+        '<select name="{1}[day]">{4}</select></div>'
+    ).format(
+        code, picker,
+        options([(str(year), str(year)) for year in range(2000, 2031)], year),
+        options([(str(number), name)
+                 for number, name in enumerate(MONTHS, 1)], month),
+        options([(str(day), str(day)) for day in range(1, 32)], day),
+    )
+
+
+class Book:
+    """What a stand-in book has been updated with."""
+
+    def __init__(self):
+        """Book class constructor to initialise an unread Book object."""
+        self.sessions = {}
+        self.review = ''
+        self.rating = 0
+        self.shelves = []
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """Answer a request as Goodreads would."""
+
+    def log_message(self, format, *args):
+        """Keep the test and benchmark output quiet."""
+
+    @property
+    def logged_in(self):
+        """Whether the request carries the signed in session cookie."""
+        return COOKIE in (self.headers.get('Cookie') or '')
+
+    def send(self, status, body='', content_type='text/html', headers=()):
+        """Send a response after the server's latency."""
+        time.sleep(self.server.latency)
+        if isinstance(body, str):
+            body = body.encode()
+            content_type += '; charset=utf-8'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def redirect(self, location, headers=()):
+        """Send a redirect to location."""
+        self.send(302, headers=[('Location', location)] + list(headers))
+
+    def page(self, html, **replacements):
+        """Send a page, signed in if the request is, with its scripts."""
+        if self.logged_in:
+            html = html.replace('<!-- PERSONAL -->', PERSONAL)
+        for placeholder, content in replacements.items():
+            html = html.replace('<!-- {} -->'.format(placeholder.upper()),
+                                content)
+        images = ''.join(IMAGE.format(number)
+                         for number in range(self.server.images))
+        self.send(200, html.replace('</body>',
+                                    images + SCRIPT + '\n</body>'))
+
+    def do_GET(self):
+        """Serve the page at the requested path."""
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        self.server.log('GET', url.path)
+
+        book = re.match(r'/book/show/(\d+)', url.path)
+        review = re.match(r'/review/edit/(\d+)', url.path)
+        if url.path == '/':
+            if self.logged_in:
+                self.page(fixture('home.html'))
+            else:
+                self.page(fixture('home.html'),
+                          sign_in=fixture('sign_in.html'))
+        elif url.path == '/standin.js':
+            self.send(200, fixture('standin.js'), 'application/javascript')
+        elif url.path.startswith('/images/'):
+            time.sleep(self.server.image_latency)
+            self.send(200, GIF, 'image/gif')
+        elif url.path == '/search':
+            self.page(fixture('search.html'))
+        elif url.path.startswith('/work/editions/'):
+            book_format = query.get('filter_by_format', [''])[0]
+            self.page(fixture('editions.html'), editions=''.join(
+                EDITION.format(name, href) for name, href in EDITIONS
+                if not book_format or name == book_format
+            ))
+        elif book:
+            self.book_page(book.group(1))
+        elif review and self.logged_in:
+            self.review_page(review.group(1))
+        elif review:
+            self.redirect('/')
+        else:
+            self.send(404, 'Not Found')
+
+    def book_page(self, book_id):
+        """Send the book page showing the book's shelf and rating."""
+        book = self.server.books.get(book_id, Book())
+        html = fixture('book_page.html').replace('4406', book_id)
+        if book.shelves:
+            html = html.replace('wtrRight wtrUp', 'wtrRight wtrDown')
+        stars = iter(range(1, 6))
+        html = re.sub(
+            'class="star off"',
+            lambda match: 'class="star {}"'.format(
+                'on' if next(stars) <= book.rating else 'off'),
+            html
+        )
+        self.page(html)
+
+    def review_page(self, book_id):
+        """Send the review edit page with the book's reading sessions."""
+        book = self.server.books.get(book_id, Book())
+        sessions = dict(book.sessions) or {'10000': None}
+        self.page(
+            fixture('review_edit.html').replace('4406', book_id),
+            sessions=''.join(reading_session(code, date)
+                             for code, date in sessions.items())
+        )
+
+    def do_POST(self):
+        """Carry out the form submission or widget request."""
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        fields = {name: values[-1] for name, values in
+                  parse_qs(self.rfile.read(length).decode(),
+                           keep_blank_values=True).items()}
+        self.server.log('POST', url.path)
+
+        token = (fields.get('authenticity_token') or
+                 self.headers.get('X-CSRF-Token'))
+        if url.path == '/user/sign_in':
+            if token != TOKEN:
+                self.send(422, 'Invalid authenticity token')
+            elif (fields.get('user[email]') == self.server.email and
+                    fields.get('user[password]') == self.server.password):
+                self.redirect('/', [('Set-Cookie', COOKIE + '; Path=/')])
+            else:
+                self.redirect('/')
+            return
+        if not self.logged_in:
+            self.send(401, 'Sign in first')
+            return
+        if token != TOKEN:
+            self.send(422, 'Invalid authenticity token')
+            return
+
+        review = re.match(r'/review/update/(\d+)', url.path)
+        rate = re.match(r'/review/rate/(\d+)', url.path)
+        with self.server.lock:
+            if review:
+                self.update_review(review.group(1), fields)
+                self.redirect('/book/show/{}'.format(review.group(1)))
+            elif rate:
+                self.server.book(rate.group(1)).rating = int(fields['rating'])
+                self.send(200, json.dumps({'rating': fields['rating']}),
+                          'application/json')
+            elif url.path == '/shelf/add_to_shelf':
+                book = self.server.book(fields['book_id'])
+                if fields['name'] not in book.shelves:
+                    book.shelves.append(fields['name'])
+                self.send(200, json.dumps({'shelves': book.shelves}),
+                          'application/json')
+            else:
+                self.send(404, 'Not Found')
+
+    def update_review(self, book_id, fields):
+        """Save the review page's review and reading session dates."""
+        book = self.server.book(book_id)
+        book.review = fields.get('review[review]', '')
+        for name, year in fields.items():
+            session = re.match(
+                r'readingSessionDatePicker(\w+)\[end\]\[year\]', name)
+            if not session or not year:
+                continue
+            code = session.group(1)
+            picker = 'readingSessionDatePicker{}[end]'.format(code)
+            if not code.isdigit():
+                code = str(10000 + len(book.sessions))
+            book.sessions[code] = (year, fields[picker + '[month]'],
+                                   fields[picker + '[day]'])
+        if 'read' not in book.shelves:
+            book.shelves.insert(0, 'read')
+
+
+class StandIn(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """Goodreads stand-in server, run in a background thread."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0, email=EMAIL, password=PASSWORD,
+                 images=0, image_latency=0):
+        """StandIn class constructor to initialise StandIn object.
+
+        Args:
+            port (int): Port to listen on, 0 for any free port.
+            latency (float): Seconds to delay every response by.
+            email (str): Email address of the only account.
+            password (str): Password of the only account.
+            images (int): Number of images to add to every page.
+            image_latency (float): Further seconds to delay images by.
+
+        """
+        super().__init__(('127.0.0.1', port), StandInHandler)
+        self.latency = latency
+        self.images = images
+        self.image_latency = image_latency
+        self.email = email
+        self.password = password
+        self.books = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        """Address to use in place of https://www.goodreads.com."""
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def book(self, book_id):
+        """Return the state of the book with book_id, creating it."""
+        return self.books.setdefault(book_id, Book())
+
+    def log(self, method, path):
+        """Record a request made to the server."""
+        with self.lock:
+            self.requests.append((method, path))
+
+    def start(self):
+        """Serve requests in a background thread and return the server."""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    """Serve the stand-in until interrupted."""
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0
+    images = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    server = StandIn(port, latency, images=images)
+    print('Goodreads stand-in listening on {} (login {} / {}).'.format(
+        server.url, EMAIL, PASSWORD))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
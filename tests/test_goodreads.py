@@ -2,6 +2,7 @@
 
 import pytest
 import unittest.mock as mock
+import urllib.parse
 
 import ligrarian
 
@@ -40,6 +41,73 @@ class TestCreateDriver:
         captured_stdout = capsys.readouterr()[0]
         assert "headless" in captured_stdout
 
+    @mock.patch('ligrarian.webdriver.Firefox')
+    def test_lean_profile(self, mocked_driver):
+        """The lean setting should block images and load pages eagerly."""
+        ligrarian.create_driver(False, 'selenium', {'lean': True})
+        options = mocked_driver.call_args[1]['options']
+        capabilities = options.to_capabilities()
+        prefs = capabilities['moz:firefoxOptions']['prefs']
+        assert not options.headless
+        assert capabilities['pageLoadStrategy'] == 'eager'
+        assert prefs['permissions.default.image'] == 2
+        assert prefs['network.proxy.type'] == 2
+
+    def test_blocking_pac(self):
+        """Extra blocked hosts should be added to the built in ones."""
+        options = ligrarian.Options()
+        ligrarian.lean_profile(options, 'ads.example.com, ')
+        pac = urllib.parse.unquote(options.preferences[
+            'network.proxy.autoconfig_url'].split(',', 1)[1])
+        assert '"ads.example.com"' in pac
+        assert '"doubleclick.net"' in pac
+        assert '""' not in pac
+
+
+class TestPersistentProfile:
+    """Test the profile directory is locked, reused and kept in size."""
+
+    def test_profile_reused(self, tmp_path):
+        """The browser should be pointed at the profile directory."""
+        with mock.patch('ligrarian.webdriver.Firefox') as mocked_driver:
+            ligrarian.create_driver(False, 'selenium',
+                                    {'profile': str(tmp_path)})
+        options = mocked_driver.call_args[1]['options']
+        assert options.arguments == ['-profile', str(tmp_path)]
+        assert not options.headless
+
+    def test_locked_profile_not_shared(self, tmp_path, capsys):
+        """A profile already in use should leave a fresh one to be used."""
+        settings = {'profile': str(tmp_path)}
+        assert ligrarian.persistent_profile(ligrarian.Options(), settings)
+        options = ligrarian.Options()
+        assert not ligrarian.persistent_profile(options, settings)
+        assert options.arguments == []
+        assert 'in use' in capsys.readouterr()[0]
+
+    def test_trim_oldest_caches(self, tmp_path):
+        """Only cache files should go, oldest first, to meet the limit."""
+        entries = tmp_path / 'cache2' / 'entries'
+        entries.mkdir(parents=True)
+        for number in range(3):
+            entry = entries / str(number)
+            entry.write_bytes(b'x' * 100)
+            ligrarian.os.utime(str(entry), (number, number))
+        (tmp_path / 'cookies.sqlite').write_bytes(b'x' * 100)
+        assert ligrarian.trim_profile(str(tmp_path), 250) == 200
+        assert sorted(ligrarian.os.listdir(str(entries))) == ['2']
+        assert (tmp_path / 'cookies.sqlite').exists()
+
+    @mock.patch('ligrarian.trim_profile', return_value=0)
+    def test_trimmed_periodically(self, mock_trim, tmp_path):
+        """The profile should only be trimmed once per cleanup interval."""
+        for name in ['first', 'second']:
+            ligrarian.persistent_profile(ligrarian.Options(), {
+                'profile': str(tmp_path / name), 'profile_cleanup': '3600'})
+            ligrarian.held_profiles.pop(str(tmp_path / name)).close()
+        ligrarian.persistent_profile(ligrarian.Options(), {
+            'profile': str(tmp_path / 'first'), 'profile_cleanup': '3600'})
+        assert mock_trim.call_count == 2
 
 class TestCategoryAndGenre:
     """Test function returns right category, genre tuple."""
@@ -60,18 +128,570 @@ class TestGetShelvedStatus:
 
     @mock.patch('ligrarian.webdriver.firefox')
     def test_shelved_returns_true(self, mocked_driver):
-        """Seleniums NoSuchElementException being raised indicates shelved."""
-        mocked_driver.find_element_by_class_name.side_effect = (
-                ligrarian.NoSuchElementException
-        )
+        """No 'want to read' element being found indicates shelved."""
+        mocked_driver.find_elements.return_value = []
         read_status = ligrarian.goodreads_get_shelved_status(mocked_driver)
 
         assert read_status is True
 
     @mock.patch('ligrarian.webdriver.firefox')
     def test_unshelved_book_returns_false(self, mocked_driver):
-        """Successfull element_by_class_name query indicated unshelved."""
-        mocked_driver.find_element_by_class_name.return_value = "Found"
+        """Successfull find_elements query indicated unshelved."""
+        mocked_driver.find_elements.return_value = ["Found"]
         read_status = ligrarian.goodreads_get_shelved_status(mocked_driver)
 
         assert read_status is False
+
+    @mock.patch('ligrarian.webdriver.firefox')
+    def test_status_checked_without_waiting(self, mocked_driver):
+        """Absence should be answered without an explicit wait."""
+        mocked_driver.find_elements.return_value = []
+        with mock.patch('ligrarian.WebDriverWait') as mock_wait:
+            ligrarian.goodreads_get_shelved_status(mocked_driver)
+        mock_wait.assert_not_called()
+
+
+@mock.patch('ligrarian.goodreads_shelve')
+@mock.patch('ligrarian.goodreads_rate_book')
+@mock.patch('ligrarian.goodreads_add_review')
+@mock.patch('ligrarian.goodreads_date_input')
+@mock.patch('ligrarian.goodreads_get_shelved_status', return_value=False)
+@mock.patch('ligrarian.goodreads_get_book_info',
+            return_value={'shelves': ['Fiction']})
+class TestGoodreadsUpdate:
+    """Test function navigates to the book and runs each update step."""
+
+    def test_url_visited(self, *mocks):
+        """A url in details should be visited directly."""
+        driver = mock.MagicMock()
+        details = {'url': 'book url', 'date': '01/01/2020', 'rating': '4'}
+        ligrarian.goodreads_update(driver, details)
+        assert driver.get.call_args_list[0] == mock.call('book url')
+
+    @mock.patch('ligrarian.goodreads_filter', return_value='filtered url')
+    @mock.patch('ligrarian.goodreads_find')
+    def test_search_used_without_url(self, mock_find, mock_filter, *mocks):
+        """Search and format should be used when there's no url."""
+        details = {'search': 'terms', 'format': 'k',
+                   'date': '01/01/2020', 'rating': '4'}
+        url, info = ligrarian.goodreads_update(mock.MagicMock(), details)
+        assert url == 'filtered url'
+        mock_filter.assert_called_once()
+
+    @mock.patch('ligrarian.goodreads_filter', return_value='filtered url')
+    @mock.patch('ligrarian.goodreads_find')
+    def test_stored_search_skips_search(self, mock_find, mock_filter,
+                                        *mocks):
+        """A search resolved before should go straight to its edition."""
+        store = mock.MagicMock()
+        store.get_search.return_value = 'stored url'
+        driver = mock.MagicMock()
+        details = {'search': 'terms', 'format': 'k',
+                   'date': '01/01/2020', 'rating': '4'}
+        url, info = ligrarian.goodreads_update(driver, details, store)
+        assert url == 'stored url'
+        assert driver.get.call_args_list[0] == mock.call('stored url')
+        mock_find.assert_not_called()
+        store.put_search.assert_not_called()
+
+    @mock.patch('ligrarian.goodreads_filter', return_value='filtered url')
+    @mock.patch('ligrarian.goodreads_find')
+    def test_search_stored(self, mock_find, mock_filter, *mocks):
+        """A new search's edition should be stored for next time."""
+        store = mock.MagicMock()
+        store.get_search.return_value = None
+        details = {'search': 'terms', 'format': 'k',
+                   'date': '01/01/2020', 'rating': '4'}
+        ligrarian.goodreads_update(mock.MagicMock(), details, store)
+        store.put_search.assert_called_once_with('terms', 'k',
+                                                 'filtered url')
+
+    def test_returns_url_and_info(self, *mocks):
+        """Tuple of url and book info should be returned."""
+        details = {'url': 'book url', 'date': '01/01/2020', 'rating': '4'}
+        returned = ligrarian.goodreads_update(mock.MagicMock(), details)
+        assert returned == ('book url', {'shelves': ['Fiction']})
+
+    def test_shelves_passed_to_shelve(self, *mocks):
+        """The extracted shelves should be used to shelve the book."""
+        mock_shelve = mocks[-1]
+        details = {'url': 'book url', 'date': '01/01/2020', 'rating': '4'}
+        ligrarian.goodreads_update(mock.MagicMock(), details)
+        mock_shelve.assert_called_once_with(mock.ANY, ['Fiction'])
+
+    def test_no_review_skips_review(self, *mocks):
+        """No review given should mean no review is added."""
+        mock_add_review = mocks[3]
+        details = {'url': 'book url', 'date': '01/01/2020', 'rating': '4'}
+        ligrarian.goodreads_update(mock.MagicMock(), details)
+        mock_add_review.assert_not_called()
+
+
+@mock.patch('ligrarian.goodreads_shelve')
+@mock.patch('ligrarian.goodreads_rate_book')
+@mock.patch('ligrarian.goodreads_date_input')
+@mock.patch('ligrarian.goodreads_get_shelved_status', return_value=False)
+@mock.patch('ligrarian.find_element')
+class TestBackgroundMetadata:
+    """Test the book's details are fetched alongside the browser steps."""
+
+    @mock.patch('ligrarian.parse_book_html',
+                return_value={'shelves': ['Fiction']})
+    def test_parsed_with_executor(self, mock_parse, *mocks):
+        """The page should be read once and parsed by the executor."""
+        mock_shelve = mocks[-1]
+        details = {'url': 'book url', 'date': '01/01/2020', 'rating': '5'}
+        driver = mock.MagicMock(current_url='book url', page_source='page')
+        store = mock.MagicMock()
+        store.get.return_value = None
+        with ligrarian.concurrent.futures.ThreadPoolExecutor(1) as executor:
+            url, info = ligrarian.goodreads_update(driver, details, store,
+                                                   executor)
+        mock_parse.assert_called_once_with('page')
+        store.put.assert_called_once_with('book url', info)
+        assert info == {'shelves': ['Fiction', '5-star-books']}
+        mock_shelve.assert_called_once_with(driver,
+                                            ['Fiction', '5-star-books'])
+
+    @mock.patch('ligrarian.requests')
+    def test_no_download(self, mock_requests, *mocks):
+        """The book page shouldn't be downloaded again outside the browser."""
+        details = {'url': 'book url', 'date': '01/01/2020', 'rating': '4'}
+        driver = mock.MagicMock(current_url='book url',
+                                page_source=BOOK_HTML)
+        with ligrarian.concurrent.futures.ThreadPoolExecutor(1) as executor:
+            ligrarian.goodreads_update(driver, details, None, executor)
+        assert not mock_requests.mock_calls
+
+    def test_failed_parse_reads_page(self, *mocks):
+        """A failed background parse should fall back to the page source."""
+        metadata = ligrarian.concurrent.futures.Future()
+        metadata.set_exception(ValueError('Book page is missing its title'))
+        driver = mock.MagicMock(page_source=BOOK_HTML)
+        info = ligrarian.goodreads_get_book_info(driver, '4', None, metadata)
+        assert info['title'] == 'East of Eden (Steinbeck Classics #1)'
+
+
+class TestCookies:
+    """Test the cookie jar is saved and only unexpired cookies loaded."""
+
+    def test_round_trip(self, tmp_path):
+        """Saved cookies should be loaded back unchanged."""
+        jar = str(tmp_path / 'cookies.json')
+        driver = mock.MagicMock()
+        cookies = [{'name': 'session', 'value': 'x',
+                    'expiry': int(ligrarian.time.time()) + 60}]
+        driver.get_cookies.return_value = cookies
+        ligrarian.save_cookies(driver, jar, 'email')
+        assert ligrarian.load_cookies(jar, 'email') == cookies
+
+    def test_expired_cookies_dropped(self, tmp_path):
+        """Cookies past their expiry shouldn't be loaded."""
+        jar = str(tmp_path / 'cookies.json')
+        driver = mock.MagicMock()
+        now = int(ligrarian.time.time())
+        driver.get_cookies.return_value = [
+            {'name': 'old', 'value': 'x', 'expiry': now - 60},
+            {'name': 'new', 'value': 'y', 'expiry': now + 60},
+        ]
+        ligrarian.save_cookies(driver, jar, 'email')
+        assert [c['name'] for c in ligrarian.load_cookies(jar, 'email')] == ['new']
+
+    def test_null_expiry_left_out(self, tmp_path):
+        """A null expiry from an older jar shouldn't reach the webdriver."""
+        jar = tmp_path / 'cookies.json'
+        jar.write_text('{"email": "email", "cookies": [{"name": "session", '
+                       '"value": "x", "expiry": null}]}')
+        assert ligrarian.load_cookies(str(jar), 'email') == [
+            {'name': 'session', 'value': 'x'}]
+
+    def test_other_account_loads_nothing(self, tmp_path):
+        """A jar saved for another email address shouldn't be used."""
+        jar = str(tmp_path / 'cookies.json')
+        driver = mock.MagicMock()
+        driver.get_cookies.return_value = [
+            {'name': 'session', 'value': 'x',
+             'expiry': int(ligrarian.time.time()) + 60}]
+        ligrarian.save_cookies(driver, jar, 'Old@example.com')
+        assert ligrarian.load_cookies(jar, 'old@example.com ')
+        assert ligrarian.load_cookies(jar, 'new@example.com') == []
+
+    def test_missing_jar_loads_nothing(self, tmp_path):
+        """No saved jar should return an empty list."""
+        assert ligrarian.load_cookies(str(tmp_path / 'missing.json'),
+                                      'email') == []
+
+
+@mock.patch('ligrarian.find_element')
+class TestGoodreadsLogin:
+    """Test saved cookies are preferred over the login form."""
+
+    @mock.patch('ligrarian.save_cookies')
+    @mock.patch('ligrarian.goodreads_cookie_login', return_value=True)
+    def test_cookie_login_skips_form(self, mock_cookie_login, mock_save,
+                                     mock_find):
+        """Accepted cookies should mean the form is never filled in."""
+        driver = mock.MagicMock()
+        ligrarian.goodreads_login(driver, 'email', 'pass', 'cookies.json')
+        mock_find.assert_not_called()
+        mock_save.assert_not_called()
+
+    @mock.patch('ligrarian.save_cookies')
+    @mock.patch('ligrarian.goodreads_cookie_login', return_value=False)
+    def test_form_login_saves_cookies(self, mock_cookie_login, mock_save,
+                                      mock_find):
+        """Rejected cookies should fall back to the form and save new ones."""
+        driver = mock.MagicMock()
+        ligrarian.goodreads_login(driver, 'email', 'pass', 'cookies.json')
+        mock_find.assert_any_call(driver, ligrarian.By.NAME, 'user[email]',
+                                  'login')
+        mock_save.assert_called_once_with(driver, 'cookies.json', 'email')
+
+
+BOOK_HTML = """
+<h1 id="bookTitle">
+  East of Eden
+
+  <a>(Steinbeck Classics #1)</a>
+</h1>
+<a class="authorName"><span>John Steinbeck</span></a>
+<span itemprop="numberOfPages">601 pages</span>
+<a class="actionLinkLite bookPageGenreLink">Fiction</a>
+<a class="actionLinkLite bookPageGenreLink">2,000 users</a>
+<a class="actionLinkLite bookPageGenreLink">Classics</a>
+<a class="actionLinkLite bookPageGenreLink">Fiction</a>
+"""
+
+
+class TestGetBookInfo:
+    """Test the book's details are all taken from one read of the page."""
+
+    def test_info_parsed(self):
+        """Title, author, pages and deduplicated shelves should be parsed."""
+        driver = mock.MagicMock(page_source=BOOK_HTML)
+        info = ligrarian.goodreads_get_book_info(driver, '4')
+        assert info == {'title': 'East of Eden (Steinbeck Classics #1)',
+                        'author': 'John Steinbeck', 'pages': 601,
+                        'shelves': ['Fiction', 'Classics']}
+
+    def test_five_star_shelf(self):
+        """A rating of 5 should add the 5-star-books shelf."""
+        driver = mock.MagicMock(page_source=BOOK_HTML)
+        info = ligrarian.goodreads_get_book_info(driver, '5')
+        assert info['shelves'][-1] == '5-star-books'
+
+    def test_stored_book_not_parsed(self):
+        """A book in the store shouldn't have its page source read."""
+        driver = mock.MagicMock()
+        store = mock.MagicMock()
+        store.get.return_value = {'shelves': ['Fiction']}
+        info = ligrarian.goodreads_get_book_info(driver, '5', store)
+        assert info['shelves'] == ['Fiction', '5-star-books']
+        store.put.assert_not_called()
+
+
+class TestBookId:
+    """Test the book ID is taken from the URL."""
+
+    def test_id_from_url(self):
+        """The number after /book/show/ should be returned."""
+        url = 'https://www.goodreads.com/book/show/4406.East_of_Eden'
+        assert ligrarian.book_id(url) == '4406'
+
+    def test_hash_without_id(self):
+        """URLs without an ID should still give a stable key."""
+        assert ligrarian.book_id('a') == ligrarian.book_id('a')
+
+
+class TestPageCache:
+    """Test pages are served from, revalidated against and evicted from disk."""
+
+    url = 'https://www.goodreads.com/book/show/1.Book'
+
+    @pytest.fixture
+    def session(self):
+        """Return a mock requests Session."""
+        return mock.MagicMock()
+
+    def response(self, status, text='', headers=None):
+        """Return a mock response."""
+        return mock.MagicMock(status_code=status, text=text,
+                              headers=headers or {})
+
+    def test_fresh_entry_skips_request(self, session, tmp_path):
+        """A page within the TTL should be returned without a request."""
+        session.get.return_value = self.response(200, 'html')
+        cache = ligrarian.PageCache(str(tmp_path))
+        cache.fetch(self.url, session)
+        assert cache.fetch(self.url, session) == 'html'
+        session.get.assert_called_once()
+
+    def test_stale_entry_revalidated(self, session, tmp_path):
+        """A stale page should be revalidated and kept on a 304."""
+        get = session.get
+        get.return_value = self.response(200, 'html', {'ETag': '"v1"'})
+        cache = ligrarian.PageCache(str(tmp_path), ttl=0)
+        cache.fetch(self.url, session)
+        get.return_value = self.response(304)
+        assert cache.fetch(self.url, session) == 'html'
+        assert get.call_args[1]['headers'] == {'If-None-Match': '"v1"'}
+
+    def test_least_recently_used_evicted(self, session, tmp_path):
+        """Going over max_bytes should remove the oldest entries."""
+        session.get.return_value = self.response(200, 'x' * 1000)
+        cache = ligrarian.PageCache(str(tmp_path))
+        cache.fetch(self.url, session)
+        old_path = cache.entry_path(self.url)
+        # Room for one entry but not two
+        cache.max_bytes = ligrarian.os.path.getsize(old_path) * 1.5
+        ligrarian.os.utime(old_path, (0, 0))
+        cache.fetch('https://www.goodreads.com/book/show/2.Book', session)
+        assert not ligrarian.os.path.exists(old_path)
+        assert len(ligrarian.os.listdir(str(tmp_path))) == 1
+
+
+
+class TestParseEngines:
+    """Test the lxml and BeautifulSoup parsers agree on a saved page."""
+
+    @pytest.fixture
+    def page(self):
+        """Return the saved Goodreads book page."""
+        path = ligrarian.os.path.join(ligrarian.os.path.dirname(__file__),
+                                      'fixtures', 'book_page.html')
+        with open(path) as page:
+            return page.read()
+
+    def test_soup_parse(self, page):
+        """The restricted BeautifulSoup parse should find every detail."""
+        assert ligrarian.parse_book_soup(page) == {
+            'title': 'East of Eden', 'author': 'John Steinbeck',
+            'pages': 601, 'shelves': ['Classics', 'Fiction', 'Historical',
+                                      'Historical Fiction', 'Literature']
+        }
+
+    def test_engines_agree(self, page):
+        """lxml should give the same details as BeautifulSoup."""
+        pytest.importorskip('lxml')
+        assert (ligrarian.parse_book_lxml(page) ==
+                ligrarian.parse_book_soup(page))
+
+    @pytest.mark.parametrize('parser', ['parse_book_soup', 'parse_book_lxml'])
+    @pytest.mark.parametrize('missing', ['bookTitle', 'authorName',
+                                         'numberOfPages'])
+    def test_missing_details(self, page, parser, missing):
+        """Either parser should raise ValueError for a missing detail."""
+        if parser == 'parse_book_lxml':
+            pytest.importorskip('lxml')
+        page = page.replace(missing, 'removed')
+        with pytest.raises(ValueError):
+            getattr(ligrarian, parser)(page)
+
+
+class TestWaits:
+    """Test explicit waits time out per step and log their duration."""
+
+    @pytest.fixture(autouse=True)
+    def reset_timeouts(self):
+        """Restore the default timeouts after each test."""
+        yield
+        ligrarian.wait_timeouts.clear()
+        ligrarian.wait_timeouts['default'] = 10
+
+    def test_step_timeouts_configured(self):
+        """timeout and timeout_<step> settings should set the timeouts."""
+        ligrarian.configure_waits({'timeout': '5', 'timeout_login': '20'})
+        assert ligrarian.wait_timeouts == {'default': 5, 'login': 20}
+
+    @mock.patch('ligrarian.WebDriverWait')
+    def test_step_timeout_used(self, mock_wait):
+        """A step's own timeout should be used over the default."""
+        ligrarian.configure_waits({'timeout_login': '20'})
+        ligrarian.wait_for('driver', 'condition', 'login')
+        mock_wait.assert_called_once_with('driver', 20)
+
+    @mock.patch('ligrarian.WebDriverWait')
+    def test_wait_logged(self, mock_wait, caplog):
+        """Each wait's duration should be logged with its step."""
+        caplog.set_level(ligrarian.logging.DEBUG, logger='ligrarian')
+        ligrarian.wait_for('driver', 'condition', 'shelve')
+        assert 'shelve wait took' in caplog.text
+
+    @mock.patch('ligrarian.WebDriverWait')
+    def test_missing_element_raises(self, mock_wait):
+        """A timed out element wait should raise NoSuchElementException."""
+        mock_wait.return_value.until.side_effect = (
+                ligrarian.TimeoutException
+        )
+        with pytest.raises(ligrarian.NoSuchElementException):
+            ligrarian.find_element('driver', 'name', 'next', 'review_page')
+
+
+class TestDateInput:
+    """Test reading sessions are found in a single browser round trip."""
+
+    @mock.patch('ligrarian.Select')
+    @mock.patch('ligrarian.wait_for')
+    @mock.patch('ligrarian.find_element')
+    def test_sessions_queried_once(self, mock_find, mock_wait, mock_select):
+        """The session ids should come from one script, not per element."""
+        driver = mock.Mock()
+        driver.current_url = 'https://www.goodreads.com/book/show/4406'
+        driver.execute_script.return_value = [
+            {'id': 'readingSessionEntry111'},
+            {'id': 'readingSessionEntry222'},
+        ]
+        ligrarian.goodreads_date_input(driver, '05/03/2019', False)
+
+        driver.execute_script.assert_called_once_with(
+            ligrarian.QUERY_SCRIPT, '[id*="readingSessionEntry"]', ['id'],
+            False, False
+        )
+        assert not driver.find_elements_by_xpath.called
+        assert mock_find.call_args_list[0][0][2] == (
+            'readingSessionDatePicker222[end][year]'
+        )
+
+
+class TestBulkText:
+    """Test the stars are read in a single browser round trip."""
+
+    @mock.patch('ligrarian.wait_for')
+    def test_star_clicked_from_query(self, mock_wait):
+        """Only the matching star, returned by the query, should be clicked."""
+        driver = mock.Mock()
+        stars = [mock.Mock(), mock.Mock(), mock.Mock()]
+        driver.execute_script.return_value = [
+            {'text': '{} of 5 stars'.format(number), 'element': star}
+            for number, star in enumerate(stars, 3)
+        ]
+        ligrarian.goodreads_rate_book(driver, '4')
+
+        assert driver.execute_script.call_count == 1
+        assert not driver.find_elements.called
+        assert not stars[0].click.called
+        stars[1].click.assert_called_once_with()
+
+
+class TestGoodreadsSession:
+    """Test the browserless engine against the local Goodreads stand-in."""
+
+    @pytest.fixture
+    def server(self):
+        """Run the stand-in server for the test."""
+        goodreads_standin = pytest.importorskip('goodreads_standin')
+        with goodreads_standin.StandIn() as server:
+            yield server
+
+    @pytest.fixture
+    def session(self, server):
+        """Return an engine logged in to the stand-in."""
+        session = ligrarian.GoodreadsSession(server.url)
+        ligrarian.goodreads_login(session, 'reader@example.com', 'secret')
+        yield session
+        session.close()
+
+    def details(self, server, **details):
+        """Return the details of a book update on the stand-in."""
+        defaults = {'url': server.url + '/book/show/4406.East_of_Eden',
+                    'date': '05/03/2019', 'rating': '4', 'review': 'Timshel'}
+        defaults.update(details)
+        return defaults
+
+    def test_http_engine_created(self):
+        """The http engine should give a session rather than a browser."""
+        driver = ligrarian.create_driver(False, 'http')
+        assert isinstance(driver, ligrarian.GoodreadsSession)
+        driver.close()
+
+    def test_book_updated(self, server, session):
+        """The date, review, rating and top shelves should all be saved."""
+        url, info = ligrarian.goodreads_update(session,
+                                               self.details(server))
+        book = server.books['4406']
+        assert info['title'] == 'East of Eden'
+        assert book.sessions == {'10000': ('2019', '3', '5')}
+        assert book.review == 'Timshel'
+        assert book.rating == 4
+        assert book.shelves == ['read', 'Classics', 'Fiction', 'Historical',
+                                'Historical Fiction', 'Literature']
+
+    def test_reread_adds_session(self, server, session):
+        """A shelved book should get a new session and not be reshelved."""
+        ligrarian.goodreads_update(session, self.details(server))
+        posts = len([request for request in server.requests
+                     if request[1] == '/shelf/add_to_shelf'])
+        ligrarian.goodreads_update(session, self.details(
+            server, date='01/01/2020', rating='5'))
+        book = server.books['4406']
+        assert book.sessions == {'10000': ('2019', '3', '5'),
+                                 '10001': ('2020', '1', '1')}
+        assert book.rating == 5
+        assert posts == len([request for request in server.requests
+                             if request[1] == '/shelf/add_to_shelf'])
+
+    def test_search_filters_format(self, server, session):
+        """Searching should take the top edition in the typed format."""
+        url = ligrarian.goodreads_update(session, self.details(
+            server, url=None, search='East of Eden', format='k'))[0]
+        assert url == server.url + '/book/show/23215474-east-of-eden'
+        assert server.books['23215474'].rating == 4
+
+    def test_repeat_search_skips_search(self, server, session, tmp_path):
+        """A stored search shouldn't visit the search or editions pages."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        details = self.details(server, url=None, search='East of Eden',
+                               format='k')
+        first = ligrarian.goodreads_update(session, details, store)[0]
+        del server.requests[:]
+        again = ligrarian.goodreads_update(session, details, store)[0]
+        assert again == first
+        assert not [path for _, path in server.requests
+                    if path == '/search' or path.startswith('/work/')]
+
+    def test_wrong_password_exits(self, server):
+        """A rejected login should exit like the browser engine."""
+        session = ligrarian.GoodreadsSession(server.url)
+        with pytest.raises(SystemExit):
+            ligrarian.goodreads_login(session, 'reader@example.com', 'wrong')
+
+    def test_saved_cookies_reused(self, server, tmp_path):
+        """A second login should use the saved cookies, not the form."""
+        cookie_path = str(tmp_path / 'cookies.json')
+        for _ in range(2):
+            session = ligrarian.GoodreadsSession(server.url)
+            ligrarian.goodreads_login(session, 'reader@example.com',
+                                      'secret', cookie_path)
+            session.close()
+        assert server.requests.count(('POST', '/user/sign_in')) == 1
+
+    @mock.patch('ligrarian.is_present', return_value=True)
+    def test_cookies_shared_with_selenium(self, mock_present, server,
+                                          tmp_path):
+        """The jar should pass between the engines in both directions."""
+        cookie_path = str(tmp_path / 'cookies.json')
+        session = ligrarian.GoodreadsSession(server.url)
+        ligrarian.goodreads_login(session, 'reader@example.com', 'secret',
+                                  cookie_path)
+        session.close()
+
+        def add_cookie(cookie):
+            # WebDriver only accepts a whole number of seconds for expiry
+            if 'expiry' in cookie:
+                assert isinstance(cookie['expiry'], int)
+            added.append(dict(cookie, expiry=int(ligrarian.time.time())
+                              + 60))
+
+        added = []
+        driver = mock.MagicMock(**{'add_cookie.side_effect': add_cookie})
+        assert ligrarian.goodreads_cookie_login(driver, cookie_path,
+                                                'reader@example.com')
+        assert [cookie['name'] for cookie in added] == ['_session_id']
+
+        driver.get_cookies.return_value = added
+        ligrarian.save_cookies(driver, cookie_path, 'reader@example.com')
+        session = ligrarian.GoodreadsSession(server.url)
+        ligrarian.goodreads_login(session, 'reader@example.com', 'secret',
+                                  cookie_path)
+        session.close()
+        assert server.requests.count(('POST', '/user/sign_in')) == 1
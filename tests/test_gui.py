@@ -29,7 +29,7 @@ class TestGuiModeDetailsEdits:
         """A fake version of ligrarian's Gui class."""
 
         def __init__(self):
-            self.mode = True
+            self.mode = mock.Mock(**{'get.return_value': True})
             self.info = {'main': "fake main"}
 
 
@@ -42,7 +42,7 @@ class TestGuiModeDetailsEdits:
     def test_mode_false_moves_main_to_search(self):
         """False should lead to info['main'] copied to info['search']."""
         mock_gui = self.FakeGui()
-        mock_gui.mode = False
+        mock_gui.mode.get.return_value = False
         info = ligrarian.gui_mode_details_edits(mock_gui)
         assert info['search'] == "fake main"
 
@@ -144,3 +144,220 @@ class TestSetDateGuiMethod:
         mock_Gui.date.insert.assert_called_once_with(
                 0, self.mock_date(True)
         )
+
+
+class TestParseInputGuiMethod:
+    """Complete books are queued and the window kept open for more."""
+
+    def gui(self, main="East of Eden"):
+        """Return a mock Gui with the form filled in."""
+        mock_Gui = mock.MagicMock()
+        mock_Gui.settings = {}
+        mock_Gui.main.get.return_value = main
+        mock_Gui.mode.get.return_value = False
+        mock_Gui.format.get.return_value = 'Paperback'
+        return mock_Gui
+
+    @mock.patch('ligrarian.messagebox')
+    def test_complete_book_queued(self, mock_messagebox):
+        """The book's details are queued and the window isn't destroyed."""
+        mock_Gui = self.gui()
+        ligrarian.Gui.parse_input(mock_Gui)
+
+        details = mock_Gui.queue_book.call_args[0][0]
+        assert details['search'] == "East of Eden"
+        assert details['format'] == 'Paperback'
+        mock_Gui.master.destroy.assert_not_called()
+        mock_messagebox.showwarning.assert_not_called()
+
+    @mock.patch('ligrarian.messagebox')
+    def test_incomplete_book_warned(self, mock_messagebox):
+        """A book without a search or URL is warned about, not queued."""
+        mock_Gui = self.gui(main='')
+        ligrarian.Gui.parse_input(mock_Gui)
+
+        mock_messagebox.showwarning.assert_called_once()
+        mock_Gui.queue_book.assert_not_called()
+
+
+@mock.patch('ligrarian.threading')
+@mock.patch('ligrarian.tk')
+class TestQueueBookGuiMethod:
+    """Queued books are listed and the worker started only when needed."""
+
+    def test_book_listed_and_queued(self, mock_tk, mock_threading):
+        """The book is listed as waiting and put on the worker's queue."""
+        gui = ligrarian.Gui(mock.MagicMock(), mock.MagicMock())
+        gui.queue_book({'search': "East of Eden"})
+
+        gui.queue_list.insert.assert_called_with(mock_tk.END,
+                                                 "East of Eden - Waiting")
+        assert gui.books.get_nowait() == (0, {'search': "East of Eden"})
+
+    def test_worker_started_once(self, mock_tk, mock_threading):
+        """Further books go to the running worker rather than a new one."""
+        gui = ligrarian.Gui(mock.MagicMock(), mock.MagicMock())
+        gui.queue_book({'search': "East of Eden"})
+        gui.worker.is_alive.return_value = True
+        gui.queue_book({'url': "https://www.goodreads.com/book/show/1"})
+
+        mock_threading.Thread.assert_called_once()
+        assert gui.books.qsize() == 2
+
+    def test_close_restarts_stopped_worker(self, mock_tk, mock_threading):
+        """A book left waiting by a stopped worker is done before closing."""
+        gui = ligrarian.Gui(mock.MagicMock(), mock.MagicMock())
+        gui.queue_book({'search': "East of Eden"})
+        gui.worker.is_alive.return_value = False
+        gui.close()
+
+        assert mock_threading.Thread.call_count == 2
+        gui.master.destroy.assert_not_called()
+        assert gui.books.get_nowait() == (0, {'search': "East of Eden"})
+        assert gui.books.get_nowait() is None
+
+
+class TestPollProgressGuiMethod:
+    """Worker progress is shown and the window closed once it's done."""
+
+    def gui(self):
+        """Return a mock Gui with a book listed."""
+        mock_Gui = mock.MagicMock()
+        mock_Gui.progress = ligrarian.queue.Queue()
+        mock_Gui.books = ligrarian.queue.Queue()
+        mock_Gui.names = ["East of Eden"]
+        mock_Gui.closing = False
+        return mock_Gui
+
+    def test_book_status_shown(self):
+        """A book's progress replaces its line in the list."""
+        mock_Gui = self.gui()
+        mock_Gui.progress.put((0, 'Updating Goodreads...'))
+        ligrarian.Gui.poll_progress(mock_Gui)
+
+        mock_Gui.queue_list.delete.assert_called_once_with(0)
+        mock_Gui.queue_list.insert.assert_called_once_with(
+            0, "East of Eden - Updating Goodreads...")
+        mock_Gui.master.after.assert_called_once()
+
+    def test_session_status_shown(self):
+        """Progress without a book number goes to the status label."""
+        mock_Gui = self.gui()
+        mock_Gui.progress.put((None, 'Logging in...'))
+        ligrarian.Gui.poll_progress(mock_Gui)
+
+        mock_Gui.status.configure.assert_called_once_with(
+            text='Logging in...')
+
+    def test_closes_once_worker_done(self):
+        """The window is destroyed once closing and the worker has stopped."""
+        mock_Gui = self.gui()
+        mock_Gui.closing = True
+        mock_Gui.worker.is_alive.return_value = False
+        ligrarian.Gui.poll_progress(mock_Gui)
+
+        mock_Gui.master.destroy.assert_called_once()
+        mock_Gui.master.after.assert_not_called()
+
+    def test_waiting_book_restarts_worker(self):
+        """A book queued as the worker stopped shouldn't be left waiting."""
+        mock_Gui = self.gui()
+        ligrarian.Gui.poll_progress(mock_Gui)
+        mock_Gui.start_worker.assert_not_called()
+
+        mock_Gui.books.put((0, {'search': "East of Eden"}))
+        ligrarian.Gui.poll_progress(mock_Gui)
+        mock_Gui.start_worker.assert_called_once_with()
+
+
+@mock.patch('ligrarian.record_row')
+@mock.patch('ligrarian.goodreads_update')
+@mock.patch('ligrarian.goodreads_login')
+@mock.patch('ligrarian.create_driver')
+@mock.patch('ligrarian.BookStore')
+class TestGuiWorker:
+    """The worker updates queued books with one driver and reports back."""
+
+    settings = {'headless': True, 'engine': None, 'email': 'email',
+                'password': 'password', 'cookies': None, 'compact_every': '5',
+                'path': 'Ligrarian.xlsx'}
+
+    def run(self, *jobs):
+        """Run the worker over jobs and return its progress reports."""
+        books = ligrarian.queue.Queue()
+        for job in jobs + (None,):
+            books.put(job)
+        progress = ligrarian.queue.Queue()
+        ligrarian.gui_worker(self.settings, books, progress)
+        return list(progress.queue)
+
+    def info(self):
+        """Return the info goodreads_update would for a book."""
+        return ('url', {'title': 'East of Eden', 'author': 'John Steinbeck',
+                        'shelves': ['fiction', 'classics']})
+
+    def test_one_driver_for_many_books(self, mock_store, mock_driver,
+                                       mock_login, mock_update, mock_record):
+        """Five books take one driver and login and are all recorded."""
+        mock_update.side_effect = lambda *args: self.info()
+        details = {'search': 'East of Eden', 'date': '05/03/2019'}
+        reports = self.run(*[(number, details) for number in range(5)])
+
+        mock_driver.assert_called_once_with(True, None, self.settings)
+        mock_login.assert_called_once()
+        assert mock_update.call_count == 5
+        assert mock_record.call_count == 5
+        mock_driver.return_value.close.assert_called_once()
+        assert (4, 'Done - East of Eden by John Steinbeck') in reports
+        assert reports[-1] == (None, 'Finished.')
+
+    def test_failed_book_reported(self, mock_store, mock_driver, mock_login,
+                                  mock_update, mock_record):
+        """A book that fails is reported and the next still updated."""
+        mock_update.side_effect = [
+            ligrarian.NoSuchElementException('No edition found'), self.info()
+        ]
+        details = {'search': 'East of Eden', 'date': '05/03/2019'}
+        reports = self.run((0, details), (1, details))
+
+        assert (0, 'Failed - No edition found') in reports
+        assert (1, 'Done - East of Eden by John Steinbeck') in reports
+        mock_record.assert_called_once()
+
+    def test_failed_login_fails_queue(self, mock_store, mock_driver,
+                                      mock_login, mock_update, mock_record):
+        """Failing to log in fails every queued book and stops the worker."""
+        mock_login.side_effect = SystemExit
+        details = {'search': 'East of Eden', 'date': '05/03/2019'}
+        reports = self.run((0, details), (1, details))
+
+        assert (0, 'Failed - not logged in') in reports
+        assert (1, 'Failed - not logged in') in reports
+        mock_update.assert_not_called()
+
+    def test_other_errors_reported(self, mock_store, mock_driver,
+                                   mock_login, mock_update, mock_record):
+        """Parse and spreadsheet errors should fail only their own book."""
+        mock_update.side_effect = [ValueError('Book page is missing its '
+                                              'title'), self.info(),
+                                   self.info()]
+        mock_record.side_effect = [OSError('Disk full'), None]
+        details = {'search': 'East of Eden', 'date': '05/03/2019'}
+        reports = self.run((0, details), (1, details), (2, details))
+
+        assert (0, 'Failed - Book page is missing its title') in reports
+        assert (1, 'Goodreads updated, spreadsheet failed - Disk full'
+                ) in reports
+        assert (2, 'Done - East of Eden by John Steinbeck') in reports
+
+    def test_failed_browser_start_fails_queue(self, mock_store, mock_driver,
+                                              mock_login, mock_update,
+                                              mock_record):
+        """A browser that won't start should fail the queue, not hang it."""
+        mock_driver.side_effect = ligrarian.WebDriverException('No Firefox')
+        details = {'search': 'East of Eden', 'date': '05/03/2019'}
+        reports = self.run((0, details))
+
+        assert (None, 'Failed to start the browser - No Firefox') in reports
+        assert (0, 'Failed - not logged in') in reports
+        assert reports[-1] == (None, 'Finished.')
@@ -2,6 +2,12 @@
 
 """Tests the functions in ligrarian not related to GUI, sheet or goodreads."""
 
+import asyncio
+import os
+import pytest
+import subprocess
+import sys
+import time
 import unittest.mock as mock
 
 import ligrarian
@@ -31,6 +37,21 @@ class TestRetrieveSettings:
         assert settings == {'prompt': True}
 
 
+class TestBooleanSettings:
+    """Test newer switches in settings.ini are read as booleans."""
+
+    @pytest.mark.parametrize('value, expected', [
+        ('True', True), ('yes', True), ('False', False), ('off', False),
+        ('', False),
+    ])
+    def test_lean(self, tmp_path, monkeypatch, value, expected):
+        """lean should follow the value written, not just whether it's set."""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'settings.ini').write_text(
+            '[settings]\nlean = {}\n'.format(value))
+        assert ligrarian.retrieve_settings()['lean'] is expected
+
+
 class TestGetDateString:
     """Function gets, modifies and returns correct date."""
 
@@ -184,3 +205,556 @@ class TestWriteConfig:
         mock_parser.return_value.set.assert_any_call(
                 "settings", "prompt", "argument prompt"
         )
+
+
+class TestProcessDate:
+    """Test function converts (t)oday and (y)esterday and leaves others."""
+
+    def test_t_returns_today(self):
+        """'t' and 'T' should return today's date string."""
+        assert ligrarian.process_date('T') == ligrarian.get_date_str()
+
+    def test_y_returns_yesterday(self):
+        """'y' should return yesterday's date string."""
+        assert ligrarian.process_date('y') == ligrarian.get_date_str(True)
+
+    def test_date_returned_unchanged(self):
+        """A formatted date should be returned as is."""
+        assert ligrarian.process_date('01/02/2020') == '01/02/2020'
+
+
+class TestReadBatchFile:
+    """Test function reads csv and jsonl batch files and validates rows."""
+
+    def test_reads_csv(self, tmp_path):
+        """CSV rows should be returned as dictionaries."""
+        batch = tmp_path / 'books.csv'
+        batch.write_text("url,date,rating,review\n"
+                         "https://a.url,01/02/2020,4,Good\n")
+        books = ligrarian.read_batch_file(str(batch))
+        assert books == [{'url': 'https://a.url', 'date': '01/02/2020',
+                          'rating': '4', 'review': 'Good'}]
+
+    def test_reads_jsonl(self, tmp_path):
+        """JSONL lines should be returned as dictionaries of strings."""
+        batch = tmp_path / 'books.jsonl'
+        batch.write_text('{"search": "East of Eden", "format": "k", '
+                         '"date": "01/02/2020", "rating": 5}\n\n')
+        books = ligrarian.read_batch_file(str(batch))
+        assert books[0]['rating'] == '5'
+        assert books[0]['search'] == 'East of Eden'
+
+    def test_processes_date(self, tmp_path):
+        """(t)oday dates should be converted to date strings."""
+        batch = tmp_path / 'books.csv'
+        batch.write_text("url,date,rating\nhttps://a.url,t,4\n")
+        books = ligrarian.read_batch_file(str(batch))
+        assert books[0]['date'] == ligrarian.get_date_str()
+
+    def test_skips_incomplete_rows(self, tmp_path, capsys):
+        """Rows missing a url/search, date or rating should be skipped."""
+        batch = tmp_path / 'books.csv'
+        batch.write_text("search,format,date,rating\n"
+                         "East of Eden,,01/02/2020,4\n"
+                         "East of Eden,k,01/02/2020,4\n")
+        books = ligrarian.read_batch_file(str(batch))
+        assert len(books) == 1
+        assert 'Skipping row 1' in capsys.readouterr()[0]
+
+
+@mock.patch('ligrarian.compact_journal')
+@mock.patch('ligrarian.journal_row')
+@mock.patch('ligrarian.goodreads_update')
+@mock.patch('ligrarian.goodreads_login')
+@mock.patch('ligrarian.create_driver')
+@mock.patch('ligrarian.read_batch_file')
+class TestRunBatch:
+    """Test function shares one driver and one save across every book."""
+
+    settings = {'headless': True, 'email': 'email', 'password': 'pass',
+                'path': 'path'}
+    books = [{'url': 'url one', 'date': '01/01/2020', 'rating': '4'},
+             {'url': 'url two', 'date': '02/01/2020', 'rating': '3'}]
+
+    @staticmethod
+    def updated(driver, details, store=None):
+        """Stand in for goodreads_update returning the book's info."""
+        return (details['url'], {'title': details['url'], 'author': 'author',
+                                 'pages': 1, 'shelves': ['Fiction', 'Genre']})
+
+    def run(self, mock_read, mock_update, workers=1):
+        """Set up the mocks and run the batch."""
+        mock_read.return_value = [book.copy() for book in self.books]
+        mock_update.side_effect = self.updated
+        ligrarian.run_batch(self.settings, 'books.csv', workers)
+
+    def test_single_driver_and_login(self, mock_read, mock_driver,
+                                     mock_login, mock_update, *mocks):
+        """Driver created and logged in once for all books."""
+        self.run(mock_read, mock_update)
+        mock_driver.assert_called_once()
+        mock_login.assert_called_once()
+        assert mock_update.call_count == 2
+
+    def test_single_save(self, mock_read, mock_driver, mock_login,
+                         mock_update, mock_journal, mock_compact):
+        """Every book journaled then compacted with one save."""
+        self.run(mock_read, mock_update)
+        assert mock_journal.call_count == 2
+        mock_compact.assert_called_once_with('path')
+
+    def test_failed_book_skipped(self, mock_read, mock_driver, mock_login,
+                                 mock_update, mock_journal, mock_compact):
+        """A failed Goodreads update shouldn't stop the other books."""
+        mock_read.return_value = [book.copy() for book in self.books]
+        mock_update.side_effect = [ligrarian.NoSuchElementException(),
+                                   self.updated(None, self.books[1])]
+        ligrarian.run_batch(self.settings, 'books.csv')
+        mock_journal.assert_called_once()
+        assert mock_journal.call_args[0][1]['title'] == 'url two'
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_parse_error_skipped(self, mock_read, mock_driver, mock_login,
+                                 mock_update, mock_journal, mock_compact,
+                                 workers):
+        """A book failing other than in the browser shouldn't stop the rest."""
+        books = [dict(self.books[0], url='url {}'.format(number))
+                 for number in range(3)]
+        mock_read.return_value = books
+
+        def update(driver, details, store=None):
+            if details['url'] == 'url 0':
+                raise IndexError('list index out of range')
+            return self.updated(driver, details)
+
+        mock_update.side_effect = update
+        ligrarian.run_batch(self.settings, 'books.csv', workers)
+        written = [call[0][1]['title'] for call in mock_journal.call_args_list]
+        assert written == ['url 1', 'url 2']
+
+    def test_workers_share_jobs(self, mock_read, mock_driver, mock_login,
+                                mock_update, mock_journal, mock_compact):
+        """Each worker gets its own headless driver and rows keep file order."""
+        self.run(mock_read, mock_update, workers=2)
+        assert mock_driver.call_count == 2
+        mock_driver.assert_called_with(True, None, self.settings)
+        written = [call[0][1]['title'] for call in mock_journal.call_args_list]
+        assert written == ['url one', 'url two']
+
+    def test_failed_login_closes_driver(self, mock_read, mock_driver,
+                                        mock_login, mock_update, mock_journal,
+                                        mock_compact, capsys):
+        """A login error should be reported and its browser closed."""
+        drivers = [mock.MagicMock(), mock.MagicMock()]
+        mock_driver.side_effect = drivers
+        mock_login.side_effect = [ligrarian.TimeoutException('Timed out'),
+                                  None]
+        self.run(mock_read, mock_update, workers=2)
+        for driver in drivers:
+            driver.close.assert_called_once_with()
+        written = [call[0][1]['title'] for call in mock_journal.call_args_list]
+        assert written == ['url one', 'url two']
+        assert 'Failed to log in - Timed out' in capsys.readouterr()[0]
+
+    def test_no_worker_logged_in(self, mock_read, mock_driver, mock_login,
+                                 mock_update, mock_journal, mock_compact,
+                                 capsys):
+        """The batch should still finish when no browser logs in."""
+        mock_login.side_effect = ligrarian.WebDriverException('Crashed')
+        self.run(mock_read, mock_update)
+        mock_driver.return_value.close.assert_called_once_with()
+        mock_update.assert_not_called()
+        assert 'updated for 0 of 2 books' in capsys.readouterr()[0]
+
+
+class TestThrottle:
+    """Test starts are spaced by the politeness interval."""
+
+    @mock.patch('ligrarian.time.sleep')
+    @mock.patch('ligrarian.time.monotonic', return_value=100)
+    def test_second_start_waits(self, mock_monotonic, mock_sleep):
+        """A second start at the same moment should sleep the interval."""
+        throttle = ligrarian.Throttle(2)
+        throttle.wait()
+        throttle.wait()
+        assert mock_sleep.call_args_list == [mock.call(0), mock.call(2)]
+
+
+class TestDaemon:
+    """Test the daemon answers status, update and stop over its socket."""
+
+    @pytest.fixture
+    def daemon(self, tmp_path):
+        """Serve a daemon with a mocked driver and workbook in a thread."""
+        socket_path = str(tmp_path / 'test.sock')
+        server = ligrarian.Daemon(socket_path, {'path': 'path'},
+                                  mock.MagicMock(), mock.MagicMock())
+        thread = ligrarian.threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield socket_path
+        if thread.is_alive():
+            server.shutdown()
+        thread.join()
+        server.server_close()
+
+    def test_status(self, daemon):
+        """Status should report no jobs done yet."""
+        response = ligrarian.send_to_daemon(daemon, {'command': 'status'})
+        assert response['ok'] and response['jobs'] == 0
+
+    @mock.patch('ligrarian.record_row')
+    @mock.patch('ligrarian.goodreads_update')
+    def test_update(self, mock_update, mock_record, daemon):
+        """Update should run the flow and return the written info."""
+        mock_update.return_value = ('url', {'title': 'title',
+                                            'author': 'author', 'pages': 1,
+                                            'shelves': ['Fiction', 'Genre']})
+        details = {'url': 'url', 'date': '01/01/2020', 'rating': '4'}
+        response = ligrarian.send_to_daemon(
+                daemon, {'command': 'update', 'details': details}
+        )
+        assert response['info']['genre'] == 'Genre'
+        mock_record.assert_called_once()
+
+    @mock.patch('ligrarian.record_row')
+    @mock.patch('ligrarian.goodreads_update',
+                side_effect=ValueError('Book page is missing its title'))
+    def test_update_error_answered(self, mock_update, mock_record, daemon):
+        """Errors other than the browser's should still get a response."""
+        details = {'url': 'url', 'date': '01/01/2020', 'rating': '4'}
+        response = ligrarian.send_to_daemon(
+                daemon, {'command': 'update', 'details': details}
+        )
+        assert response == {'ok': False,
+                            'error': 'Book page is missing its title'}
+        mock_record.assert_not_called()
+
+    @mock.patch('ligrarian.record_row', side_effect=OSError('Disk full'))
+    @mock.patch('ligrarian.goodreads_update')
+    def test_spreadsheet_error_answered(self, mock_update, mock_record,
+                                        daemon):
+        """A failed spreadsheet write should be reported to the client."""
+        mock_update.return_value = ('url', {'title': 'title',
+                                            'author': 'author', 'pages': 1,
+                                            'shelves': ['Fiction', 'Genre']})
+        details = {'url': 'url', 'date': '01/01/2020', 'rating': '4'}
+        response = ligrarian.send_to_daemon(
+                daemon, {'command': 'update', 'details': details}
+        )
+        assert response['ok'] is False
+        assert 'Disk full' in response['error']
+
+    @pytest.mark.parametrize('request_', [{'command': 'update'}, ['update']])
+    def test_malformed_request_answered(self, daemon, request_):
+        """Updates without details, or non-object requests, are refused."""
+        response = ligrarian.send_to_daemon(daemon, request_)
+        assert response['ok'] is False
+
+    def test_stop(self, daemon):
+        """Stop should acknowledge and stop the daemon listening."""
+        assert ligrarian.send_to_daemon(daemon, {'command': 'stop'})['ok']
+
+    def test_unknown_command(self, daemon):
+        """Unknown commands should be refused."""
+        response = ligrarian.send_to_daemon(daemon, {'command': 'dance'})
+        assert response['ok'] is False
+
+
+class TestBookStore:
+    """Test book details are stored, expired, searched and pruned."""
+
+    url = 'https://www.goodreads.com/book/show/4406.East_of_Eden'
+    info = {'title': 'East of Eden', 'author': 'John Steinbeck',
+            'pages': 601, 'shelves': ['Fiction', 'Classics']}
+
+    def test_round_trip(self, tmp_path):
+        """A stored book should be returned unchanged."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        store.put(self.url, self.info)
+        assert store.get(self.url) == self.info
+
+    def test_stale_entry_missing(self, tmp_path):
+        """Entries older than the TTL should be treated as missing."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'), ttl=-1)
+        store.put(self.url, self.info)
+        assert store.get(self.url) is None
+
+    def test_search_by_author(self, tmp_path):
+        """Part of an author's name should find their books."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        store.put(self.url, self.info)
+        assert store.search('Steinbeck')[0][:5] == (
+                '4406', 'East of Eden', 'John Steinbeck', 601, 'Classics'
+        )
+
+    def test_prune_keeps_recent(self, tmp_path):
+        """Pruning older entries shouldn't remove ones just stored."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        store.put(self.url, self.info)
+        assert store.prune(older_than=3600) == 0
+        assert store.prune() == 1
+        assert store.get(self.url) is None
+
+
+class TestStoredSearches:
+    """Test searches are stored normalised, expired and forgotten."""
+
+    url = 'https://www.goodreads.com/book/show/23215474-east-of-eden'
+
+    def test_normalised_round_trip(self, tmp_path):
+        """Case, punctuation and spacing shouldn't stop a search matching."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        store.put_search('East of Eden, Steinbeck', 'k', self.url)
+        assert store.get_search('east of eden  steinbeck', 'K') == self.url
+        assert store.get_search('east of eden steinbeck', 'p') is None
+
+    def test_format_spellings_match(self, tmp_path):
+        """A format given by letter or in full should be the same search."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        store.put_search('East of Eden', 'Kindle', self.url)
+        for book_format in ['k', 'kindle', ' KINDLE']:
+            assert store.get_search('East of Eden', book_format) == self.url
+
+    def test_stale_search_missing(self, tmp_path):
+        """Searches older than the search TTL should be treated as missing."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'),
+                                    search_ttl=-1)
+        store.put_search('East of Eden', 'k', self.url)
+        assert store.get_search('East of Eden', 'k') is None
+
+    def test_forget_matching(self, tmp_path):
+        """Only searches containing every word given should be forgotten."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        store.put_search('East of Eden', 'k', self.url)
+        store.put_search('The Grapes of Wrath', 'k', self.url)
+        assert store.forget_searches('eden EAST') == 1
+        assert store.get_search('East of Eden', 'k') is None
+        assert store.get_search('The Grapes of Wrath', 'k') == self.url
+
+
+class TestBookIndex:
+    """Test search terms are matched to books read or looked up before."""
+
+    url = 'https://www.goodreads.com/book/show/23215474-east-of-eden'
+
+    @pytest.fixture
+    def index(self):
+        """Return an index of a few books, one with a Kindle edition."""
+        index = ligrarian.BookIndex()
+        index.add('East of Eden', 'John Steinbeck', self.url, 'k')
+        index.add('The Grapes of Wrath', 'John Steinbeck')
+        index.add('Of Mice and Men', 'John Steinbeck')
+        return index
+
+    def test_reordered_terms(self, index):
+        """Word order, case and punctuation shouldn't matter."""
+        book = index.match('steinbeck, EAST of eden')
+        assert book['editions'] == {'k': self.url}
+
+    def test_small_typos(self, index):
+        """A misspelt word should still match."""
+        assert index.match('grapes of wrth')['title'] == (
+            'The Grapes of Wrath')
+
+    def test_partial_title_not_confident(self, index):
+        """Terms covering too little of a title shouldn't match."""
+        assert index.match('eden') is None
+
+    def test_ambiguous_not_confident(self, index):
+        """Terms matching two books equally shouldn't pick one."""
+        index.add('East of Eden', 'Someone Else')
+        assert index.match('east of eden') is None
+
+    def test_built_from_store(self, tmp_path):
+        """Stored books should be indexed with their searched formats."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        store.put(self.url, {'title': 'East of Eden',
+                             'author': 'John Steinbeck', 'pages': 601,
+                             'shelves': []})
+        store.put_search('East of Eden Steinbeck', 'Kindle', self.url)
+        with mock.patch('ligrarian.spreadsheet_books', return_value=[]):
+            index = ligrarian.BookIndex.from_settings({'path': 'path'},
+                                                      store)
+        assert index.match('eden of east')['editions'] == {'k': self.url}
+
+    @mock.patch('ligrarian.BookIndex.from_settings')
+    def test_search_resolved(self, mock_index, capsys):
+        """A confident match in the format should give the search a url."""
+        mock_index.return_value.match.return_value = {
+            'title': 'East of Eden', 'author': 'John Steinbeck',
+            'editions': {'k': self.url}
+        }
+        store = mock.MagicMock()
+        details = {'search': 'East of Eden', 'format': 'k'}
+        ligrarian.resolve_search({}, details, store)
+        assert details['url'] == self.url
+        store.put_search.assert_called_once_with('East of Eden', 'k',
+                                                 self.url)
+        details = {'search': 'East of Eden', 'format': 'p'}
+        ligrarian.resolve_search({}, details, store)
+        assert 'url' not in details
+
+
+class TestFetchMetadata:
+    """Test many books are fetched concurrently from the local stand-in."""
+
+    @pytest.fixture
+    def server(self):
+        """Run the stand-in server, delaying responses by 100ms."""
+        goodreads_standin = pytest.importorskip('goodreads_standin')
+        with goodreads_standin.StandIn(latency=0.1) as server:
+            server.urls = [server.url + href
+                           for _, href in goodreads_standin.EDITIONS]
+            yield server
+
+    def test_books_fetched_and_stored(self, server, tmp_path):
+        """Every book should be parsed and stored, failures left as None."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        missing = server.url + '/book/missing'
+        infos = ligrarian.fetch_metadata(server.urls + [missing], store,
+                                         parse_workers=2)
+        assert infos[missing] is None
+        for url in server.urls:
+            assert infos[url]['title'] == 'East of Eden'
+            assert store.get(url) == infos[url]
+
+    def test_stored_books_not_requested(self, server, tmp_path):
+        """A book already in the store shouldn't be fetched again."""
+        store = ligrarian.BookStore(str(tmp_path / 'books.db'))
+        store.put(server.urls[0], {'title': 'Stored', 'author': 'Author',
+                                   'pages': 1, 'shelves': []})
+        infos = ligrarian.fetch_metadata(server.urls[:2], store,
+                                         parse_workers=1)
+        assert infos[server.urls[0]]['title'] == 'Stored'
+        assert [path for _, path in server.requests] == [
+            server.urls[1][len(server.url):]]
+
+    def test_fetches_concurrently(self, server):
+        """Fetches should overlap up to the concurrency limit."""
+        loop = asyncio.new_event_loop()
+        start = time.monotonic()
+        loop.run_until_complete(ligrarian.fetch_metadata_async(
+            server.urls, concurrency=4))
+        loop.close()
+        assert time.monotonic() - start < 0.1 * len(server.urls)
+
+    @pytest.mark.parametrize('settings, interval', [
+        ({}, 0.05),
+        ({'politeness': '1', 'fetch_interval': '0.2'}, 0.2),
+    ])
+    def test_fetch_interval_setting(self, settings, interval):
+        """The fetch should be spaced by fetch_interval, not politeness."""
+        with mock.patch('ligrarian.read_url_file', return_value=[]), \
+                mock.patch('ligrarian.BookStore.from_settings'), \
+                mock.patch('ligrarian.PageCache.from_settings'), \
+                mock.patch('ligrarian.fetch_metadata',
+                           return_value={}) as mock_fetch:
+            ligrarian.run_fetch_metadata(settings, 'urls.txt', 4)
+        assert mock_fetch.call_args[0][3:] == (4, interval)
+
+    def test_host_interval(self, server):
+        """Requests to one host should start at least interval apart."""
+        loop = asyncio.new_event_loop()
+        start = time.monotonic()
+        loop.run_until_complete(ligrarian.fetch_metadata_async(
+            server.urls, concurrency=4, interval=0.1))
+        loop.close()
+        assert time.monotonic() - start >= 0.1 * (len(server.urls) - 1)
+
+    def test_url_file(self, tmp_path):
+        """Text files should give a URL per non-blank line."""
+        path = tmp_path / 'urls.txt'
+        path.write_text('https://a/book/show/1\n\n https://a/book/show/2\n')
+        assert ligrarian.read_url_file(str(path)) == [
+            'https://a/book/show/1', 'https://a/book/show/2']
+
+
+class TestTracer:
+    """Test stage spans are only recorded, and exported, when tracing."""
+
+    @pytest.fixture
+    def tracer(self, monkeypatch):
+        """Replace the module's tracer with a fresh one."""
+        tracer = ligrarian.Tracer()
+        monkeypatch.setattr(ligrarian, 'tracer', tracer)
+        return tracer
+
+    def test_disabled_records_nothing(self, tracer):
+        """Traced functions shouldn't record spans unless enabled."""
+        ligrarian.traced(lambda: None)()
+        with tracer.span('stage'):
+            pass
+        assert tracer.events == []
+
+    def test_traced_span(self, tracer):
+        """Each call of a traced function should record a span."""
+        @ligrarian.traced
+        def stage():
+            return 'done'
+
+        tracer.enable()
+        assert stage() == 'done'
+        assert stage() == 'done'
+        names = [event['name'] for event in tracer.events]
+        assert names == [stage.__qualname__] * 2
+        assert ' x2 ' in tracer.summary()
+
+    def test_span_recorded_on_error(self, tracer):
+        """A stage that raises should still have its span recorded."""
+        tracer.enable()
+        with pytest.raises(ValueError):
+            with tracer.span('failing'):
+                raise ValueError
+        assert tracer.events[0]['name'] == 'failing'
+
+    def test_chrome_trace_saved(self, tracer, tmp_path):
+        """The trace file should hold complete events for chrome://tracing."""
+        tracer.enable()
+        with tracer.span('workbook.save'):
+            pass
+        path = str(tmp_path / 'trace.json')
+        tracer.save(path)
+        with open(path) as trace_file:
+            event = ligrarian.json.load(trace_file)['traceEvents'][0]
+        assert event['ph'] == 'X'
+        assert event['name'] == 'workbook.save'
+        assert event['dur'] >= 0
+
+
+class TestLazyImports:
+    """Test paths that don't need the heavy dependencies don't import them."""
+
+    HEAVY = ['tkinter', 'bs4', 'openpyxl', 'requests', 'selenium.webdriver',
+             'lxml', 'asyncio']
+
+    def imported_by(self, argv, directory):
+        """Return the heavy modules running ligrarian.py with argv imports."""
+        code = '\n'.join([
+            'import sys',
+            'sys.argv = ["ligrarian.py"] + {!r}'.format(argv),
+            'import ligrarian',
+            'try:',
+            '    ligrarian.main()',
+            'except SystemExit:',
+            '    pass',
+            'print("imported:", *[module for module in {!r}'.format(
+                self.HEAVY),
+            '                      if module in sys.modules])',
+        ])
+        root = os.path.dirname(os.path.abspath(ligrarian.__file__))
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=str(directory),
+            env=dict(os.environ, PYTHONPATH=root), stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, universal_newlines=True,
+        ).stdout
+        return output.splitlines()[-1].split()[1:]
+
+    def test_help(self, tmp_path):
+        """--help shouldn't import any heavy dependency."""
+        assert self.imported_by(['--help'], tmp_path) == []
+
+    def test_daemon_client(self, tmp_path):
+        """Handing a book to the daemon shouldn't import any either."""
+        assert self.imported_by(
+            ['url', 'https://www.goodreads.com/book/show/1', 't', '4',
+             '--daemon'], tmp_path) == []
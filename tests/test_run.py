@@ -44,7 +44,8 @@ def run_test():
     ligrarian.goodreads_login(driver, email, password)
     ligrarian.goodreads_find(driver, book_info['terms'])
     url = ligrarian.goodreads_filter(driver, book_info['format'])
-    shelves = ligrarian.goodreads_get_shelves(driver, book_info['rating'])
+    shelves = ligrarian.goodreads_get_book_info(driver,
+                                                book_info['rating'])['shelves']
 
     # Check book is correct format
     info_rows = driver.find_elements_by_class_name('row')
@@ -84,7 +85,8 @@ def run_test():
     path = ligrarian.get_setting('Settings', 'Path')
     workbook = openpyxl.load_workbook(path)
     print('Testing spreadsheet updating.')
-    info = ligrarian.parse_page(url)
+    info = ligrarian.parse_book_html(ligrarian.fetch_page(
+        url, ligrarian.requests.Session()))
     info['category'], info['genre'] = ligrarian.category_and_genre(shelves)
     print(info)
 
@@ -96,7 +98,8 @@ def run_test():
     workbook.close()
 
     # Try to write info to both sheets
-    ligrarian.input_info(year_sheet, info, book_info['date'])
+    ligrarian.journal_row(path, info, book_info['date'])
+    ligrarian.compact_journal(path)
 
     # Find blank rows now that the data should have been entered
     workbook = openpyxl.load_workbook(path)
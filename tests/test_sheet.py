@@ -4,6 +4,8 @@
 
 import unittest.mock as mock
 
+import pytest
+
 import ligrarian
 
 
@@ -60,73 +62,89 @@ class TestCheckYearSheetExists:
         assert returned_workbook == mock_workbook
 
 
-@mock.patch('ligrarian.openpyxl')
-@mock.patch('ligrarian.first_blank_row', return_value=2)
 class TestCreateSheet:
-    """Copies then renames sheet, blanks all but first, sets date function."""
-
-    def test_copies_sheet(self, mock_first, mock_pyxl):
-        """Should call copy_worksheet on workbook object."""
-        ligrarian.create_sheet(ligrarian.openpyxl, 'copy', 'new')
-
-        ligrarian.openpyxl.copy_worksheet.assert_called_once()
-
-    def test_names_sheet(self, mock_first, mock_pyxl):
-        """Should name sheet to new_sheet_name argument."""
-        ligrarian.create_sheet(ligrarian.openpyxl, 'copy', 'new')
-
-        assert ligrarian.openpyxl.copy_worksheet.return_value.title == 'new'
-
-    def test_first_row_cells_not_modified(self, mock_first, mock_pyxl):
-        """First row not accessed by cell call for .value modification.
-
-        Cells are blanked by setting their .value attributes to None. This
-        requires the cell to be accessed via a call with row and column args;
-        so no call to row 1 column 2 indicates that the first row hasn't been
-        set to None.
-
-        """
-        mock_sheet = ligrarian.openpyxl.copy_worksheet
-        ligrarian.create_sheet(ligrarian.openpyxl, 'copy', 'new')
-        cell_calls = mock_sheet.return_value.cell.call_args_list
-
-        assert mock.call(row=1, column=2) not in cell_calls
-
-    def test_other_row_cells_modified(self, mock_first, mock_pyxl):
-        """Other rows cell's value attributes changed to None."""
-        fake_two_one = FakeCell(2, 1)
-        ligrarian.openpyxl.copy_worksheet.return_value.cell.side_effect = [
-                fake_two_one,
-                FakeCell(2, 2),
-                FakeCell(2, 3),
-                FakeCell(2, 4),
-                FakeCell(2, 5),
-                FakeCell(2, 6),
-                FakeCell(5, 8),
-        ]
-        ligrarian.create_sheet(ligrarian.openpyxl, 'copy', 'new')
-        assert fake_two_one.value is None
-
-    def test_date_formula_written_to_last_cell(self, mock_first, mock_pyxl):
-        """Cell 5, 8 equal to date formula."""
-        fake_last_call = FakeCell(5, 8)
-        ligrarian.openpyxl.copy_worksheet.return_value.cell.side_effect = [
-                FakeCell(2, 1),
-                FakeCell(2, 2),
-                FakeCell(2, 3),
-                FakeCell(2, 4),
-                FakeCell(2, 5),
-                FakeCell(2, 6),
-                fake_last_call,
-        ]
-        ligrarian.create_sheet(ligrarian.openpyxl, 'copy', 'new')
-        assert fake_last_call.value == "=(TODAY()-DATE(new,1,1))/7"
+    """Copies the empty template, names it and sets the date function."""
+
+    def workbook(self, books=0):
+        """Return the bundled workbook with books rows on its 2018 sheet."""
+        path = ligrarian.os.path.join(ligrarian.os.path.dirname(__file__),
+                                      '..', 'Ligrarian.xlsx')
+        workbook = ligrarian.openpyxl.load_workbook(path)
+        for row in range(2, books + 2):
+            for column in range(1, 7):
+                workbook['2018'].cell(row=row, column=column).value = 'Book'
+        return workbook
+
+    def test_names_sheet(self):
+        """Should name a visible sheet to new_sheet_name argument."""
+        workbook = self.workbook()
+        ligrarian.create_sheet(workbook, '2018', '2019')
+
+        assert workbook['2019'].sheet_state == 'visible'
+
+    def test_header_and_formatting_kept(self):
+        """Header row and book cell formatting should be copied."""
+        workbook = self.workbook()
+        ligrarian.create_sheet(workbook, '2018', '2019')
+        sheet = workbook['2019']
+
+        assert sheet.cell(row=1, column=1).value == 'Title'
+        assert sheet.cell(row=2, column=2).number_format == '@'
+        assert sheet.cell(row=6, column=9).value == '=COUNTA(A2:A150)'
+
+    def test_books_not_copied(self):
+        """No books from the copied year should be on the new sheet."""
+        workbook = self.workbook(books=300)
+        ligrarian.create_sheet(workbook, '2018', '2019')
+        sheet = workbook['2019']
+
+        assert not any(sheet.cell(row=row, column=1).value
+                       for row in range(2, 302))
+        assert ligrarian.next_row(sheet) == 2
+
+    def test_template_hidden_and_bounded(self):
+        """The template should be hidden and not hold the copied books."""
+        workbook = self.workbook(books=300)
+        ligrarian.create_sheet(workbook, '2018', '2019')
+        template = workbook[ligrarian.TEMPLATE_SHEET]
+
+        assert template.sheet_state == 'hidden'
+        assert max(row for row, column in template._cells) == 16
+
+    def test_sheet_without_statistics(self):
+        """A year sheet with only books should give a header only template."""
+        workbook = self.workbook(books=3)
+        sheet = workbook['2018']
+        for row, column in list(sheet._cells):
+            if column > 6:
+                del sheet._cells[(row, column)]
+        ligrarian.create_sheet(workbook, '2018', '2019')
+
+        assert workbook['2019'].cell(row=1, column=1).value == 'Title'
+        assert ligrarian.next_row(workbook['2019']) == 2
+
+    def test_template_reused(self):
+        """A second new sheet should copy the existing template."""
+        workbook = self.workbook()
+        ligrarian.create_sheet(workbook, '2018', '2019')
+        with mock.patch.object(workbook, 'copy_worksheet',
+                               wraps=workbook.copy_worksheet) as copy:
+            ligrarian.create_sheet(workbook, '2019', '2020')
+            copy.assert_called_once_with(workbook[ligrarian.TEMPLATE_SHEET])
+
+    def test_date_formula_written(self):
+        """Cell 5, 9 equal to date formula."""
+        workbook = self.workbook()
+        ligrarian.create_sheet(workbook, '2018', '2019')
+
+        assert (workbook['2019'].cell(row=5, column=9).value ==
+                "=(TODAY()-DATE(2019,1,1))/7")
 
 
 @mock.patch('ligrarian.openpyxl')
-@mock.patch('ligrarian.first_blank_row', return_value=1)
-class TestInputInfo:
-    """Data written to 'year' and 'Overall' sheet and then workbook saved."""
+@mock.patch('ligrarian.next_row', return_value=1)
+class TestWriteRow:
+    """Data written to 'year' and 'Overall' sheet."""
 
     mock_info = {
             'title': "mock title",
@@ -148,18 +166,14 @@ class TestInputInfo:
 
     def test_year_sheet_accessed(self, mock_first, mock_pyxl):
         """2020 called on mock_pyxl.__getitem__."""
-        ligrarian.input_info(mock_pyxl, mock.MagicMock(),
-                             '2020', 'path')
+        ligrarian.write_row(mock_pyxl, mock.MagicMock(), '2020')
         assert (
             mock.call('2020') in mock_pyxl.__getitem__.call_args_list
         )
 
     def test_overall_sheet_accessed(self, mock_first, mock_pyxl):
         """Overall called on mock_pyxl.__getitem__."""
-        ligrarian.input_info(
-                mock_pyxl, mock.MagicMock(),
-                '2020', 'path'
-        )
+        ligrarian.write_row(mock_pyxl, mock.MagicMock(), '2020')
         assert (
             mock.call('Overall') in
             mock_pyxl.__getitem__.call_args_list
@@ -169,8 +183,8 @@ class TestInputInfo:
         """Given title written to year sheet on index call."""
         fake_title, mock_sides = self.mock_cell_access('2020',
                                                         "mock title", 0)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_title.value == "mock title"
 
@@ -178,8 +192,8 @@ class TestInputInfo:
         """Given author written to year sheet on index call."""
         fake_author, mock_sides = self.mock_cell_access('2020',
                                                         "mock author", 1)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_author.value == "mock author"
 
@@ -187,8 +201,8 @@ class TestInputInfo:
         """Given pages written to year sheet on index call."""
         fake_pages, mock_sides = self.mock_cell_access('2020',
                                                        "mock pages", 2)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_pages.value == "mock pages"
 
@@ -196,8 +210,8 @@ class TestInputInfo:
         """Given category written to year sheet on index call."""
         fake_category, mock_sides = self.mock_cell_access('2020',
                                                           "mock category", 3)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_category.value == "mock category"
 
@@ -205,8 +219,8 @@ class TestInputInfo:
         """Given genre written to year sheet on index call."""
         fake_genre, mock_sides = self.mock_cell_access('2020',
                                                        "mock genre", 4)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_genre.value == "mock genre"
 
@@ -214,8 +228,8 @@ class TestInputInfo:
         """Given date written to year sheet on index call."""
         fake_date, mock_sides = self.mock_cell_access('2020',
                                                       "mock date", 5)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_date.value == "2020"
 
@@ -223,8 +237,8 @@ class TestInputInfo:
         """Given title written to Overall sheet on index call."""
         fake_title, mock_sides = self.mock_cell_access('2020',
                                                        "mock title", 6)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_title.value == "mock title"
 
@@ -232,8 +246,8 @@ class TestInputInfo:
         """Given author written to Overall sheet on index call."""
         fake_author, mock_sides = self.mock_cell_access('2020',
                                                         "mock author", 7)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_author.value == "mock author"
 
@@ -241,8 +255,8 @@ class TestInputInfo:
         """Given pages written to Overall sheet on index call."""
         fake_pages, mock_sides = self.mock_cell_access('2020',
                                                        "mock pages", 8)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_pages.value == "mock pages"
 
@@ -250,8 +264,8 @@ class TestInputInfo:
         """Given category written to Overall sheet on index call."""
         fake_category, mock_sides = self.mock_cell_access('2020',
                                                           "mock category", 9)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_category.value == "mock category"
 
@@ -259,22 +273,249 @@ class TestInputInfo:
         """Given genre written to Overall sheet on index call."""
         fake_genre, mock_sides = self.mock_cell_access('2020',
                                                        "mock genre", 10)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_genre.value == "mock genre"
 
     def test_accessed_overall_sheet_date_set(self, mock_first, mock_pyxl):
         """Given date written to Overall sheet on index call."""
         fake_date, mock_sides = self.mock_cell_access('2020', "mock date", 11)
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
+        ligrarian.write_row(
+                mock_pyxl, self.mock_info, '2020')
 
         assert fake_date.value == "2020"
 
-    def test_workbook_saved(self, mock_first, mock_pyxl):
-        """Save called on workbook (mock_pyxl)."""
-        ligrarian.input_info(
-                mock_pyxl, self.mock_info, '2020', 'path')
 
-        mock_pyxl.save.assert_called_once()
+class TestNextRow:
+    """Test the append row is found from the bottom and then cached."""
+
+    def make_sheet(self, books):
+        """Return a real sheet with a header, statistics and books rows."""
+        sheet = ligrarian.openpyxl.Workbook().active
+        sheet.cell(row=1, column=1).value = 'Title'
+        for row in range(3, 17):
+            sheet.cell(row=row, column=8).value = 'Statistic'
+        for row in range(2, books + 2):
+            sheet.cell(row=row, column=1).value = 'Book'
+        return sheet
+
+    def test_row_below_statistics_rows(self):
+        """Few books beside taller statistics should still append below."""
+        assert ligrarian.next_row(self.make_sheet(3)) == 5
+
+    def test_row_after_many_books(self):
+        """More books than statistics rows should append after the last."""
+        assert ligrarian.next_row(self.make_sheet(40)) == 42
+
+    def test_cached_row_used(self):
+        """A written row should move the cached pointer without a rescan."""
+        sheet = self.make_sheet(3)
+        row = ligrarian.next_row(sheet)
+        sheet.cell(row=row, column=1).value = 'New Book'
+        with mock.patch.object(sheet, 'cell', wraps=sheet.cell) as cell:
+            assert ligrarian.next_row(sheet) == 6
+            assert cell.call_count == 2
+
+    def test_unwritten_row_rechecked(self):
+        """A row that wasn't written to should be returned again."""
+        sheet = self.make_sheet(3)
+        ligrarian.next_row(sheet)
+        assert ligrarian.next_row(sheet) == 5
+
+
+class TestJournal:
+    """Test rows are journaled then compacted into the spreadsheet."""
+
+    info = {'title': 'title', 'author': 'author', 'pages': 1,
+            'category': 'Fiction', 'genre': 'genre', 'shelves': ['unused']}
+
+    def spreadsheet(self, tmp_path):
+        """Return the path of a copy of the bundled spreadsheet."""
+        path = str(tmp_path / 'Ligrarian.xlsx')
+        source = ligrarian.os.path.join(
+                ligrarian.os.path.dirname(__file__), '..', 'Ligrarian.xlsx'
+        )
+        with open(source, 'rb') as original, open(path, 'wb') as copy:
+            copy.write(original.read())
+        return path
+
+    def test_torn_line_ignored(self, tmp_path):
+        """A line cut short by a crash shouldn't stop the others loading."""
+        path = str(tmp_path / 'sheet.xlsx')
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        with open(ligrarian.journal_path(path), 'a') as journal:
+            journal.write('{"date": "02/01')
+        assert len(ligrarian.read_journal(path)) == 1
+
+    def test_compact_writes_rows_and_clears(self, tmp_path):
+        """Compaction should write every row then remove the journal."""
+        path = self.spreadsheet(tmp_path)
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        ligrarian.journal_row(path, self.info, '01/01/2019')
+        assert ligrarian.compact_journal(path) == 2
+
+        workbook = ligrarian.openpyxl.load_workbook(path)
+        assert workbook['2019'].cell(row=2, column=6).value == '01/01/2019'
+        assert workbook['Overall'].cell(row=3, column=1).value == 'title'
+        assert not ligrarian.os.path.exists(ligrarian.journal_path(path))
+
+    def test_compaction_after_crash_once_saved(self, tmp_path):
+        """Rows already saved before a crash shouldn't be written again."""
+        path = self.spreadsheet(tmp_path)
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        with mock.patch('ligrarian.os.remove', side_effect=OSError):
+            with pytest.raises(OSError):
+                ligrarian.compact_journal(path)
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        assert ligrarian.compact_journal(path) == 1
+
+        overall = ligrarian.openpyxl.load_workbook(path)['Overall']
+        assert overall.cell(row=3, column=1).value == 'title'
+        assert overall.cell(row=4, column=1).value is None
+        assert not ligrarian.read_journal(path)
+
+    def test_compaction_after_crash_before_save(self, tmp_path):
+        """Rows set aside but never saved should be written next time."""
+        path = self.spreadsheet(tmp_path)
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        replace = ligrarian.os.replace
+
+        def crash_saving(source, destination):
+            if destination == path:
+                raise OSError('Crashed saving')
+            replace(source, destination)
+
+        with mock.patch('ligrarian.os.replace', side_effect=crash_saving):
+            with pytest.raises(OSError):
+                ligrarian.compact_journal(path)
+        assert len(ligrarian.read_journal(path)) == 1
+        assert ligrarian.compact_journal(path) == 1
+
+        overall = ligrarian.openpyxl.load_workbook(path)['Overall']
+        assert overall.cell(row=2, column=1).value == 'title'
+        assert overall.cell(row=3, column=1).value is None
+
+    def test_retry_after_failed_save(self, tmp_path):
+        """A workbook that failed to save shouldn't write its rows again."""
+        path = self.spreadsheet(tmp_path)
+        settings = {'path': path}
+        workbook = ligrarian.load_spreadsheet(path)
+        with mock.patch.object(workbook, 'save',
+                               side_effect=OSError('Disk full')):
+            with pytest.raises(OSError):
+                ligrarian.record_row(settings, self.info, '01/01/2018',
+                                     workbook)
+        assert ligrarian.compact_journal(path, workbook) == 1
+
+        saved = ligrarian.openpyxl.load_workbook(path)
+        for sheet in ['Overall', '2018']:
+            assert saved[sheet].cell(row=2, column=1).value == 'title'
+            assert saved[sheet].cell(row=3, column=1).value is None
+
+    def test_workbook_reloaded_after_other_write(self, tmp_path):
+        """Rows saved by another process should survive a cached workbook."""
+        path = self.spreadsheet(tmp_path)
+        settings = {'path': path}
+        cached = ligrarian.load_spreadsheet(path)
+        # Another process adds a row to the spreadsheet meanwhile
+        other = ligrarian.openpyxl.load_workbook(path)
+        ligrarian.add_year_sheet_if_missing(other, '2018')
+        ligrarian.write_row(other, self.info, '01/01/2018')
+        other.save(path)
+
+        second = dict(self.info, title='second')
+        ligrarian.record_row(settings, second, '01/01/2018', cached)
+
+        overall = ligrarian.openpyxl.load_workbook(path)['Overall']
+        assert overall.cell(row=2, column=1).value == 'title'
+        assert overall.cell(row=3, column=1).value == 'second'
+
+    def test_compactions_take_turns(self, tmp_path):
+        """A second compaction should wait for the first, not repeat it."""
+        path = self.spreadsheet(tmp_path)
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        save = ligrarian.openpyxl.Workbook.save
+        saving = ligrarian.threading.Event()
+
+        def slow_save(workbook, filename):
+            saving.set()
+            ligrarian.time.sleep(0.2)
+            save(workbook, filename)
+
+        results = []
+        with mock.patch('ligrarian.openpyxl.Workbook.save', slow_save):
+            first = ligrarian.threading.Thread(target=lambda: results.append(
+                ligrarian.compact_journal(path)))
+            first.start()
+            saving.wait()
+            results.append(ligrarian.compact_journal(path))
+            first.join()
+
+        assert sorted(results) == [0, 1]
+        overall = ligrarian.openpyxl.load_workbook(path)['Overall']
+        assert overall.cell(row=2, column=1).value == 'title'
+        assert overall.cell(row=3, column=1).value is None
+
+    @mock.patch('ligrarian.compact_journal')
+    def test_record_row_defers_compaction(self, mock_compact, tmp_path):
+        """Rows should only be compacted once compact_every are pending."""
+        settings = {'path': str(tmp_path / 'sheet.xlsx'), 'compact_every': 2}
+        assert not ligrarian.record_row(settings, self.info, '01/01/2018')
+        assert ligrarian.record_row(settings, self.info, '01/01/2018')
+        mock_compact.assert_called_once_with(settings['path'], None)
+
+    def test_compaction_due_in_advance(self, tmp_path):
+        """The next row's compaction should be known before journaling it."""
+        settings = {'path': str(tmp_path / 'sheet.xlsx'), 'compact_every': 2}
+        assert not ligrarian.compaction_due(settings)
+        ligrarian.journal_row(settings['path'], self.info, '01/01/2018')
+        assert ligrarian.compaction_due(settings)
+        assert ligrarian.compaction_due({'path': settings['path']})
+
+
+class TestSpreadsheetIndex:
+    """Test the index of the spreadsheet's books is built and kept up."""
+
+    info = TestJournal.info
+
+    def test_built_from_overall_sheet(self, tmp_path):
+        """A missing index should be rebuilt from the Overall sheet."""
+        path = TestJournal().spreadsheet(tmp_path)
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        ligrarian.compact_journal(path)
+        assert not ligrarian.index_fresh(path)
+        assert ligrarian.spreadsheet_books(path) == [('title', 'author')]
+        assert ligrarian.index_fresh(path)
+
+    def test_compaction_appends(self, tmp_path):
+        """Compacted rows should be added without rereading the sheet."""
+        path = TestJournal().spreadsheet(tmp_path)
+        assert ligrarian.spreadsheet_books(path) == []
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        assert ligrarian.spreadsheet_books(path) == [('title', 'author')]
+        ligrarian.compact_journal(path)
+        with mock.patch('ligrarian.openpyxl.load_workbook') as mock_load:
+            assert ligrarian.spreadsheet_books(path) == [('title', 'author')]
+        mock_load.assert_not_called()
+
+    def test_stale_index_left_for_rebuild(self, tmp_path):
+        """An index older than the sheet shouldn't be appended to."""
+        path = TestJournal().spreadsheet(tmp_path)
+        assert ligrarian.spreadsheet_books(path) == []
+        ligrarian.os.utime(path, (ligrarian.time.time() + 10,) * 2)
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        ligrarian.compact_journal(path)
+        with open(ligrarian.index_path(path)) as index:
+            assert index.read() == ''
+
+    def test_index_failure_after_compaction(self, tmp_path):
+        """Failing to update the index shouldn't keep the journal."""
+        path = TestJournal().spreadsheet(tmp_path)
+        assert ligrarian.spreadsheet_books(path) == []
+        ligrarian.journal_row(path, self.info, '01/01/2018')
+        with mock.patch('ligrarian.index_rows', side_effect=OSError):
+            assert ligrarian.compact_journal(path) == 1
+        assert not ligrarian.read_journal(path)
+        assert not ligrarian.os.path.exists(ligrarian.index_path(path))
+        assert ligrarian.spreadsheet_books(path) == [('title', 'author')]